@@ -1,8 +1,4 @@
-from src.bot import run_bot, runFlask
-from threading import Thread
+from src.bot import run_bot
 
 if __name__ == "__main__":
-    # Start Flask server in a new thread
-    flask_thread = Thread(target=runFlask)
-    flask_thread.start()
     run_bot()
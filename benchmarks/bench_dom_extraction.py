@@ -0,0 +1,64 @@
+"""
+Benchmark of the one round-trip bookmark extraction against the per-element path.
+
+It renders a local page with 500 bookmark units and reads it with a real headless
+Chrome, so Chrome and chromedriver have to be installed. Run from the repository root:
+
+    python -m benchmarks.bench_dom_extraction
+"""
+import os
+import tempfile
+import time
+
+from src.scrapping import (
+    setup_driver,
+    extract_bookmarks_script,
+    extract_bookmarks_elements,
+)
+
+UNIT_TEMPLATE = """
+<div class="unit">
+  <a class="poster" href="https://manga-scans.com/manga/title-{n}/">
+    <img src="https://manga-scans.com/wp-content/uploads/title-{n}.jpg">
+  </a>
+  <div class="info">
+    <a href="https://manga-scans.com/manga/title-{n}/">Title {n}</a>
+    <span class="richdata">Chapter {n}</span>
+    <div class="dropdown">{n} hours ago</div>
+  </div>
+</div>
+"""
+
+
+def make_page(units):
+    body = "".join(UNIT_TEMPLATE.format(n=n) for n in range(units))
+    return f"<!DOCTYPE html><html><body><div class='listupd'>{body}</div></body></html>"
+
+
+def timed(label, extract, driver, units):
+    started = time.perf_counter()
+    bookmarks = extract(driver)
+    elapsed = time.perf_counter() - started
+    assert len(bookmarks) == units, f"{label} read {len(bookmarks)} of {units} units"
+    print(f"{label:<12} {elapsed * 1000:9.1f} ms  {elapsed / units * 1000:6.2f} ms/unit")
+    return elapsed
+
+
+def main(units=500):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bookmarks.html")
+        with open(path, "w") as page:
+            page.write(make_page(units))
+
+        driver = setup_driver()
+        try:
+            driver.get(f"file://{path}")
+            script = timed("script", extract_bookmarks_script, driver, units)
+            elements = timed("per-element", extract_bookmarks_elements, driver, units)
+        finally:
+            driver.quit()
+    print(f"speedup      {elements / script:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark of the "last update" parser over 100k strings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_relative_time
+"""
+import random
+import time
+from datetime import datetime, timezone
+
+from src.relative_time import parse_last_update
+
+SAMPLES = [
+    "just now",
+    "{n} min ago",
+    "{n} mins ago",
+    "{n} hours ago",
+    "an hour ago",
+    "yesterday",
+    "{n} days ago",
+    "{n} week ago",
+    "{n} months ago",
+    "{n} years ago",
+    "December {n}, 2023",
+    "2023-12-{n:02d}",
+    "many time ago",
+]
+
+
+def make_corpus(size, seed=42):
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLES).format(n=rng.randint(1, 28)) for _ in range(size)]
+
+
+def main(size=100_000):
+    corpus = make_corpus(size)
+    now = datetime.now(timezone.utc)
+
+    started = time.perf_counter()
+    parsed = sum(parse_last_update(text, now) is not None for text in corpus)
+    elapsed = time.perf_counter() - started
+
+    print(f"parsed {parsed}/{size} strings in {elapsed * 1000:.1f} ms")
+    print(f"{elapsed / size * 1e6:.2f} us per string")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+End-to-end benchmark of the scraping backends against the offline site emulator.
+
+For 10, 100 and 1000 bookmarks every backend logs in and reads the whole bookmarks
+list from a local emulator of the website, several times. The time of every stage
+comes from the tracing spans, so it shows where a scrape spends its time: Chrome
+startup, login, each bookmarks page and the parsing. The memory the scrape
+allocates is measured with tracemalloc in one more run. The selenium backend needs
+Chrome and chromedriver and is skipped without them. Run from the repository root:
+
+    python -m benchmarks.bench_scrape
+    python -m benchmarks.bench_scrape --backends http --latency 0.1 --json bench.json
+
+With --baseline the results are compared with a previous --json file, and the
+benchmark exits with status 1 when a scrape got slower or bigger than the tolerance
+allows, so a regression shows up before deploy.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.site_emulator import SiteEmulator
+
+SIZES = [10, 100, 1000]
+BACKENDS = ["http", "selenium"]
+
+
+class SpanCollector:
+    """
+    A trace exporter keeping the spans in memory.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+def stage_times(spans):
+    """
+    The stage_times function adds up the spans of a trace by stage. A stage is the
+    path of span names below the root, so the page requests of a scrape are told
+    apart from the first page fetched before it.
+
+    :param spans: The spans of one trace
+    :return: A dictionary from stage path to (seconds, calls), in start order
+    """
+    by_id = {span.span_id: span for span in spans}
+
+    def path(span):
+        names = []
+        while span.parent_id in by_id:
+            names.append(span.name)
+            span = by_id[span.parent_id]
+        return tuple(reversed(names))
+
+    stages = {}
+    for span in sorted(spans, key=lambda span: span.start_ns):
+        key = path(span)
+        if key:
+            seconds, calls = stages.get(key, (0, 0))
+            stages[key] = (seconds + span.duration, calls + 1)
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    """
+    The compare function finds the scrapes that got slower or use more memory than in
+    a baseline.
+
+    :param results: The results of this run
+    :param baseline: The results of a previous run
+    :param tolerance: How much worse a measure may get, 0.25 for 25%
+    :return: A list of messages, empty without regressions
+    """
+    regressions = []
+    for backend, sizes in results.items():
+        for size, result in sizes.items():
+            previous = baseline.get(backend, {}).get(size)
+            if previous is None:
+                continue
+            for measure in ("total_ms", "peak_memory_kb"):
+                if result[measure] > previous[measure] * (1 + tolerance):
+                    regressions.append(
+                        f"{backend} {size} bookmarks: {measure} {previous[measure]:.1f} -> "
+                        f"{result[measure]:.1f}"
+                    )
+    return regressions
+
+
+def run_backend(name, site, sizes, repeat):
+    """
+    The run_backend function benchmarks one backend at every size.
+
+    :param name: The name of the backend
+    :param site: The running SiteEmulator the scrapers point at
+    :param sizes: The numbers of bookmarks
+    :param repeat: The timed runs per size
+    :return: A dictionary from size to its result
+    """
+    # Imported late, the scrapers read MANGA_WEB_SITE when they are imported
+    from src.backends import get_backend
+    from src.metrics import resident_memory
+    from src.session_store import clear_session
+    from src.tracing import tracer
+
+    collector = SpanCollector()
+    exporter, tracer.exporter = tracer.exporter, collector
+    backend = get_backend(name)
+
+    def scrape():
+        # Every run logs in, like the first check of an account
+        clear_session(site.username, site.password)
+        collector.spans = []
+        with tracer.span("scrape"):
+            bookmarks = backend.fetch_bookmarks(site.username, site.password)
+        if len(bookmarks) != site.bookmarks:
+            raise RuntimeError(f"Read {len(bookmarks)} of {site.bookmarks} bookmarks")
+        return stage_times(collector.spans)
+
+    results = {}
+    try:
+        for size in sizes:
+            results[str(size)] = measure(scrape, site, size, repeat, resident_memory)
+    finally:
+        tracer.exporter = exporter
+    return results
+
+
+def measure(scrape, site, size, repeat, resident_memory):
+    """
+    The measure function times the scrapes of one size and measures their memory.
+
+    :param scrape: The function scraping the emulator once and returning its stages
+    :param site: The SiteEmulator
+    :param size: The number of bookmarks
+    :param repeat: The timed runs
+    :param resident_memory: The function reading the resident memory of the process
+    :return: The result of the size
+    """
+    site.bookmarks = size
+    # One untimed run, so the first size does not pay for imports and connections
+    scrape()
+    rss_before = resident_memory() or 0
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stages = scrape()
+        runs.append((time.perf_counter() - started, stages))
+    rss = (resident_memory() or 0) - rss_before
+
+    tracemalloc.start()
+    scrape()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stages = defaultdict(list)
+    for _, run_stages in runs:
+        for key, (seconds, calls) in run_stages.items():
+            stages[key].append((seconds, calls))
+    return {
+        "pages": site.page_count,
+        "total_ms": statistics.median(total for total, _ in runs) * 1000,
+        "stages": {
+            "/".join(key): {
+                "ms": statistics.median(seconds for seconds, _ in values) * 1000,
+                "calls": values[-1][1],
+            }
+            for key, values in stages.items()
+        },
+        "peak_memory_kb": peak / 1024,
+        "rss_growth_kb": rss / 1024,
+    }
+
+
+def print_results(backend, results, latency):
+    for size, result in results.items():
+        print(
+            f"{backend} backend, {size} bookmarks in {result['pages']} pages, "
+            f"{latency * 1000:.0f} ms latency per request"
+        )
+        print(f"  {'stage':<40} {'ms':>9} {'calls':>6}")
+        for path, stage in result["stages"].items():
+            depth = path.count("/")
+            label = "  " * depth + path.rsplit("/", 1)[-1]
+            print(f"  {label:<40} {stage['ms']:9.1f} {stage['calls']:6d}")
+        print(f"  {'total':<40} {result['total_ms']:9.1f}")
+        print(
+            f"  peak Python memory {result['peak_memory_kb']:.0f} KB, "
+            f"resident memory {result['rss_growth_kb']:+.0f} KB\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per size")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--page-size", type=int, default=50, help="bookmarks per page")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with SiteEmulator(page_size=args.page_size, latency=args.latency) as site, \
+            tempfile.TemporaryDirectory() as data_dir:
+        os.environ["MANGA_WEB_SITE"] = site.base_url
+        # Saved sessions stay out of the working tree
+        os.environ["DATA_DIR"] = data_dir
+        for backend in args.backends:
+            try:
+                results[backend] = run_backend(backend, site, args.sizes, args.repeat)
+            except Exception as e:
+                if backend != "selenium":
+                    raise
+                print(f"selenium backend skipped: {e}\n")
+                continue
+            print_results(backend, results[backend], args.latency)
+        if "selenium" in results:
+            from src.driver_pool import driver_pool
+
+            driver_pool.close()
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
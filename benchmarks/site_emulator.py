@@ -0,0 +1,349 @@
+"""
+An offline emulator of manga-scans.com for the benchmarks and the end-to-end tests.
+
+It serves the WordPress login form (user_login, user_pass, wp-submit), answers the
+form with a session cookie and serves the bookmarks list, split in pages like the
+real website, with a configurable number of bookmarks and a delay on every request
+to stand in for the network. Point the bot at it with MANGA_WEB_SITE:
+
+    with SiteEmulator(bookmarks=100, latency=0.05) as site:
+        os.environ["MANGA_WEB_SITE"] = site.base_url
+"""
+import html
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+SESSION_COOKIE = "wordpress_logged_in_emulator"
+# The smallest valid GIF, served for every cover image
+COVER = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00"
+    b"\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+LAST_UPDATES = ["{n} mins ago", "{n} hours ago", "an hour ago", "{n} days ago", "yesterday"]
+
+_BOOKMARKS_PAGE_RE = re.compile(r"^/bookmarks/(?:page/(\d+)/)?$")
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="en-US">
+<head><meta charset="UTF-8"><title>Login - Manga Scans</title></head>
+<body class="page login">
+<div class="container">
+  {error}
+  <form name="loginform" id="loginform" action="{base}/wp-login.php" method="post">
+    <p class="login-username">
+      <label for="user_login">Username or Email Address</label>
+      <input type="text" name="log" id="user_login" class="input" value="" size="20">
+    </p>
+    <p class="login-password">
+      <label for="user_pass">Password</label>
+      <input type="password" name="pwd" id="user_pass" class="input" value="" size="20">
+    </p>
+    <p class="login-remember"><label><input name="rememberme" type="checkbox" id="rememberme" value="forever"> Remember Me</label></p>
+    <p class="login-submit">
+      <input type="submit" name="wp-submit" id="wp-submit" class="button button-primary" value="Log In">
+      <input type="hidden" name="redirect_to" value="{redirect_to}">
+    </p>
+  </form>
+</div>
+</body>
+</html>
+"""
+
+BOOKMARKS_PAGE = """<!DOCTYPE html>
+<html lang="en-US">
+<head><meta charset="UTF-8"><title>Bookmarks - Manga Scans</title></head>
+<body class="page bookmarks logged-in">
+<div class="container">
+  <div class="listupd">
+{units}
+  </div>
+  {pagination}
+</div>
+</body>
+</html>
+"""
+
+UNIT = """    <div class="unit item-{n}">
+      <a class="poster" href="{base}/manga/title-{n}/">
+        <img src="{base}/wp-content/uploads/title-{n}.gif" alt="Title {n}">
+      </a>
+      <div class="info">
+        <a href="{base}/manga/title-{n}/">Title {n}</a>
+        <span class="richdata">Chapter {chapter}</span>
+        {dropdown}
+      </div>
+    </div>"""
+
+
+class SiteEmulator:
+    """
+    The SiteEmulator is a local web server behaving like manga-scans.com. Every
+    request waits latency seconds before it is answered, and the number of requests
+    per path is kept in requests. The bookmarks, the page size and the latency can be
+    changed while it runs.
+    """
+
+    def __init__(
+        self,
+        bookmarks=10,
+        page_size=50,
+        latency=0,
+        username="reader",
+        password="secret",
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.bookmarks = bookmarks
+        self.page_size = page_size
+        self.latency = latency
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.requests = Counter()
+        self._sessions = set()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        The base_url property is the address of the emulator, for MANGA_WEB_SITE.
+
+        :return: The url without a trailing slash
+        """
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def page_count(self):
+        """
+        The page_count property tells how many pages the bookmarks list has.
+
+        :return: The number of pages, at least 1
+        """
+        return max(1, -(-self.bookmarks // self.page_size))
+
+    def url(self, path):
+        """
+        The url function returns the address of a path on the emulator.
+
+        :param path: The path, for example /login
+        :return: The url
+        """
+        return self.base_url + path
+
+    def start(self):
+        """
+        The start function starts serving on a background thread.
+
+        :return: The SiteEmulator
+        """
+        emulator = self
+
+        class Handler(EmulatorRequestHandler):
+            site = emulator
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            # Check often for stop, so it does not take half a second
+            kwargs={"poll_interval": 0.05},
+            name="site-emulator",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        The stop function stops the server.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def log_in(self, username, password):
+        """
+        The log_in function checks credentials and opens a session.
+
+        :param username: The submitted login
+        :param password: The submitted password
+        :return: The session token, or None if the credentials are wrong
+        """
+        if username != self.username or password != self.password:
+            return None
+        token = secrets.token_hex(16)
+        self._sessions.add(token)
+        return token
+
+    def is_logged_in(self, token):
+        """
+        The is_logged_in function checks a session token.
+
+        :param token: The value of the session cookie
+        :return: True if the session is open
+        """
+        return token in self._sessions
+
+    def login_page(self, redirect_to=None, error=False):
+        """
+        The login_page function renders the login form.
+
+        :param redirect_to: Where the form sends the browser after logging in
+        :param error: Show the error of a failed login
+        :return: The markup
+        """
+        return LOGIN_PAGE.format(
+            base=self.base_url,
+            redirect_to=html.escape(redirect_to or self.url("/bookmarks/")),
+            error='<div id="login_error">Unknown username or password.</div>' if error else "",
+        )
+
+    def bookmarks_page(self, page):
+        """
+        The bookmarks_page function renders a page of the bookmarks list, with the
+        pagination block WordPress shows: the first pages, the last one and Next.
+
+        :param page: The page number, starting at 1
+        :return: The markup, or None past the last page
+        """
+        if page < 1 or page > self.page_count:
+            return None
+        start = (page - 1) * self.page_size
+        units = []
+        for n in range(start + 1, min(start + self.page_size, self.bookmarks) + 1):
+            # Some titles have no update date, like on the real website
+            dropdown = (
+                ""
+                if n % 7 == 0
+                else f'<div class="dropdown">{LAST_UPDATES[n % 5].format(n=n % 23 + 2)}</div>'
+            )
+            units.append(UNIT.format(base=self.base_url, n=n, chapter=n % 300 + 1, dropdown=dropdown))
+
+        pagination = ""
+        if self.page_count > 1:
+            shown = sorted({1, 2, 3, page, self.page_count} & set(range(1, self.page_count + 1)))
+            # The current page is not a link, as on WordPress
+            links = [
+                f'<span aria-current="page" class="page-numbers current">{number}</span>'
+                if number == page
+                else f'<a class="page-numbers" href="{self.url(page_path(number))}">{number}</a>'
+                for number in shown
+            ]
+            if page < self.page_count:
+                links.append(
+                    f'<a class="next page-numbers" href="{self.url(page_path(page + 1))}">Next »</a>'
+                )
+            pagination = f'<div class="pagination">{"".join(links)}</div>'
+        return BOOKMARKS_PAGE.format(units="\n".join(units), pagination=pagination)
+
+
+def page_path(page):
+    """
+    The page_path function returns the path of a page of the bookmarks list.
+
+    :param page: The page number, starting at 1
+    :return: The path
+    """
+    return "/bookmarks/" if page <= 1 else f"/bookmarks/page/{page}/"
+
+
+class EmulatorRequestHandler(BaseHTTPRequestHandler):
+    """
+    The EmulatorRequestHandler answers the requests of one connection for a
+    SiteEmulator.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in two writes, without this the client waits for a
+    # delayed ACK on every response and the emulator adds 40 ms of its own
+    disable_nagle_algorithm = True
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/html; charset=UTF-8", headers=()):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location, headers=()):
+        self._send(302, headers=[("Location", location), *headers])
+
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+
+    def _begin(self):
+        path = urlsplit(self.path).path
+        self.site.requests[(self.command, path)] += 1
+        if self.site.latency and not path.startswith("/wp-content/"):
+            time.sleep(self.site.latency)
+        return path
+
+    def do_GET(self):
+        path = self._begin()
+        if path == "/login":
+            redirect_to = parse_qs(urlsplit(self.path).query).get("redirect_to", [None])[0]
+            self._send(200, self.site.login_page(redirect_to))
+            return
+        if path.startswith("/wp-content/uploads/"):
+            self._send(200, COVER, "image/gif")
+            return
+        match = _BOOKMARKS_PAGE_RE.match(path)
+        if match is None:
+            self._send(404, "Not Found", "text/plain")
+            return
+        if not self.site.is_logged_in(self._session()):
+            self._redirect(self.site.url(f"/login?redirect_to={quote(self.site.url(path))}"))
+            return
+        markup = self.site.bookmarks_page(int(match.group(1) or 1))
+        if markup is None:
+            self._send(404, "Not Found", "text/plain")
+            return
+        self._send(200, markup)
+
+    def do_POST(self):
+        path = self._begin()
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        if path != "/wp-login.php":
+            self._send(404, "Not Found", "text/plain")
+            return
+
+        def field(name):
+            return form.get(name, [""])[0]
+
+        token = self.site.log_in(field("log"), field("pwd"))
+        if token is None:
+            self._send(200, self.site.login_page(field("redirect_to"), error=True))
+            return
+        self._redirect(
+            field("redirect_to") or self.site.url("/bookmarks/"),
+            [("Set-Cookie", f"{SESSION_COOKIE}={token}; Path=/; HttpOnly")],
+        )
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    chat_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    registered_at REAL NOT NULL
+);
+"""
+
+
+def account_key(username, password):
+    """
+    The account_key function names the data kept for a website account: its session,
+    its cached bookmarks, its snapshots and its chapter history. The password is part
+    of the key, so a chat that only knows the login of an account never gets the data
+    of the chats that logged in with it.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: The login followed by a hash of the password
+    """
+    digest = hashlib.sha256(password.encode("utf-8")).hexdigest()[:16]
+    return f"{username}:{digest}"
+
+
+class Account(namedtuple("Account", ["chat_id", "username", "password"])):
+    """
+    The website credentials registered by a Telegram chat.
+    """
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """
+        The key property names the data kept for the account, see account_key.
+
+        :return: The account key
+        """
+        return account_key(self.username, self.password)
+
+
+class AccountStore:
+    """
+    The AccountStore is an embedded SQLite database that maps every Telegram chat to
+    the website account it registered with /register. The database file holds
+    passwords, so it is only readable by the bot user.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+            # Create the file with owner-only permissions before SQLite opens it
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def register(self, chat_id, username, password):
+        """
+        The register function stores the credentials of a chat, replacing the ones it
+        registered before.
+
+        :param chat_id: The Telegram chat id
+        :param username: The login of the account on the website
+        :param password: The password of the account on the website
+        :return: The stored Account
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO accounts (chat_id, username, password, registered_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (chat_id) DO UPDATE SET
+                    username = excluded.username,
+                    password = excluded.password,
+                    registered_at = excluded.registered_at
+                """,
+                (chat_id, username, password, time.time()),
+            )
+        logger.info(f"Registered an account for chat {chat_id}.")
+        return Account(chat_id, username, password)
+
+    def get(self, chat_id):
+        """
+        The get function returns the account registered by a chat.
+
+        :param chat_id: The Telegram chat id
+        :return: An Account, or None if the chat did not register
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chat_id, username, password FROM accounts WHERE chat_id = ?",
+                (chat_id,),
+            ).fetchone()
+        return Account(*row) if row else None
+
+    def remove(self, chat_id):
+        """
+        The remove function forgets the account of a chat.
+
+        :param chat_id: The Telegram chat id
+        :return: True if the chat had registered an account
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM accounts WHERE chat_id = ?", (chat_id,)
+            )
+        return cursor.rowcount > 0
+
+    def all(self):
+        """
+        The all function lists every registered account, oldest registration first.
+
+        :return: A list of Account tuples
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chat_id, username, password FROM accounts "
+                "ORDER BY registered_at, chat_id"
+            ).fetchall()
+        return [Account(*row) for row in rows]
+
+    def close(self):
+        """
+        The close function closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_account_store():
+    """
+    The get_account_store function returns the account store kept in DATA_DIR.
+
+    :return: An AccountStore instance
+    """
+    path = os.path.join(os.getenv("DATA_DIR", "data"), "accounts.sqlite3")
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = AccountStore(path)
+        return _stores[path]
+
+
+def operator_account():
+    """
+    The operator_account function returns the account configured with the
+    WORK_USER_LOGIN and WORK_USER_PASSWORD environment variables, which belongs to
+    the SCHEDULE_CHAT_ID chat.
+
+    :return: An Account, or None if it is not fully configured
+    """
+    chat_id = os.getenv("SCHEDULE_CHAT_ID")
+    username = os.getenv("WORK_USER_LOGIN")
+    password = os.getenv("WORK_USER_PASSWORD")
+    if not (chat_id and username and password):
+        return None
+    try:
+        return Account(int(chat_id), username, password)
+    except ValueError:
+        logger.warning("SCHEDULE_CHAT_ID is not a chat id, ignoring the operator account.")
+        return None
+
+
+def account_for_chat(chat_id):
+    """
+    The account_for_chat function returns the account a chat scrapes with: the one it
+    registered, or the operator account for the operator's own chat.
+
+    :param chat_id: The Telegram chat id
+    :return: An Account, or None if the chat has no account
+    """
+    account = get_account_store().get(chat_id)
+    if account:
+        return account
+    operator = operator_account()
+    if operator and operator.chat_id == chat_id:
+        return operator
+    return None
+
+
+def all_accounts():
+    """
+    The all_accounts function lists every account the scheduled checks cover, the
+    registered ones and the operator account when its chat did not register.
+
+    :return: A list of Account tuples
+    """
+    accounts = get_account_store().all()
+    operator = operator_account()
+    if operator and all(account.chat_id != operator.chat_id for account in accounts):
+        accounts.insert(0, operator)
+    return accounts
@@ -0,0 +1,154 @@
+import logging
+import os
+
+from src import http_scrapping
+from src.scrapping import (
+    login,
+    scrape_bookmarks,
+    inject_cookies,
+    clear_cookies,
+    is_login_page,
+)
+from src.driver_pool import driver_pool
+from src.session_store import load_session, save_session
+from src.site import BOOKMARKS_URL
+
+logger = logging.getLogger(__name__)
+
+
+class LoginFailed(Exception):
+    """
+    Raised when the website still shows its login form after logging in, usually
+    because the password of the account changed.
+    """
+
+
+class ScrapeBackend:
+    """
+    A ScrapeBackend knows how to log into the website and read the bookmarks of an
+    account. Every backend returns the same list of bookmark dictionaries with the
+    keys title, link, chapter_title, last_update and image.
+    """
+
+    name = None
+
+    def fetch_bookmarks(self, username, password):
+        """
+        The fetch_bookmarks function returns all of the bookmarks of the account.
+
+        :param username: The login of the account on the website
+        :param password: The password of the account on the website
+        :return: A list of dictionaries
+        :raises LoginFailed: The website did not accept the credentials
+        """
+        raise NotImplementedError
+
+    def log_in(self, username, password):
+        """
+        The log_in function logs into the website with the credentials and keeps the
+        session for the next scrape.
+
+        :param username: The login of the account on the website
+        :param password: The password of the account on the website
+        :return: True if the website accepted the credentials
+        """
+        raise NotImplementedError
+
+
+class SeleniumBackend(ScrapeBackend):
+    """
+    The SeleniumBackend drives a headless Chrome borrowed from the driver pool.
+    """
+
+    name = "selenium"
+
+    def __init__(self, pool=None):
+        self.pool = pool or driver_pool
+
+    def fetch_bookmarks(self, username, password):
+        with self.pool.driver() as driver:
+            # Pooled drivers still carry the cookies of their previous scrape
+            clear_cookies(driver)
+            cookies = load_session(username, password)
+            if cookies:
+                inject_cookies(driver, cookies)
+                bookmarks = scrape_bookmarks(driver)
+                if not is_login_page(driver):
+                    return bookmarks
+                logger.info("Saved session has expired, logging in again.")
+                clear_cookies(driver)
+
+            login(driver, username, password)
+            bookmarks = scrape_bookmarks(driver)
+            if is_login_page(driver):
+                raise LoginFailed("Login failed, the website still shows the login form.")
+            save_session(username, password, driver.get_cookies())
+        return bookmarks
+
+    def log_in(self, username, password):
+        with self.pool.driver() as driver:
+            clear_cookies(driver)
+            login(driver, username, password)
+            # The bookmarks page sends a browser without a session to the login form
+            driver.get(BOOKMARKS_URL)
+            if is_login_page(driver):
+                return False
+            save_session(username, password, driver.get_cookies())
+        return True
+
+
+class HttpBackend(ScrapeBackend):
+    """
+    The HttpBackend reads the bookmarks page with plain HTTP requests and parses the
+    markup, no browser involved.
+    """
+
+    name = "http"
+
+    def fetch_bookmarks(self, username, password):
+        with http_scrapping.setup_session() as session:
+            cookies = load_session(username, password)
+            if cookies:
+                http_scrapping.import_cookies(session, cookies)
+                response = http_scrapping.fetch_bookmarks_page(session)
+                if not http_scrapping.is_login_html(response.url, response.text):
+                    return http_scrapping.scrape_all_pages(session, response.text)
+                logger.info("Saved session has expired, logging in again.")
+                session.cookies.clear()
+
+            http_scrapping.login(session, username, password)
+            response = http_scrapping.fetch_bookmarks_page(session)
+            if http_scrapping.is_login_html(response.url, response.text):
+                raise LoginFailed("Login failed, the website still shows the login form.")
+            save_session(username, password, http_scrapping.export_cookies(session))
+            return http_scrapping.scrape_all_pages(session, response.text)
+
+    def log_in(self, username, password):
+        with http_scrapping.setup_session() as session:
+            http_scrapping.login(session, username, password)
+            response = http_scrapping.fetch_bookmarks_page(session)
+            if http_scrapping.is_login_html(response.url, response.text):
+                return False
+            save_session(username, password, http_scrapping.export_cookies(session))
+            return True
+
+
+BACKENDS = {
+    SeleniumBackend.name: SeleniumBackend,
+    HttpBackend.name: HttpBackend,
+}
+
+
+def get_backend(name=None):
+    """
+    The get_backend function creates the scraping backend selected by name, or by the
+    SCRAPE_BACKEND environment variable. The HTTP backend is the default.
+
+    :param name: The name of the backend, http or selenium
+    :return: A ScrapeBackend instance
+    """
+    name = name or os.getenv("SCRAPE_BACKEND", HttpBackend.name)
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown scrape backend: {name}")
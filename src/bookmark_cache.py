@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from src.tracing import tracer
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """
+    The bookmarks of one account together with the moment they were scraped.
+    """
+
+    def __init__(self, bookmarks, fetched_at):
+        self.bookmarks = bookmarks
+        self.fetched_at = fetched_at
+
+
+class BookmarkCache:
+    """
+    The BookmarkCache is a process-wide cache of scraped bookmarks keyed by account.
+
+    Entries younger than ttl seconds are served as they are. Older entries are still
+    served instantly, but a refresh is started in the background so the next reader
+    gets fresh data (stale-while-revalidate). Entries older than max_stale seconds
+    are considered too old to show and are reloaded before returning.
+    """
+
+    def __init__(self, ttl=600, max_stale=86400):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = {}
+        self._generations = {}
+        self._refreshing = {}
+
+    def peek(self, account):
+        """
+        The peek function returns the cached bookmarks of an account without loading.
+
+        :param account: The account the bookmarks belong to
+        :return: A list of dictionaries, or None if nothing is cached
+        """
+        entry = self._entries.get(account)
+        return entry.bookmarks if entry else None
+
+    def set(self, account, bookmarks):
+        """
+        The set function stores freshly scraped bookmarks of an account.
+
+        :param account: The account the bookmarks belong to
+        :param bookmarks: The list of scraped bookmarks
+        :return: None
+        """
+        self._entries[account] = CacheEntry(bookmarks, time.monotonic())
+
+    def invalidate(self, account=None):
+        """
+        The invalidate function drops the cached bookmarks of an account, or of every
+        account if none is given, so the next read scrapes the website again.
+
+        :param account: The account to forget, None forgets all of them
+        :return: None
+        """
+        accounts = [account] if account is not None else list(self._entries)
+        for key in accounts:
+            self._entries.pop(key, None)
+            # Refreshes that started before the invalidation must not repopulate it
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    async def get(self, account, loader):
+        """
+        The get function returns the bookmarks of an account from the cache, loading
+        them with loader when they are missing or too old.
+
+        :param account: The account the bookmarks belong to
+        :param loader: A function without arguments returning an awaitable list of bookmarks
+        :return: A list of dictionaries
+        """
+        entry = self._entries.get(account)
+        age = time.monotonic() - entry.fetched_at if entry else None
+        if entry is None or age >= self.max_stale:
+            return await self._load(account, loader)
+        if age >= self.ttl:
+            self._refresh_in_background(account, loader)
+        return entry.bookmarks
+
+    async def refresh(self, account, loader):
+        """
+        The refresh function loads the bookmarks of an account now, whatever their
+        age in the cache, and caches them.
+
+        :param account: The account the bookmarks belong to
+        :param loader: A function without arguments returning an awaitable list of bookmarks
+        :return: A list of dictionaries
+        """
+        return await self._load(account, loader)
+
+    async def _load(self, account, loader):
+        generation = self._generations.get(account, 0)
+        bookmarks = await loader()
+        if self._generations.get(account, 0) == generation:
+            self.set(account, bookmarks)
+        return bookmarks
+
+    async def _refresh(self, account, loader):
+        # The request that found the stale entry is answered before this ends, the
+        # refresh is a trace of its own rather than a late child of the request's
+        with tracer.span("refresh_bookmarks", parent=None):
+            return await self._load(account, loader)
+
+    def _refresh_in_background(self, account, loader):
+        if account in self._refreshing:
+            return
+        task = asyncio.ensure_future(self._refresh(account, loader))
+        self._refreshing[account] = task
+        task.add_done_callback(lambda done: self._refresh_done(account, done))
+
+    def _refresh_done(self, account, task):
+        self._refreshing.pop(account, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background bookmark refresh failed: {task.exception()}")
+
+
+bookmark_cache = BookmarkCache(
+    ttl=int(os.getenv("BOOKMARK_CACHE_TTL", "600")),
+    max_stale=int(os.getenv("BOOKMARK_CACHE_MAX_STALE", "86400")),
+)
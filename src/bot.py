@@ -1,8 +1,11 @@
+import asyncio
 import logging
 import os
-import threading
-from flask import Flask
+import signal
+from http import HTTPStatus
+from urllib.parse import urlsplit
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,9 +14,25 @@ from telegram.ext import (
 )
 from dotenv import load_dotenv
 
-from src.scrapping import setup_driver, login, scrape_bookmarks
-from src.utils import format_bookmarks_page, format_update_message, check_for_updates
-from src.schedule_utils import run_schedule
+from src.utils import (
+    check_for_updates_async,
+    get_bookmarks,
+    verify_credentials,
+)
+from src.account_store import account_for_chat, get_account_store
+from src.backends import LoginFailed
+from src.bookmark_cache import bookmark_cache
+from src.delivery import deliver_updates
+from src.paginator import get_paginator
+from src.snapshot_store import get_snapshot_store
+from src.persistence import get_persistence
+from src.send_queue import send_queue
+from src.scrape_executor import ScrapeQueueFull
+from src.schedule_utils import schedule_checks
+from src.job_scheduler import job_scheduler
+from src.web_server import Response, WebServer, telegram_webhook, webhook_secret
+from src.metrics import CONTENT_TYPE, HANDLER_SECONDS, REGISTRY
+from src.tracing import KIND_CLIENT, set_attribute, traced, tracer
 
 load_dotenv()
 
@@ -23,25 +42,71 @@ logging.basicConfig(
 )
 
 logger = logging.getLogger(__name__)
-app = Flask(__name__)
 
-username = os.getenv("WORK_USER_LOGIN")
-password = os.getenv("WORK_USER_PASSWORD")
+EXPIRED_LIST = "This list is no longer available, please load it again."
+
+REGISTER_HINT = (
+    "Please register your manga-scans.com account first:\n/register <login> <password>"
+)
+
+web_server = WebServer(port=int(os.getenv("PORT", "8000")))
+
+
+async def health_check(request):
+    """
+    The health_check function answers the health checks of the hosting platform.
+
+    :param request: Request: The HTTP request
+    :return: A Response
+    """
+    return Response(HTTPStatus.OK, "OK")
 
-# Global variable to store the bot's context
-bot_context = None
 
+async def metrics(request):
+    """
+    The metrics function serves the bot's metrics to Prometheus.
 
-@app.route("/health")
-def health_check():
-    return "OK", 200
+    :param request: Request: The HTTP request
+    :return: A Response in the Prometheus text format
+    """
+    return Response(HTTPStatus.OK, REGISTRY.render(), CONTENT_TYPE)
 
 
-def runFlask():
-    app.run(host="0.0.0.0", port=8000, debug=False)
+web_server.route("GET", "/health", health_check)
+web_server.route("GET", "/metrics", metrics)
+
+
+def chat_attributes(update, context=None):
+    """
+    The chat_attributes function gives the trace attributes of an update.
+
+    :param update: Update: The update being handled
+    :param context: CallbackContext: The context of the handler, unused
+    :return: A dictionary with the chat id, when the update has a chat
+    """
+    chat = getattr(update, "effective_chat", None)
+    return {} if chat is None else {"chat.id": chat.id}
+
+
+async def require_account(update):
+    """
+    The require_account function looks up the website account of the chat an update
+    came from, and asks the user to register when there is none.
+
+    :param update: Update: The update to answer
+    :return: An Account, or None if the chat has no account
+    """
+    account = account_for_chat(update.effective_chat.id)
+    if account is None:
+        await send_queue.submit(
+            update.effective_chat.id, update.effective_message.reply_text, REGISTER_HINT
+        )
+    return account
 
 
 # Define the asynchronous start command handler
+@HANDLER_SECONDS.time(handler="start")
+@traced("start", attributes=chat_attributes)
 async def start(update, context):
     """
     The start function is the first function that gets called when a user interacts with the bot.
@@ -63,9 +128,16 @@ async def start(update, context):
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     # Send the greeting message followed by the keyboard
-    await update.message.reply_text(greeting_message, reply_markup=reply_markup)
+    await send_queue.submit(
+        update.message.chat_id,
+        update.message.reply_text,
+        greeting_message,
+        reply_markup=reply_markup,
+    )
 
 
+@HANDLER_SECONDS.time(handler="check_updates")
+@traced("check_updates", attributes=chat_attributes)
 async def check_updates_command(update: Update, context: CallbackContext) -> None:
     """
     The check_updates_command function is a callback function that will be called when the user clicks on the &quot;Check for Updates&quot; button.
@@ -77,16 +149,18 @@ async def check_updates_command(update: Update, context: CallbackContext) -> Non
     :doc-author: Trelent
     """
     query = update.callback_query
-    recent_updates = check_for_updates(username, password)
+    account = await require_account(update)
+    if account is None:
+        return
+    recent_updates = await check_for_updates_async(account.username, account.password)
+    set_attribute("updates.count", len(recent_updates))
 
-    # Now use 'query.message' to send a reply
-    for manga_update in recent_updates:
-        message = format_update_message(manga_update)
-        await query.message.reply_photo(
-            photo=manga_update["image"], caption=message, parse_mode="HTML"
-        )
+    # Reply in the chat of 'query.message', ten covers per media group
+    await deliver_updates(context.bot, query.message.chat_id, recent_updates)
 
 
+@HANDLER_SECONDS.time(handler="list_bookmarks")
+@traced("list_bookmarks", attributes=chat_attributes)
 async def list_bookmarks_command(update: Update, context: CallbackContext) -> None:
     """
     The list_bookmarks_command function is a callback function that will be called when the user clicks on the &quot;List Bookmarks&quot; button.
@@ -97,21 +171,122 @@ async def list_bookmarks_command(update: Update, context: CallbackContext) -> No
     :return: None, so you need to remove the return statement
     """
     query = update.callback_query  # Get the callback query from the update
-    driver = setup_driver()  # Function to set up the Selenium driver
-    login(driver, username, password)
-    bookmarks = scrape_bookmarks(driver)
-    logging.info("Got all bookmarks.")
-    driver.quit()
-
-    # You should save the bookmarks to the user_data to be used in pagination
-    context.user_data["bookmarks"] = bookmarks
+    account = await require_account(update)
+    if account is None:
+        return
+    bookmarks = await get_bookmarks(account.username, account.password)
+    set_attribute("bookmarks.count", len(bookmarks))
+
+    # Store the snapshot, the page buttons only carry its version
+    version = await asyncio.to_thread(
+        get_snapshot_store().save, account.key, bookmarks
+    )
 
     # Now use 'query.message' to send a reply
     await send_paginated_bookmarks(
-        query.message, context, bookmarks, page=0, page_size=10
+        query.message, context, bookmarks, page=0, version=version
+    )
+
+
+@HANDLER_SECONDS.time(handler="refresh")
+@traced("refresh", attributes=chat_attributes)
+async def refresh_command(update: Update, context: CallbackContext) -> None:
+    """
+    The refresh_command function drops the cached bookmarks of the account, so the next
+    update check or bookmark list scrapes the website again.
+
+    :param update: Update: Get the update object from the command
+    :param context: CallbackContext: Pass the context of the function
+    :return: None
+    """
+    account = await require_account(update)
+    if account is None:
+        return
+    bookmark_cache.invalidate(account.key)
+    await send_queue.submit(
+        update.effective_chat.id,
+        update.message.reply_text,
+        "Your bookmarks will be fetched fresh from the website next time.",
     )
 
 
+@HANDLER_SECONDS.time(handler="register")
+@traced("register", attributes=chat_attributes)
+async def register_command(update: Update, context: CallbackContext) -> None:
+    """
+    The register_command function stores the website credentials of the chat, given as
+    /register <login> <password>, once a login on the website accepted them. The
+    message holding the password is deleted right away.
+
+    :param update: Update: Get the update object from the command
+    :param context: CallbackContext: Holds the command arguments
+    :return: None
+    """
+    if len(context.args or []) != 2:
+        await send_queue.submit(
+            update.effective_chat.id,
+            update.message.reply_text,
+            "Usage: /register <login> <password>",
+        )
+        return
+    login, password = context.args
+    try:
+        # Do not leave the password in the chat history
+        with tracer.span("telegram.delete_message", kind=KIND_CLIENT):
+            await update.message.delete()
+    except TelegramError as e:
+        logger.info(f"Could not delete the /register message: {e}")
+
+    chat_id = update.effective_chat.id
+    try:
+        verified = await verify_credentials(login, password)
+    except ScrapeQueueFull:
+        raise
+    except Exception as e:
+        logger.warning(f"Could not check the credentials of chat {chat_id}: {e}")
+        await send_queue.submit(
+            chat_id,
+            update.effective_chat.send_message,
+            "Could not reach the website to check the account, please try again later.",
+        )
+        return
+    if not verified:
+        await send_queue.submit(
+            chat_id,
+            update.effective_chat.send_message,
+            f"The website did not accept the password of {login}, the account was not registered.",
+        )
+        return
+
+    previous = get_account_store().get(chat_id)
+    account = get_account_store().register(chat_id, login, password)
+    if previous and previous.key != account.key:
+        bookmark_cache.invalidate(previous.key)
+    await send_queue.submit(
+        chat_id,
+        update.effective_chat.send_message,
+        f"Registered the account {login}. Your bookmarks are now checked for updates."
+    )
+
+
+@HANDLER_SECONDS.time(handler="unregister")
+@traced("unregister", attributes=chat_attributes)
+async def unregister_command(update: Update, context: CallbackContext) -> None:
+    """
+    The unregister_command function forgets the website credentials of the chat.
+
+    :param update: Update: Get the update object from the command
+    :param context: CallbackContext: Pass the context of the function
+    :return: None
+    """
+    chat_id = update.effective_chat.id
+    if get_account_store().remove(chat_id):
+        reply = "Your account has been removed."
+    else:
+        reply = "There is no account registered for this chat."
+    await send_queue.submit(chat_id, update.message.reply_text, reply)
+
+
 async def error(update: Update, context: CallbackContext) -> None:
     """
     The error function is called when a telegram update causes an error.
@@ -123,49 +298,32 @@ async def error(update: Update, context: CallbackContext) -> None:
     :param context: CallbackContext: Pass the context in which a handler is being run
     :return: None
     """
-    logger.warning('Update "%s" caused error "%s"', update, context.error)
-
-
-def create_pagination_buttons(current_page, total_pages):
-    """
-    The create_pagination_buttons function creates a list of InlineKeyboardButtons
-    for pagination. It takes two arguments: current_page and total_pages.
-    current_page is the page number that the user is currently viewing, while total_pages
-    is the maximum number of pages available for pagination (i.e., if there are 100 items,
-    and each page can display 10 items at most, then there will be 10 pages). The function
-    returns an InlineKeyboardMarkup object containing a list of buttons to be displayed in
-    the Telegram chat window.
-
-    :param current_page: Determine which page we are on
-    :param total_pages: Know how many pages there are in total
-    :return: An inlinekeyboardmarkup object
-    """
-    button_list = []
-    if total_pages == 0:
-        return InlineKeyboardMarkup([])
-    # 'Previous' button if not on the first page
-    if current_page > 0:
-        button_list.append(
-            InlineKeyboardButton(
-                "⬅️ Previous", callback_data=f"prev_{current_page - 1}"
+    if isinstance(context.error, ScrapeQueueFull):
+        # Too many scrapes are in flight, ask the user to come back later
+        logger.info("Scrape rejected, the scrape queue is full.")
+        if isinstance(update, Update) and update.effective_message:
+            await send_queue.submit(
+                update.effective_chat.id,
+                update.effective_message.reply_text,
+                "The bot is busy right now, please try again in a minute.",
             )
-        )
-    # Current page button (disabled)
-    button_list.append(
-        InlineKeyboardButton(
-            f"Page {current_page + 1} of {total_pages}", callback_data="noop"
-        )
-    )
-    # 'Next' button if not on the last page
-    if current_page < total_pages - 1:
-        button_list.append(
-            InlineKeyboardButton("Next ➡️", callback_data=f"next_{current_page + 1}")
-        )
-    return InlineKeyboardMarkup([button_list])
+        return
+    if isinstance(context.error, LoginFailed):
+        # The password of the account changed on the website since it was registered
+        logger.info("Scrape failed, the website did not accept the account.")
+        if isinstance(update, Update) and update.effective_message:
+            await send_queue.submit(
+                update.effective_chat.id,
+                update.effective_message.reply_text,
+                "The website did not accept the password of your account, "
+                "please /register it again.",
+            )
+        return
+    logger.warning('Update "%s" caused error "%s"', update, context.error)
 
 
 async def send_paginated_bookmarks(
-    message: Message, context: CallbackContext, bookmarks, page=0, page_size=10
+    message: Message, context: CallbackContext, bookmarks, page=0, version=None
 ):
     """
     The send_paginated_bookmarks function sends a paginated list of bookmarks to the user.
@@ -174,16 +332,13 @@ async def send_paginated_bookmarks(
     :param context: CallbackContext: Pass the context of the callback query to this function
     :param bookmarks: Get the bookmarks to be displayed
     :param page: Determine which page of bookmarks to display
-    :param page_size: Determine how many bookmarks to display per page
+    :param version: The version of the stored snapshot the bookmarks come from
     :return: The formatted_message
     """
-    # Avoid division by zero if there are no bookmarks
-    total_pages = max(
-        1, len(bookmarks) // page_size + (1 if len(bookmarks) % page_size else 0)
-    )
-    formatted_message = await format_bookmarks_page(bookmarks, page, page_size)
-    reply_markup = create_pagination_buttons(page, total_pages)
-    await message.reply_text(
+    formatted_message, reply_markup = get_paginator(bookmarks, version).page(page)
+    await send_queue.submit(
+        message.chat_id,
+        message.reply_text,
         formatted_message,
         reply_markup=reply_markup,
         parse_mode="HTML",
@@ -191,6 +346,8 @@ async def send_paginated_bookmarks(
     )
 
 
+@HANDLER_SECONDS.time(handler="button")
+@traced("button", attributes=chat_attributes)
 async def button(update: Update, context: CallbackContext) -> None:
     """
     The button function is used to handle the callback queries from the inline keyboard.
@@ -200,7 +357,8 @@ async def button(update: Update, context: CallbackContext) -> None:
     :return: None
     """
     query = update.callback_query
-    await query.answer()
+    with tracer.span("telegram.answer_callback_query", kind=KIND_CLIENT):
+        await query.answer()
 
     data = query.data
 
@@ -208,63 +366,177 @@ async def button(update: Update, context: CallbackContext) -> None:
     if data == "get_update":
         await check_updates_command(update, context)
     elif data == "get_all_list":
-        # Perform the scraping only if the bookmarks are not already stored.
-        if "bookmarks" not in context.user_data:
-            driver = setup_driver()
-            login(driver, username, password)
-            context.user_data["bookmarks"] = scrape_bookmarks(driver)
-            driver.quit()
-
-        await send_paginated_bookmarks(
-            query.message, context, context.user_data["bookmarks"], page=0, page_size=10
-        )
+        # The shared bookmark cache only scrapes when its copy is missing or too old.
+        await list_bookmarks_command(update, context)
+
+    # If the user is navigating the pages, read the snapshot named by the button.
+    elif data.startswith("p:"):
+        _, version, page_str = data.split(":")
+        await show_page(update, version, int(page_str))
 
-    # If the user is navigating the pages, use the stored data.
+    # Buttons sent before pages were versioned
     elif data.startswith("prev_") or data.startswith("next_"):
-        # Extract the action and page number from the callback data
         action, page_str = data.split("_")
-        page = int(page_str)
-        bookmarks = context.user_data.get("bookmarks", [])
-
-        # Pagination logic
-        if action in ["prev", "next"]:
-            # Edit the message to the new page of bookmarks
-            message = await format_bookmarks_page(bookmarks, page, page_size=10)
-            reply_markup = create_pagination_buttons(
-                page,
-                total_pages=len(bookmarks) // 10 + (1 if len(bookmarks) % 10 else 0),
-            )
-            await query.edit_message_text(
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode="HTML",
-                disable_web_page_preview=True,  # Add this to disable web page previews
+        await show_page(update, None, int(page_str))
+
+
+async def show_page(update: Update, version, page) -> None:
+    """
+    The show_page function edits a bookmarks message to show another page of the same
+    snapshot. The snapshot comes from memory or disk, never from a new scrape. When
+    the snapshot is gone, the newest stored list of the account is shown instead.
+
+    :param update: Update: The callback query update of the page button
+    :param version: The snapshot version from the button, or None
+    :param page: The page to show
+    :return: None
+    """
+    query = update.callback_query
+    store = get_snapshot_store()
+    bookmarks = await asyncio.to_thread(store.load, version) if version else None
+    if bookmarks is None:
+        account = await require_account(update)
+        if account is None:
+            return
+        latest = await asyncio.to_thread(store.latest, account.key)
+        if latest is None:
+            await send_queue.submit(
+                query.message.chat_id,
+                query.edit_message_text,
+                text=EXPIRED_LIST,
+                reply_markup=InlineKeyboardMarkup(
+                    [[InlineKeyboardButton("Get My Manga List", callback_data="get_all_list")]]
+                ),
             )
+            return
+        version, bookmarks = latest
+
+    # The page was rendered before, or is rendered once for every chat
+    message, reply_markup = get_paginator(bookmarks, version).page(page)
+    await send_queue.submit(
+        query.message.chat_id,
+        query.edit_message_text,
+        text=message,
+        reply_markup=reply_markup,
+        parse_mode="HTML",
+        disable_web_page_preview=True,  # Add this to disable web page previews
+    )
 
 
-def run_bot() -> None:
+async def post_init(application) -> None:
     """
-    The run_bot function is the main function of this bot. It initializes the bot and starts it.
+    The post_init function runs once the Application is initialized. It lets the
+    persistence evict the data of idle users and chats from the Application, and
+    starts the scheduled jobs and the web server on the bot's event loop.
 
-    :return: None so the return type should be none
+    :param application: The telegram Application
+    :return: None
     """
-    bot_token = os.getenv("BOT_TOKEN")
-    application = Application.builder().token(bot_token).build()
+    application.persistence.bind(application)
+    schedule_checks(application.bot)
+    job_scheduler.start()
+    await web_server.start()
+
+
+async def post_shutdown(application) -> None:
+    """
+    The post_shutdown function stops the scheduled jobs and the web server when the
+    bot shuts down, and writes out the traces still open.
+
+    :param application: The telegram Application
+    :return: None
+    """
+    await job_scheduler.stop()
+    await web_server.stop()
+    tracer.shutdown()
+
+
+async def run_webhook(application, webhook_url, secret_token) -> None:
+    """
+    The run_webhook function runs the bot in webhook mode: Telegram posts every update
+    to the web server instead of the bot long-polling for them. It runs until the
+    process gets SIGINT or SIGTERM.
+
+    :param application: The telegram Application
+    :param webhook_url: The public url of the webhook path
+    :param secret_token: The secret token Telegram sends with every update
+    :return: None
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    web_server.route(
+        "POST", urlsplit(webhook_url).path or "/", telegram_webhook(application, secret_token)
+    )
+    await application.initialize()
+    try:
+        await application.post_init(application)
+        await application.bot.set_webhook(
+            webhook_url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+        )
+        await application.start()
+        logger.info("Receiving updates through the webhook.")
+        await stop.wait()
+    finally:
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+
+
+def build_application(bot_token):
+    """
+    The build_application function builds the telegram Application and registers the
+    handlers. Updates are handled concurrently, so a chat waiting on a slow scrape does
+    not hold up the commands and buttons of the other chats.
+
+    :param bot_token: The token of the bot
+    :return: The telegram Application
+    """
+    application = (
+        Application.builder()
+        .token(bot_token)
+        .persistence(get_persistence())
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Command Handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("check_updates", check_updates_command))
     application.add_handler(CommandHandler("list_bookmarks", list_bookmarks_command))
+    application.add_handler(CommandHandler("refresh", refresh_command))
+    application.add_handler(CommandHandler("register", register_command))
+    application.add_handler(CommandHandler("unregister", unregister_command))
 
     # Callback Query Handler for buttons
     application.add_handler(CallbackQueryHandler(button))
 
     # Other handlers like MessageHandler, Error Handler, etc.
     application.add_error_handler(error)
+    return application
 
-    # Start the bot
-    application.run_polling()
 
-    # Schedule thread for scheduled tasks
-    schedule_thread = threading.Thread(target=run_schedule)
-    schedule_thread.start()
+def run_bot() -> None:
+    """
+    The run_bot function is the main function of this bot. It initializes the bot and starts it.
+
+    :return: None so the return type should be none
+    """
+    bot_token = os.getenv("BOT_TOKEN")
+    application = build_application(bot_token)
+
+    # Start the bot, the scheduled jobs and the web server run on its event loop
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if webhook_url:
+        secret_token = os.getenv("WEBHOOK_SECRET") or webhook_secret(bot_token)
+        asyncio.run(run_webhook(application, webhook_url, secret_token))
+    else:
+        # Long polling, for local development
+        application.run_polling()
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import logging
+
+import requests
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+from src.utils import format_update_message
+from src.tracing import traced
+from src.file_id_cache import get_file_id_cache
+from src.http_scrapping import USER_AGENT
+from src.send_queue import INTERACTIVE, send_queue
+
+logger = logging.getLogger(__name__)
+
+# Telegram accepts at most 10 photos in one media group.
+MEDIA_GROUP_SIZE = 10
+# Telegram refuses uploaded photos larger than 10 MB.
+MAX_COVER_SIZE = 10 * 1024 * 1024
+COVER_TIMEOUT = 10
+
+
+class Cover:
+    """
+    A Cover is the photo to send for an update: a cached file_id, the downloaded
+    image, or the image url when the download failed.
+    """
+
+    __slots__ = ("url", "link", "photo", "content_hash", "cached")
+
+    def __init__(self, url, link, photo, content_hash=None, cached=False):
+        self.url = url
+        self.link = link
+        self.photo = photo
+        self.content_hash = content_hash
+        self.cached = cached
+
+
+def download_cover(url):
+    """
+    The download_cover function fetches a cover image so the bot can upload it
+    itself instead of asking Telegram to download it from the website.
+
+    :param url: The url of the cover image
+    :return: The image bytes, or None if the image can not be downloaded
+    """
+    try:
+        response = requests.get(
+            url, timeout=COVER_TIMEOUT, headers={"User-Agent": USER_AGENT}
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.info(f"Could not download the cover {url}: {e}")
+        return None
+    if not response.content or len(response.content) > MAX_COVER_SIZE:
+        return None
+    return response.content
+
+
+async def resolve_cover(cache, manga_update):
+    """
+    The resolve_cover function picks what to send as the photo of an update. A cover
+    sent before is sent by file_id. Otherwise the image is downloaded and, when the
+    same image was already sent under another url, its file_id is reused.
+
+    :param cache: The FileIdCache
+    :param manga_update: The manga update dictionary
+    :return: A Cover
+    """
+    url = manga_update["image"]
+    link = manga_update.get("link")
+    file_id = await asyncio.to_thread(cache.get, url)
+    if file_id:
+        return Cover(url, link, file_id, cached=True)
+
+    content = await asyncio.to_thread(download_cover, url)
+    if content is None:
+        # Let Telegram try the url itself
+        return Cover(url, link, url)
+    content_hash = hashlib.sha256(content).hexdigest()
+    file_id = await asyncio.to_thread(cache.get_by_hash, content_hash)
+    if file_id:
+        await asyncio.to_thread(cache.put, url, content_hash, file_id, link)
+        return Cover(url, link, file_id, content_hash, cached=True)
+    return Cover(url, link, content, content_hash)
+
+
+async def remember_cover(cache, cover, message):
+    """
+    The remember_cover function stores the file_id Telegram gave an uploaded cover.
+
+    :param cache: The FileIdCache
+    :param cover: The Cover that was sent
+    :param message: The Message returned by Telegram
+    :return: None
+    """
+    if cover.cached or cover.content_hash is None:
+        return
+    photo_sizes = getattr(message, "photo", None)
+    file_id = photo_sizes[-1].file_id if photo_sizes else None
+    if isinstance(file_id, str):
+        await asyncio.to_thread(cache.put, cover.url, cover.content_hash, file_id, cover.link)
+
+
+def chunk_updates(updates, size=MEDIA_GROUP_SIZE):
+    """
+    The chunk_updates function splits the updates into batches of one media group.
+
+    :param updates: The list of manga updates
+    :param size: The largest batch
+    :return: A list of lists of updates
+    """
+    return [updates[start : start + size] for start in range(0, len(updates), size)]
+
+
+async def send_update(
+    bot, chat_id, manga_update, priority=INTERACTIVE, queue=None, cache=None
+):
+    """
+    The send_update function sends one update as a photo with its caption. A cached
+    file_id that Telegram no longer accepts is forgotten and the image url is tried
+    instead. When Telegram can not use the cover image at all the update is sent as
+    plain text, so it is never lost.
+
+    :param bot: The telegram Bot used to send the update
+    :param chat_id: The chat to send the update to
+    :param manga_update: The manga update dictionary
+    :param priority: The send queue lane, INTERACTIVE or DIGEST
+    :param queue: The SendQueue to send through, defaults to the shared one
+    :param cache: The FileIdCache to use, defaults to the one in DATA_DIR
+    :return: None
+    """
+    queue = queue or send_queue
+    cache = cache or get_file_id_cache()
+    caption = format_update_message(manga_update)
+    cover = await resolve_cover(cache, manga_update)
+    photos = [cover.photo, cover.url] if cover.cached else [cover.photo]
+    for photo in photos:
+        try:
+            message = await queue.submit(
+                chat_id,
+                bot.send_photo,
+                chat_id=chat_id,
+                photo=photo,
+                caption=caption,
+                parse_mode="HTML",
+                priority=priority,
+            )
+        except BadRequest as e:
+            logger.warning(f"Cover of {manga_update['title']} could not be sent ({e}).")
+            if photo is cover.photo and cover.cached:
+                await asyncio.to_thread(cache.invalidate, cover.url)
+            continue
+        if photo is cover.photo:
+            await remember_cover(cache, cover, message)
+        return
+
+    await queue.submit(
+        chat_id,
+        bot.send_message,
+        chat_id=chat_id,
+        text=caption,
+        parse_mode="HTML",
+        priority=priority,
+    )
+
+
+@traced(
+    "deliver_updates",
+    attributes=lambda bot, chat_id, updates, *args, **kwargs: {
+        "chat.id": chat_id,
+        "updates.count": len(updates),
+    },
+)
+async def deliver_updates(
+    bot, chat_id, updates, priority=INTERACTIVE, queue=None, cache=None
+):
+    """
+    The deliver_updates function sends the updates to a chat in media groups of up to
+    ten photos, one Bot API call per group instead of one per update. If Telegram
+    rejects a group, usually because one of the cover images can not be fetched, the
+    updates of that group are sent one by one. Covers are sent by file_id once
+    Telegram has seen them.
+
+    :param bot: The telegram Bot used to send the updates
+    :param chat_id: The chat to send the updates to
+    :param updates: The list of manga updates
+    :param priority: The send queue lane, INTERACTIVE or DIGEST
+    :param queue: The SendQueue to send through, defaults to the shared one
+    :param cache: The FileIdCache to use, defaults to the one in DATA_DIR
+    :return: The number of Bot API calls made
+    """
+    queue = queue or send_queue
+    cache = cache or get_file_id_cache()
+    calls = 0
+    for batch in chunk_updates(updates):
+        if len(batch) == 1:
+            # A media group needs at least two items
+            await send_update(bot, chat_id, batch[0], priority, queue, cache)
+            calls += 1
+            continue
+        covers = await asyncio.gather(
+            *(resolve_cover(cache, manga_update) for manga_update in batch)
+        )
+        media = [
+            InputMediaPhoto(
+                media=cover.photo,
+                caption=format_update_message(manga_update),
+                parse_mode="HTML",
+            )
+            for cover, manga_update in zip(covers, batch)
+        ]
+        try:
+            messages = await queue.submit(
+                chat_id, bot.send_media_group, chat_id=chat_id, media=media, priority=priority
+            )
+            calls += 1
+        except BadRequest as e:
+            logger.warning(f"Media group rejected ({e}), sending its {len(batch)} updates one by one.")
+            calls += 1
+            for manga_update in batch:
+                await send_update(bot, chat_id, manga_update, priority, queue, cache)
+                calls += 1
+            continue
+        if isinstance(messages, (list, tuple)):
+            for cover, message in zip(covers, messages):
+                await remember_cover(cache, cover, message)
+    return calls
@@ -0,0 +1,183 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from src.scrapping import setup_driver
+from src.metrics import Gauge
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """
+    Book-keeping wrapper around a live WebDriver owned by a DriverPool.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    The DriverPool keeps a bounded set of warm Chrome sessions so that a scrape
+    does not have to pay for a full browser launch every time.
+
+    Drivers are checked out for exclusive use and returned afterwards. A driver is
+    health-checked on checkout and recycled once it has served max_uses scrapes or
+    is older than max_age seconds. No more than max_size browsers are ever alive at
+    the same time; extra callers wait for a free slot.
+    """
+
+    def __init__(self, factory=setup_driver, max_size=2, max_uses=50, max_age=1800):
+        self._factory = factory
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = {}
+
+    @property
+    def live_count(self):
+        """
+        The live_count property returns the number of browsers currently alive,
+        both idle and checked out.
+
+        :return: The number of live drivers
+        """
+        with self._lock:
+            return len(self._idle) + len(self._in_use)
+
+    def _is_expired(self, pooled):
+        if pooled.uses >= self.max_uses:
+            return True
+        return time.monotonic() - pooled.created_at >= self.max_age
+
+    @staticmethod
+    def _is_healthy(pooled):
+        try:
+            # Any round-trip to chromedriver fails once the session is gone.
+            pooled.driver.current_url
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy driver: {e}")
+            return False
+
+    @staticmethod
+    def _discard(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error while quitting driver: {e}")
+
+    def checkout(self, timeout=None):
+        """
+        The checkout function hands out a healthy driver for exclusive use,
+        reusing an idle one when possible and launching a new one otherwise.
+
+        :param timeout: How long to wait for a free slot, None waits forever
+        :return: A webdriver instance
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No browser became available in the driver pool")
+        try:
+            pooled = None
+            while pooled is None:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    pooled = self._idle.pop()
+                if self._is_expired(pooled) or not self._is_healthy(pooled):
+                    self._discard(pooled)
+                    pooled = None
+            if pooled is None:
+                pooled = PooledDriver(self._factory())
+                logger.info("Launched a new pooled driver.")
+        except BaseException:
+            self._slots.release()
+            raise
+
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            self._in_use[id(pooled.driver)] = pooled
+        return pooled.driver
+
+    def checkin(self, driver, broken=False):
+        """
+        The checkin function returns a driver to the pool. Broken or worn out
+        drivers are quit instead of being kept for reuse.
+
+        :param driver: The driver previously obtained from checkout
+        :param broken: Whether the caller hit an error while using the driver
+        :return: None
+        """
+        with self._lock:
+            pooled = self._in_use.pop(id(driver), None)
+        if pooled is None:
+            raise ValueError("Driver does not belong to this pool")
+        try:
+            if broken or self._is_expired(pooled):
+                self._discard(pooled)
+            else:
+                with self._lock:
+                    self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        The driver function is a context manager around checkout and checkin.
+        A driver that raised while in use is treated as broken and recycled.
+
+        :param timeout: How long to wait for a free slot
+        :return: A webdriver instance
+        """
+        driver = self.checkout(timeout=timeout)
+        broken = False
+        try:
+            yield driver
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    def close(self):
+        """
+        The close function quits every idle driver. Drivers that are still
+        checked out are quit when they are returned.
+
+        :return: None
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
+        # Anything checked in from now on is over the limits and gets quit.
+        self.max_uses = 0
+
+
+driver_pool = DriverPool(
+    max_size=int(os.getenv("DRIVER_POOL_SIZE", "2")),
+    max_uses=int(os.getenv("DRIVER_MAX_USES", "50")),
+    max_age=int(os.getenv("DRIVER_MAX_AGE", "1800")),
+)
+atexit.register(driver_pool.close)
+
+DRIVER_POOL_DRIVERS = Gauge(
+    "notti_driver_pool_size",
+    "WebDriver sessions alive in the driver pool, checked out or idle.",
+    function=lambda: driver_pool.live_count,
+)
@@ -0,0 +1,163 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS covers (
+    url TEXT PRIMARY KEY,
+    link TEXT,
+    content_hash TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS covers_by_hash ON covers (content_hash);
+CREATE INDEX IF NOT EXISTS covers_by_link ON covers (link);
+CREATE INDEX IF NOT EXISTS covers_by_last_used ON covers (last_used);
+"""
+
+
+class FileIdCache:
+    """
+    The FileIdCache remembers the Telegram file_id of every cover image the bot has
+    sent, keyed by the image url and the hash of its content. Sending a file_id
+    again costs Telegram no download at all. The least recently used covers are
+    evicted beyond max_entries, and a title whose cover url changed drops the entry
+    of its old cover. Lookups only note when a cover was used, the notes are written
+    with the next put, so reading the cache never commits.
+    """
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._used = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM covers").fetchone()[0]
+
+    def _write_used(self):
+        if self._used:
+            self._conn.executemany(
+                "UPDATE covers SET last_used = ? WHERE url = ?",
+                [(last_used, url) for url, last_used in self._used.items()],
+            )
+            self._used.clear()
+
+    def get(self, url):
+        """
+        The get function returns the file_id of a cover url.
+
+        :param url: The url of the cover image
+        :return: The Telegram file_id, or None if the cover was never sent
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM covers WHERE url = ?", (url,)
+            ).fetchone()
+            if row:
+                self._used[url] = time.time()
+        return row[0] if row else None
+
+    def get_by_hash(self, content_hash):
+        """
+        The get_by_hash function returns the file_id of an image with the same content,
+        for a cover that moved to another url.
+
+        :param content_hash: The sha256 hex digest of the image
+        :return: The Telegram file_id, or None if no such image was sent
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM covers WHERE content_hash = ? "
+                "ORDER BY last_used DESC LIMIT 1",
+                (content_hash,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, url, content_hash, file_id, link=None):
+        """
+        The put function stores the file_id of a cover. When the cover belongs to a
+        title, the entries of the title's previous cover urls are dropped.
+
+        :param url: The url of the cover image
+        :param content_hash: The sha256 hex digest of the image
+        :param file_id: The Telegram file_id of the sent photo
+        :param link: The link of the title the cover belongs to
+        :return: None
+        """
+        with self._lock, self._conn:
+            self._write_used()
+            if link:
+                self._conn.execute(
+                    "DELETE FROM covers WHERE link = ? AND url != ?", (link, url)
+                )
+            self._conn.execute(
+                """
+                INSERT INTO covers (url, link, content_hash, file_id, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    link = excluded.link,
+                    content_hash = excluded.content_hash,
+                    file_id = excluded.file_id,
+                    last_used = excluded.last_used
+                """,
+                (url, link, content_hash, file_id, time.time()),
+            )
+            # Evict the least recently used covers beyond the limit
+            self._conn.execute(
+                "DELETE FROM covers WHERE url IN ("
+                "SELECT url FROM covers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate(self, url):
+        """
+        The invalidate function forgets the file_id of a cover, for example after
+        Telegram rejected it.
+
+        :param url: The url of the cover image
+        :return: None
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM covers WHERE url = ?", (url,))
+
+    def close(self):
+        """
+        The close function closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            with self._conn:
+                self._write_used()
+            self._conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_file_id_cache():
+    """
+    The get_file_id_cache function returns the file_id cache kept in DATA_DIR.
+
+    :return: A FileIdCache instance
+    """
+    path = os.path.join(os.getenv("DATA_DIR", "data"), "file_ids.sqlite3")
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = FileIdCache(
+                path, max_entries=int(os.getenv("FILE_ID_CACHE_SIZE", "5000"))
+            )
+        return _caches[path]
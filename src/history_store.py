@@ -0,0 +1,197 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    account TEXT NOT NULL,
+    title TEXT NOT NULL,
+    chapter_title TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (account, title)
+);
+CREATE INDEX IF NOT EXISTS chapters_by_title ON chapters (title);
+CREATE INDEX IF NOT EXISTS chapters_by_first_seen ON chapters (account, first_seen);
+CREATE TABLE IF NOT EXISTS releases (
+    title TEXT NOT NULL,
+    chapter_title TEXT NOT NULL,
+    released_at REAL NOT NULL,
+    PRIMARY KEY (title, chapter_title)
+);
+CREATE INDEX IF NOT EXISTS releases_by_time ON releases (released_at);
+"""
+
+
+class HistoryStore:
+    """
+    The HistoryStore is an embedded SQLite database that remembers, for every title
+    bookmarked by an account, the last chapter seen on the website and when that
+    chapter was first seen. Comparing a scrape against it tells which chapters are
+    genuinely new, whatever the website writes in its "last update" text. It also
+    logs when every chapter of a title came out, to learn the title's release cadence.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, account, bookmarks, now=None):
+        """
+        The record function compares a scrape with the stored history and stores the
+        chapters it has not seen before.
+
+        :param account: The account the bookmarks belong to
+        :param bookmarks: The list of scraped bookmarks
+        :param now: The unix time of the scrape, defaults to the current time
+        :return: A list of (bookmark, is_new_title) tuples for every changed title
+        """
+        now = time.time() if now is None else now
+        scraped = [
+            (index, bookmark["title"], bookmark["chapter_title"])
+            for index, bookmark in enumerate(bookmarks)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS scraped "
+                "(idx INTEGER PRIMARY KEY, title TEXT, chapter_title TEXT)"
+            )
+            self._conn.execute("DELETE FROM scraped")
+            self._conn.executemany("INSERT INTO scraped VALUES (?, ?, ?)", scraped)
+            # One indexed join finds every title that is unknown or has a new chapter
+            changed = self._conn.execute(
+                """
+                SELECT s.idx, c.title IS NULL
+                FROM scraped AS s
+                LEFT JOIN chapters AS c ON c.account = ? AND c.title = s.title
+                WHERE c.title IS NULL OR c.chapter_title != s.chapter_title
+                ORDER BY s.idx
+                """,
+                (account,),
+            ).fetchall()
+            self._conn.executemany(
+                """
+                INSERT INTO chapters (account, title, chapter_title, first_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (account, title) DO UPDATE SET
+                    chapter_title = excluded.chapter_title,
+                    first_seen = excluded.first_seen
+                """,
+                [(account, scraped[idx][1], scraped[idx][2], now) for idx, _ in changed],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO releases (title, chapter_title, released_at) "
+                "VALUES (?, ?, ?)",
+                [
+                    (scraped[idx][1], scraped[idx][2], released_at)
+                    for idx, is_new_title in changed
+                    if (released_at := self._released_at(bookmarks[idx], is_new_title, now))
+                    is not None
+                ],
+            )
+        return [(bookmarks[idx], bool(is_new_title)) for idx, is_new_title in changed]
+
+    @staticmethod
+    def _released_at(bookmark, is_new_title, now):
+        # The website's own update time is closer than the time of the scrape
+        updated_at = bookmark.get("updated_at")
+        if updated_at is not None:
+            return min(updated_at, now)
+        # A title seen for the first time may have been updated long ago
+        return None if is_new_title else now
+
+    def last_seen(self, account, title):
+        """
+        The last_seen function returns the stored chapter of a title.
+
+        :param account: The account the title belongs to
+        :param title: The title of the manga
+        :return: A (chapter_title, first_seen) tuple, or None if the title is unknown
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT chapter_title, first_seen FROM chapters "
+                "WHERE account = ? AND title = ?",
+                (account, title),
+            ).fetchone()
+
+    def seen_since(self, account, since):
+        """
+        The seen_since function lists the chapters first seen after a moment in time.
+
+        :param account: The account the titles belong to
+        :param since: The unix time to look from
+        :return: A list of (title, chapter_title, first_seen) tuples, newest first
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT title, chapter_title, first_seen FROM chapters "
+                "WHERE account = ? AND first_seen >= ? ORDER BY first_seen DESC, title",
+                (account, since),
+            ).fetchall()
+
+    def titles(self, account):
+        """
+        The titles function lists the titles an account has bookmarked.
+
+        :param account: The account the titles belong to
+        :return: A list of titles
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title FROM chapters WHERE account = ? ORDER BY title", (account,)
+            ).fetchall()
+        return [title for (title,) in rows]
+
+    def releases_since(self, since):
+        """
+        The releases_since function returns when the chapters of every title came out,
+        as seen by any account.
+
+        :param since: The unix time to look from
+        :return: A dictionary from title to its release times, oldest first
+        """
+        releases = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, released_at FROM releases WHERE released_at >= ? "
+                "ORDER BY released_at",
+                (since,),
+            ).fetchall()
+        for title, released_at in rows:
+            releases.setdefault(title, []).append(released_at)
+        return releases
+
+    def close(self):
+        """
+        The close function closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store():
+    """
+    The get_history_store function returns the history store kept in DATA_DIR.
+
+    :return: A HistoryStore instance
+    """
+    path = os.path.join(os.getenv("DATA_DIR", "data"), "history.sqlite3")
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = HistoryStore(path)
+        return _stores[path]
@@ -0,0 +1,235 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+import requests
+from selectolax.lexbor import LexborHTMLParser as HTMLParser
+
+from src.relative_time import last_update_timestamp
+from src.metrics import LOGIN_SECONDS, SCRAPE_ITEMS, SCRAPE_SECONDS
+from src.tracing import in_context, set_attribute, traced
+from src.site import (
+    DOMAIN,
+    LOGIN_URL,
+    bookmarks_page_url,
+    max_page_number,
+    merge_pages,
+)
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+def setup_session():
+    """
+    The setup_session function creates an HTTP session that looks like a regular browser.
+
+    :return: A requests session
+    """
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def _text(node):
+    # Collapse whitespace the same way a browser renders the element text
+    return " ".join(node.text(separator=" ").split())
+
+
+def is_login_html(url, html):
+    """
+    The is_login_html function checks whether a response shows the login form,
+    which means the session is not authenticated.
+
+    :param url: The final url of the response, after redirects
+    :param html: The body of the response
+    :return: True if the login form is shown
+    """
+    if "/login" in url or "wp-login" in url:
+        return True
+    return HTMLParser(html).css_first("#user_login") is not None
+
+
+@LOGIN_SECONDS.time(backend="http")
+@traced("login", attributes={"scrape.backend": "http"})
+def login(session, username, password):
+    """
+    The login function submits the WordPress login form of the Manga Scans website
+    with a plain HTTP request, keeping every hidden field the form carries.
+
+    :param session: Pass in the requests session
+    :param username: Pass the username to the login function
+    :param password: Pass the password to the login function
+    :return: The response of the login request
+    """
+    response = session.get(LOGIN_URL, timeout=15)
+    response.raise_for_status()
+    tree = HTMLParser(response.text)
+
+    username_field = tree.css_first("#user_login")
+    password_field = tree.css_first("#user_pass")
+    if username_field is None or password_field is None:
+        raise ValueError("Can not find the login form")
+
+    # Walk up to the form that owns the credential fields
+    form = username_field.parent
+    while form is not None and form.tag != "form":
+        form = form.parent
+    if form is None:
+        raise ValueError("Can not find the login form")
+
+    data = {}
+    for field in form.css("input"):
+        name = field.attributes.get("name")
+        if name and field.attributes.get("type") not in ("checkbox", "radio"):
+            data[name] = field.attributes.get("value") or ""
+    data[username_field.attributes.get("name", "log")] = username
+    data[password_field.attributes.get("name", "pwd")] = password
+
+    action = urljoin(response.url, form.attributes.get("action") or response.url)
+    response = session.post(action, data=data, timeout=15)
+    response.raise_for_status()
+    logger.info("Login succesfully.")
+    return response
+
+
+def parse_bookmarks(html):
+    """
+    The parse_bookmarks function reads the bookmarks page markup and returns the same
+    list of dictionaries that scrape_bookmarks builds from the browser.
+
+    :param html: The markup of the bookmarks page
+    :return: A list of dictionaries
+    """
+    bookmarks_data = []
+    scraped_at = datetime.now(timezone.utc)
+    for bookmark in HTMLParser(html).css(".unit"):
+        try:
+            poster = bookmark.css_first(".poster")
+            link = poster.attributes.get("href")
+            image = bookmark.css_first(".poster img").attributes.get("src")
+            title = _text(bookmark.css_first(".info a"))
+            chapter_title = _text(bookmark.css_first(".richdata"))
+            dropdown = bookmark.css_first(".dropdown")
+            last_update = _text(dropdown) if dropdown is not None else "many time ago"
+
+            bookmarks_data.append(
+                {
+                    "title": title,
+                    "link": link,
+                    "chapter_title": chapter_title,
+                    "last_update": last_update,
+                    "updated_at": last_update_timestamp(last_update, scraped_at),
+                    "image": image,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error processing a bookmark: {e}")
+
+    return bookmarks_data
+
+
+def parse_page_count(html):
+    """
+    The parse_page_count function reads the number of bookmark pages from the
+    pagination block of a bookmarks page.
+
+    :param html: The markup of the bookmarks page
+    :return: The number of pages, at least 1
+    """
+    links = [
+        (link.attributes.get("href"), link.text())
+        for link in HTMLParser(html).css(".pagination a, a.page-numbers")
+    ]
+    return max_page_number(links)
+
+
+@traced("fetch_bookmarks_page", attributes=lambda session, page=1: {"page": page})
+def fetch_bookmarks_page(session, page=1):
+    """
+    The fetch_bookmarks_page function downloads a page of the bookmarks list.
+
+    :param session: Pass in the requests session
+    :param page: The page number, starting at 1
+    :return: The response of the bookmarks page
+    """
+    response = session.get(bookmarks_page_url(page), timeout=15)
+    response.raise_for_status()
+    return response
+
+
+@SCRAPE_SECONDS.time(backend="http")
+@traced("scrape_bookmarks", attributes={"scrape.backend": "http"})
+def scrape_all_pages(session, first_page_html):
+    """
+    The scrape_all_pages function parses the first bookmarks page, discovers how many
+    pages there are and downloads the remaining ones concurrently, at most
+    PAGE_PARALLELISM at a time. The result is merged in page order without duplicates.
+
+    :param session: Pass in the requests session
+    :param first_page_html: The markup of the first bookmarks page
+    :return: A list of dictionaries
+    """
+    pages = [parse_bookmarks(first_page_html)]
+    page_count = parse_page_count(first_page_html)
+    if page_count > 1:
+        logger.info(f"Bookmarks span {page_count} pages.")
+        max_workers = min(int(os.getenv("PAGE_PARALLELISM", "4")), page_count - 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Every page request continues the trace of the scrape
+            futures = [
+                pool.submit(in_context(fetch_bookmarks_page, session, page))
+                for page in range(2, page_count + 1)
+            ]
+            pages.extend(parse_bookmarks(future.result().text) for future in futures)
+    bookmarks = merge_pages(pages)
+    SCRAPE_ITEMS.observe(len(bookmarks), backend="http")
+    set_attribute("bookmarks.count", len(bookmarks))
+    return bookmarks
+
+
+def export_cookies(session):
+    """
+    The export_cookies function converts the session cookies to the dictionaries
+    used by the WebDriver, so both backends can share the saved session.
+
+    :param session: Pass in the requests session
+    :return: A list of cookie dictionaries
+    """
+    cookies = []
+    for cookie in session.cookies:
+        exported = {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": cookie.secure,
+            "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+        }
+        if cookie.expires is not None:
+            exported["expiry"] = cookie.expires
+        cookies.append(exported)
+    return cookies
+
+
+def import_cookies(session, cookies):
+    """
+    The import_cookies function loads saved cookie dictionaries into the session.
+
+    :param session: Pass in the requests session
+    :param cookies: A list of cookie dictionaries
+    :return: None
+    """
+    for cookie in cookies:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", DOMAIN),
+            path=cookie.get("path", "/"),
+        )
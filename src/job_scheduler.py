@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    last_run REAL NOT NULL
+);
+"""
+
+# (name, lowest, highest) of the five fields of a cron expression
+CRON_FIELDS = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 6),
+]
+# A cron expression that matches nothing within this many years never will.
+MAX_SEARCH_YEARS = 5
+
+
+def parse_cron_field(text, lowest, highest):
+    """
+    The parse_cron_field function reads one field of a cron expression: *, a value,
+    a range a-b, any of them with a /step, or a comma separated list of those.
+
+    :param text: The field as written
+    :param lowest: The lowest value of the field
+    :param highest: The highest value of the field
+    :return: The set of values the field matches
+    """
+    values = set()
+    for part in text.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if part == "*":
+            start, end = lowest, highest
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = highest if step > 1 else start
+        if step < 1 or start > end:
+            raise ValueError(f"Invalid cron field {text!r}")
+        values.update(range(start, end + 1, step))
+    if min(values) < lowest or max(values) > highest:
+        raise ValueError(f"Cron field {text!r} is out of {lowest}-{highest}")
+    return values
+
+
+class CronExpression:
+    """
+    The CronExpression is a standard five field cron schedule, minute hour day month
+    weekday (0 or 7 is Sunday), evaluated in a timezone. As in cron, when both the
+    day and the weekday are restricted a day matching either one runs.
+    """
+
+    def __init__(self, expression, timezone="UTC"):
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"A cron expression has 5 fields, got {expression!r}")
+        self.expression = expression
+        self.timezone = ZoneInfo(timezone) if isinstance(timezone, str) else timezone
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            # Sunday may also be written 7
+            parse_cron_field(text, lowest, highest + (name == "weekday"))
+            for text, (name, lowest, highest) in zip(fields, CRON_FIELDS)
+        )
+        self.weekdays = {value % 7 for value in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        # Python counts weekdays from Monday, cron from Sunday
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        """
+        The next_after function finds the first time the expression matches after a
+        moment, in the wall clock time of its timezone.
+
+        :param timestamp: The moment, as a Unix timestamp
+        :return: The Unix timestamp of the next run
+        """
+        start = datetime.fromtimestamp(timestamp, self.timezone).replace(tzinfo=None)
+        moment = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        while moment.year <= start.year + MAX_SEARCH_YEARS:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=28) + timedelta(days=4)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                candidate = moment.replace(tzinfo=self.timezone).timestamp()
+                if candidate > timestamp:
+                    return candidate
+                # A wall clock time repeated by a daylight saving change
+                moment += timedelta(minutes=1)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+
+class JobStore:
+    """
+    The JobStore remembers when every scheduled job last ran, so runs missed while
+    the bot was down can be caught up after a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def last_run(self, name):
+        """
+        The last_run function tells when a job last ran.
+
+        :param name: The name of the job
+        :return: A Unix timestamp, or None if the job never ran
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_run FROM jobs WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_run(self, name, timestamp):
+        """
+        The record_run function stores when a job ran.
+
+        :param name: The name of the job
+        :param timestamp: The Unix timestamp of the run
+        :return: None
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (name, last_run) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET last_run = excluded.last_run",
+                (name, timestamp),
+            )
+
+    def close(self):
+        """
+        The close function closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._conn.close()
+
+
+def get_job_store():
+    """
+    The get_job_store function opens the job store kept in DATA_DIR.
+
+    :return: A JobStore instance
+    """
+    return JobStore(os.path.join(os.getenv("DATA_DIR", "data"), "jobs.sqlite3"))
+
+
+class Job:
+    """
+    A Job is a coroutine function run by the JobScheduler on a cron schedule.
+    """
+
+    __slots__ = ("name", "cron", "callback", "jitter", "catch_up")
+
+    def __init__(self, name, cron, callback, jitter=0, catch_up=True):
+        self.name = name
+        self.cron = cron
+        self.callback = callback
+        self.jitter = jitter
+        self.catch_up = catch_up
+
+
+class JobScheduler:
+    """
+    The JobScheduler runs jobs on cron schedules inside the bot's event loop. Each job
+    sleeps until its next run instead of polling, starts up to jitter seconds late so
+    many bots do not hit the website at the same second, and a run missed while the
+    bot was down is made up once as soon as it starts again.
+    """
+
+    def __init__(self, store=None, clock=time.time, sleep=asyncio.sleep, max_sleep=3600):
+        self.store = store
+        self.clock = clock
+        self.sleep = sleep
+        # Wake up now and then, in case the system clock jumped
+        self.max_sleep = max_sleep
+        self.jobs = {}
+        self._tasks = {}
+
+    def add_job(self, name, cron, callback, timezone="UTC", jitter=0, catch_up=True):
+        """
+        The add_job function schedules a coroutine function.
+
+        :param name: The unique name of the job, used to remember its last run
+        :param cron: The five field cron expression of the job
+        :param callback: The coroutine function to run, without arguments
+        :param timezone: The IANA timezone the cron expression is read in
+        :param jitter: The most seconds a run may start late
+        :param catch_up: Run once right away if a run was missed while the bot was down
+        :return: The Job
+        """
+        job = self.jobs[name] = Job(
+            name, CronExpression(cron, timezone), callback, jitter, catch_up
+        )
+        return job
+
+    def next_run(self, job, now, last_run=None):
+        """
+        The next_run function tells when a job runs next, before jitter.
+
+        :param job: The Job
+        :param now: The current Unix timestamp
+        :param last_run: The Unix timestamp of the job's last run, if it ran before
+        :return: The Unix timestamp of the next run
+        """
+        if job.catch_up and last_run is not None and job.cron.next_after(last_run) <= now:
+            return now
+        return job.cron.next_after(now)
+
+    async def _run(self, job):
+        while True:
+            last_run = None
+            if self.store is not None:
+                last_run = await asyncio.to_thread(self.store.last_run, job.name)
+            due = self.next_run(job, self.clock(), last_run)
+            if due <= self.clock():
+                logger.info(f"Job {job.name} missed a run while the bot was down, running it now.")
+            due += random.uniform(0, job.jitter)
+            while (wait := due - self.clock()) > 0:
+                await self.sleep(min(wait, self.max_sleep))
+            started = self.clock()
+            try:
+                await job.callback()
+            except Exception as e:
+                logger.error(f"Job {job.name} failed: {e}")
+            # A run cut short by a shutdown is not recorded, so it is caught up
+            if self.store is not None:
+                await asyncio.to_thread(self.store.record_run, job.name, started)
+
+    def start(self):
+        """
+        The start function starts every job on the running event loop.
+
+        :return: None
+        """
+        if self.store is None:
+            self.store = get_job_store()
+        for name, job in self.jobs.items():
+            if name not in self._tasks or self._tasks[name].done():
+                self._tasks[name] = asyncio.create_task(self._run(job))
+
+    async def stop(self):
+        """
+        The stop function cancels the jobs and waits for them to end.
+
+        :return: None
+        """
+        tasks = list(self._tasks.values())
+        self._tasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_scheduler = JobScheduler()
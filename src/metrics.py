@@ -0,0 +1,377 @@
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a fast Telegram call to a slow multi-page scrape.
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Bookmarks in one scrape.
+ITEM_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def format_value(value):
+    """
+    The format_value function writes a number the way the Prometheus text format
+    expects it.
+
+    :param value: The number
+    :return: The number as text
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels):
+    """
+    The format_labels function writes a label set, escaping the values.
+
+    :param labels: A list of (name, value) pairs
+    :return: The labels in braces, or an empty string without labels
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Registry:
+    """
+    The Registry holds the metrics of the process and renders them in the Prometheus
+    text exposition format for the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        The register function adds a metric to the registry.
+
+        :param metric: The Metric
+        :return: The Metric
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        """
+        The get function looks a metric up by name.
+
+        :param name: The name of the metric
+        :return: The Metric, or None
+        """
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        The render function writes every metric.
+
+        :return: The metrics in the Prometheus text format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """
+    A Metric is a named family of values, one per combination of its label values.
+    Updates take a lock held for a few instructions, so metrics are cheap enough to
+    update from every thread of the bot.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or any(
+            name not in labels for name in self.labelnames
+        ):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+    def value(self, **labels):
+        """
+        The value function reads the current value of a label set.
+
+        :param labels: The label values
+        :return: The value, 0 if it was never set
+        """
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """
+        The samples function lists the values to render.
+
+        :return: A list of (name suffix, labels, value) tuples
+        """
+        with self._lock:
+            values = list(self._values.items())
+        return [("", self._labels(key), value) for key, value in values]
+
+
+class FunctionMetric(Metric):
+    """
+    A FunctionMetric may read its value from a function when the metrics are rendered,
+    so it costs nothing in between. A function of a labelled metric returns a
+    dictionary from label values to value.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), function=None, registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def samples(self):
+        if self.function is None:
+            return super().samples()
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.warning(f"Could not read {self.name}: {e}")
+            return []
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [("", [], value)]
+        return [
+            ("", self._labels(key if isinstance(key, tuple) else (key,)), item)
+            for key, item in value.items()
+        ]
+
+
+class Counter(FunctionMetric):
+    """
+    A Counter only goes up, for example the number of failed sends. A counter with a
+    function reads a total that another object already keeps.
+    """
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """
+        The inc function increases the counter.
+
+        :param amount: How much to add
+        :param labels: The label values
+        :return: None
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(FunctionMetric):
+    """
+    A Gauge is a value that goes up and down. A gauge with a function reads its value
+    when the metrics are rendered, so it costs nothing in between.
+    """
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        """
+        The set function sets the gauge.
+
+        :param value: The new value
+        :param labels: The label values
+        :return: None
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Timer:
+    """
+    A Timer observes how long a block or a function call takes, as a context manager
+    or as a decorator of plain and coroutine functions.
+    """
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._started = []
+
+    def __enter__(self):
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._started.pop(), **self.labels)
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.histogram.observe(time.perf_counter() - started, **self.labels)
+
+        else:
+
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.histogram.observe(time.perf_counter() - started, **self.labels)
+
+        return timed
+
+
+class Histogram(Metric):
+    """
+    A Histogram counts observations, such as durations, in buckets, and keeps their
+    sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        The observe function records one observation.
+
+        :param value: The observed value, for durations in seconds
+        :param labels: The label values
+        :return: None
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # One count per bucket plus +Inf, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, **labels):
+        """
+        The time function measures a block or every call of a function.
+
+        :param labels: The label values
+        :return: A Timer
+        """
+        self._key(labels)
+        return Timer(self, labels)
+
+    def count(self, **labels):
+        """
+        The count function tells how many values were observed.
+
+        :param labels: The label values
+        :return: The number of observations
+        """
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def value(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                samples.append(("_bucket", labels + [("le", format_value(bound))], cumulative))
+            samples.append(("_sum", labels, state[-1]))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+def resident_memory():
+    """
+    The resident_memory function measures the resident set size of the process.
+
+    :return: The RSS in bytes, or None where it can not be read
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+DRIVER_LAUNCH_SECONDS = Histogram(
+    "notti_driver_launch_seconds", "Time to launch a Chrome browser."
+)
+PAGE_WAIT_SECONDS = Histogram(
+    "notti_page_wait_seconds", "Time a scrape step waited for the page to be ready.", ["step"]
+)
+LOGIN_SECONDS = Histogram(
+    "notti_login_seconds", "Time to log into the website.", ["backend"]
+)
+SCRAPE_SECONDS = Histogram(
+    "notti_scrape_seconds", "Time to scrape all bookmark pages of an account.", ["backend"]
+)
+SCRAPE_ITEMS = Histogram(
+    "notti_scrape_items", "Bookmarks read in one scrape.", ["backend"], buckets=ITEM_BUCKETS
+)
+CHECK_SECONDS = Histogram(
+    "notti_check_for_updates_seconds", "Time to check an account for new chapters, end to end."
+)
+HANDLER_SECONDS = Histogram(
+    "notti_handler_seconds", "Time to handle a command or button.", ["handler"]
+)
+SEND_SECONDS = Histogram(
+    "notti_telegram_send_seconds", "Duration of Bot API calls.", ["method"]
+)
+SEND_ERRORS = Counter(
+    "notti_telegram_send_errors_total", "Failed Bot API calls.", ["method", "error"]
+)
+RESIDENT_MEMORY = Gauge(
+    "notti_process_resident_memory_bytes", "Resident memory of the bot.", function=resident_memory
+)
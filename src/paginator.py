@@ -0,0 +1,211 @@
+import os
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.tracing import set_attribute, traced
+
+# Telegram refuses messages longer than 4096 characters.
+MESSAGE_LIMIT = 4096
+# Number of bookmark snapshots whose rendered pages are kept.
+MAX_PAGINATORS = 64
+
+BOOKMARKS_HEADER = "<b>Your Bookmarked Mangas:</b>\n\n"
+
+
+def format_bookmark_line(bookmark):
+    """
+    The format_bookmark_line function formats one bookmark as a line of the bookmarks list.
+
+    :param bookmark: The bookmark dictionary
+    :return: A string ending with a newline
+    """
+    return f"<a href='{bookmark['link']}'>{bookmark['title']}</a> - Last updated: {bookmark['last_update']}\n"
+
+
+def page_callback_data(version, page):
+    """
+    The page_callback_data function encodes a page button as p:<version>:<page>.
+
+    :param version: The version of the bookmarks snapshot
+    :param page: The page number the button opens
+    :return: The callback data string
+    """
+    return f"p:{version}:{page}"
+
+
+def create_pagination_buttons(current_page, total_pages, version=None):
+    """
+    The create_pagination_buttons function creates a list of InlineKeyboardButtons
+    for pagination. It takes two arguments: current_page and total_pages.
+    current_page is the page number that the user is currently viewing, while total_pages
+    is the maximum number of pages available for pagination (i.e., if there are 100 items,
+    and each page can display 10 items at most, then there will be 10 pages). The function
+    returns an InlineKeyboardMarkup object containing a list of buttons to be displayed in
+    the Telegram chat window.
+
+    :param current_page: Determine which page we are on
+    :param total_pages: Know how many pages there are in total
+    :param version: The version of the bookmarks snapshot the buttons page through
+    :return: An inlinekeyboardmarkup object
+    """
+    button_list = []
+    if total_pages == 0:
+        return InlineKeyboardMarkup([])
+    # 'Previous' button if not on the first page
+    if current_page > 0:
+        button_list.append(
+            InlineKeyboardButton(
+                "⬅️ Previous",
+                callback_data=page_callback_data(version, current_page - 1)
+                if version
+                else f"prev_{current_page - 1}",
+            )
+        )
+    # Current page button (disabled)
+    button_list.append(
+        InlineKeyboardButton(
+            f"Page {current_page + 1} of {total_pages}", callback_data="noop"
+        )
+    )
+    # 'Next' button if not on the last page
+    if current_page < total_pages - 1:
+        button_list.append(
+            InlineKeyboardButton(
+                "Next ➡️",
+                callback_data=page_callback_data(version, current_page + 1)
+                if version
+                else f"next_{current_page + 1}",
+            )
+        )
+    return InlineKeyboardMarkup([button_list])
+
+
+def message_length(text):
+    """
+    The message_length function measures text the way Telegram does, in UTF-16 code
+    units. The HTML markup is counted too, which keeps a page safely in the limit.
+
+    :param text: The message text
+    :return: The length of the text
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+
+class Paginator:
+    """
+    The Paginator splits one snapshot of bookmarks into pages that each fit in one
+    Telegram message. The page boundaries are computed once, packing as many
+    bookmarks as fit in the budget, and every page is rendered the first time it is
+    shown, then its text and keyboard are reused, so paging back and forth does no
+    formatting work. A page number means the same slice for as long as the snapshot
+    lives, so the page buttons stay valid.
+    """
+
+    def __init__(self, bookmarks, budget=MESSAGE_LIMIT, max_items=None, version=None):
+        self.bookmarks = bookmarks
+        self.version = version
+        self.budget = budget
+        self.max_items = max_items
+        self._header_length = message_length(BOOKMARKS_HEADER)
+        self._lines = [self._fit(bookmark) for bookmark in bookmarks]
+        self.boundaries = self._pack()
+        self.total_pages = len(self.boundaries) - 1
+        self._pages = {}
+
+    def _fit(self, bookmark):
+        # Shorten the title of a bookmark that does not fit on a page of its own
+        line = format_bookmark_line(bookmark)
+        overflow = self._header_length + message_length(line) - self.budget
+        if overflow > 0:
+            title = bookmark["title"]
+            # The overflow is in UTF-16 code units, a character may take two of them
+            room = message_length(title) - overflow - message_length("…")
+            cut = used = 0
+            for character in title:
+                used += message_length(character)
+                if used > room:
+                    break
+                cut += 1
+            line = format_bookmark_line(dict(bookmark, title=title[:cut] + "…"))
+        return line
+
+    def _pack(self):
+        # Start index of every page, and the end of the list
+        boundaries = [0]
+        length = self._header_length
+        for index, line in enumerate(self._lines):
+            line_length = message_length(line)
+            items = index - boundaries[-1]
+            full = self.max_items is not None and items >= self.max_items
+            if items and (full or length + line_length > self.budget):
+                boundaries.append(index)
+                length = self._header_length
+            length += line_length
+        boundaries.append(len(self._lines))
+        return boundaries
+
+    def page_slice(self, page):
+        """
+        The page_slice function tells which bookmarks are on a page.
+
+        :param page: The page number, starting at 0
+        :return: A slice of the bookmarks list
+        """
+        return slice(self.boundaries[page], self.boundaries[page + 1])
+
+    @traced("format_page", attributes=lambda self, page: {"page": page})
+    def page(self, page):
+        """
+        The page function returns a page of the bookmarks list, ready to send.
+
+        :param page: The page number, starting at 0, clamped to the existing pages
+        :return: A (text, reply_markup) tuple
+        """
+        page = min(max(page, 0), self.total_pages - 1)
+        rendered = self._pages.get(page)
+        set_attribute("bookmarks.count", len(self.bookmarks))
+        set_attribute("page.cached", rendered is not None)
+        if rendered is None:
+            rendered = self._pages[page] = (
+                BOOKMARKS_HEADER + "".join(self._lines[self.page_slice(page)]),
+                create_pagination_buttons(page, self.total_pages, self.version),
+            )
+        return rendered
+
+    @property
+    def rendered_pages(self):
+        """
+        The rendered_pages property counts the pages rendered so far.
+
+        :return: The number of memoized pages
+        """
+        return len(self._pages)
+
+
+_paginators = OrderedDict()
+
+
+def get_paginator(bookmarks, version=None):
+    """
+    The get_paginator function returns the paginator of a bookmarks snapshot. Chats
+    looking at the same snapshot version, or at the same list handed out by the
+    bookmark cache, share one paginator and its rendered pages.
+
+    :param bookmarks: The list of bookmarks
+    :param version: The version of the snapshot, if it was stored
+    :return: A Paginator instance
+    """
+    key = version or id(bookmarks)
+    paginator = _paginators.get(key)
+    # The paginator keeps its list alive, so a matching id is the same list
+    if paginator is None or (version is None and paginator.bookmarks is not bookmarks):
+        paginator = _paginators[key] = Paginator(
+            bookmarks,
+            max_items=int(os.getenv("PAGE_MAX_ITEMS", "0")) or None,
+            version=version,
+        )
+        while len(_paginators) > MAX_PAGINATORS:
+            _paginators.popitem(last=False)
+    _paginators.move_to_end(key)
+    return paginator
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_by_last_used ON entries (kind, last_used);
+"""
+
+USER = "user"
+CHAT = "chat"
+BOT = "bot"
+
+# Seconds the writes of one persistence run are gathered before they go to disk.
+BATCH_DELAY = 1
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    The SQLitePersistence keeps user_data, chat_data and bot_data in an embedded
+    SQLite database, so they survive restarts. Writes are kept in memory and written
+    behind in one transaction, on every persistence run of the Application and on
+    shutdown, so no handler waits for the disk. The user_data and chat_data of users
+    and chats idle for max_idle seconds are dropped from memory and read back from
+    disk when they come back. Entries unused for max_age seconds are deleted.
+    """
+
+    def __init__(
+        self,
+        path,
+        update_interval=60,
+        max_idle=3 * 24 * 3600,
+        max_age=90 * 24 * 3600,
+        clock=time.time,
+    ):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.clock = clock
+        self.application = None
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # (kind, key) -> data waiting to be written, None to delete
+        self._pending = {}
+        # (kind, key) -> last use of the entries held by the Application
+        self._last_used = {}
+        # Entries dropped from memory that must stay on disk
+        self._evicted = set()
+        self._writer = None
+
+    def bind(self, application):
+        """
+        The bind function gives the persistence the Application whose idle entries it
+        evicts. Use it as, or from, the post_init callback of the Application.
+
+        :param application: The telegram Application using this persistence
+        :return: None
+        """
+        self.application = application
+
+    def _read(self, kind, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _read_recent(self, kind):
+        since = self.clock() - self.max_idle
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, data FROM entries WHERE kind = ? AND last_used >= ?",
+                (kind, since),
+            ).fetchall()
+        return {key: pickle.loads(data) for key, data in rows}
+
+    def _write(self, batch):
+        now = self.clock()
+        deleted = [(kind, key) for (kind, key), data in batch.items() if data is None]
+        stored = []
+        for (kind, key), data in batch.items():
+            if data is None:
+                continue
+            try:
+                stored.append((kind, key, pickle.dumps(data), now))
+            except Exception as e:
+                logger.error(f"Could not store the {kind} data of {key}: {e}")
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM entries WHERE kind = ? AND key = ?", deleted
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO entries (kind, key, data, last_used)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    data = excluded.data,
+                    last_used = excluded.last_used
+                """,
+                stored,
+            )
+            self._conn.execute(
+                "DELETE FROM entries WHERE kind != ? AND last_used < ?",
+                (BOT, now - self.max_age),
+            )
+
+    def _queue(self, kind, key, data):
+        self._pending[(kind, str(key))] = data
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_later())
+
+    async def _write_later(self):
+        # Gather the writes of the whole persistence run in one transaction
+        await asyncio.sleep(BATCH_DELAY)
+        await self._write_pending()
+
+    async def _write_pending(self):
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except sqlite3.Error as e:
+            logger.error(f"Could not write {len(batch)} persistence entries: {e}")
+            # Keep them for the next run, newer data first
+            self._pending = {**batch, **self._pending}
+            return
+        self.evict_idle()
+
+    def evict_idle(self):
+        """
+        The evict_idle function drops the user_data and chat_data of users and chats
+        idle for max_idle seconds from the Application. Their data stays on disk.
+
+        :return: The number of entries evicted
+        """
+        if self.application is None:
+            return 0
+        since = self.clock() - self.max_idle
+        idle = [
+            (kind, key)
+            for (kind, key), used in self._last_used.items()
+            if used < since and (kind, str(key)) not in self._pending
+        ]
+        for kind, key in idle:
+            del self._last_used[(kind, key)]
+            self._evicted.add((kind, key))
+            if kind == USER:
+                self.application.drop_user_data(key)
+            else:
+                self.application.drop_chat_data(key)
+        if idle:
+            logger.info(f"Evicted {len(idle)} idle persistence entries from memory.")
+        return len(idle)
+
+    async def _get_entries(self, kind):
+        entries = {
+            int(key): data
+            for key, data in (await asyncio.to_thread(self._read_recent, kind)).items()
+        }
+        now = self.clock()
+        for key in entries:
+            self._last_used[(kind, key)] = now
+        return entries
+
+    async def _refresh(self, kind, key, data):
+        if (kind, key) not in self._last_used:
+            # First use since the start or since the entry was evicted
+            if (kind, str(key)) in self._pending:
+                stored = self._pending[(kind, str(key))]
+            else:
+                stored = await asyncio.to_thread(self._read, kind, str(key))
+            if stored and not data:
+                data.update(stored)
+        self._last_used[(kind, key)] = self.clock()
+
+    async def _drop(self, kind, key):
+        if (kind, key) in self._evicted:
+            # Dropped from memory by evict_idle, not deleted
+            self._evicted.discard((kind, key))
+            return
+        self._last_used.pop((kind, key), None)
+        self._queue(kind, key, None)
+
+    async def get_user_data(self):
+        return await self._get_entries(USER)
+
+    async def get_chat_data(self):
+        return await self._get_entries(CHAT)
+
+    async def get_bot_data(self):
+        return await asyncio.to_thread(self._read, BOT, "") or {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        conversations = await asyncio.to_thread(self._read_recent, f"conversation:{name}")
+        return {tuple(json.loads(key)): state for key, state in conversations.items()}
+
+    async def update_conversation(self, name, key, new_state):
+        self._queue(f"conversation:{name}", json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id, data):
+        self._queue(USER, user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._queue(CHAT, chat_id, data)
+
+    async def update_bot_data(self, data):
+        self._queue(BOT, "", data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_user_data(self, user_id):
+        await self._drop(USER, user_id)
+
+    async def drop_chat_data(self, chat_id):
+        await self._drop(CHAT, chat_id)
+
+    async def refresh_user_data(self, user_id, user_data):
+        await self._refresh(USER, user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        await self._refresh(CHAT, chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """
+        The flush function writes everything still waiting, called by the Application
+        when it shuts down.
+
+        :return: None
+        """
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+        await self._write_pending()
+
+
+def get_persistence():
+    """
+    The get_persistence function creates the bot persistence kept in DATA_DIR.
+
+    :return: A SQLitePersistence instance
+    """
+    return SQLitePersistence(
+        os.path.join(os.getenv("DATA_DIR", "data"), "persistence.sqlite3"),
+        update_interval=float(os.getenv("PERSISTENCE_INTERVAL", "60")),
+        max_idle=float(os.getenv("PERSISTENCE_MAX_IDLE", str(3 * 24 * 3600))),
+    )
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.metrics import PAGE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Seconds each step may wait before giving up, overridable with WAIT_TIMEOUT_<STEP>.
+DEFAULT_TIMEOUTS = {
+    "login_form": 20,
+    "bookmarks": 15,
+}
+POLL_FREQUENCY = 0.1
+
+_wait_times = {}
+_wait_times_lock = threading.Lock()
+
+
+def step_timeout(step):
+    """
+    The step_timeout function returns how long a readiness step may wait.
+
+    :param step: The name of the step, for example login_form
+    :return: The timeout in seconds
+    """
+    value = os.getenv(f"WAIT_TIMEOUT_{step.upper()}")
+    return float(value) if value else DEFAULT_TIMEOUTS.get(step, 30)
+
+
+def record_wait(step, seconds):
+    """
+    The record_wait function stores how long a step actually waited, and observes it
+    for the /metrics endpoint.
+
+    :param step: The name of the step
+    :param seconds: The time spent waiting
+    :return: None
+    """
+    with _wait_times_lock:
+        _wait_times[step] = seconds
+    PAGE_WAIT_SECONDS.observe(seconds, step=step)
+    logger.info(f"Waited {seconds:.2f}s for {step}.")
+
+
+def get_wait_times():
+    """
+    The get_wait_times function returns the last recorded wait time of every step.
+
+    :return: A dictionary from step name to seconds
+    """
+    with _wait_times_lock:
+        return dict(_wait_times)
+
+
+def wait_until(driver, step, condition, timeout=None, message=None):
+    """
+    The wait_until function polls condition until it returns something truthy and
+    records how long that took. It returns as soon as the page is ready instead of
+    sleeping for a fixed time.
+
+    :param driver: Pass in the webdriver object
+    :param step: The name of the step, used for its timeout and its recorded wait time
+    :param condition: A function taking the driver and returning a falsy value until ready
+    :param timeout: Override the configured timeout of the step
+    :param message: The message of the TimeoutException raised when the step times out
+    :return: Whatever condition returned
+    """
+    timeout = step_timeout(step) if timeout is None else timeout
+    started = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(
+            condition, message=message or f"Timed out waiting for {step}"
+        )
+    finally:
+        record_wait(step, time.perf_counter() - started)
+
+
+def login_form_ready(driver):
+    """
+    The login_form_ready condition waits for the whole login form at once.
+
+    :param driver: Pass in the webdriver object
+    :return: The username field, password field and login button, or False
+    """
+    try:
+        username_field = driver.find_element(By.ID, "user_login")
+        password_field = driver.find_element(By.ID, "user_pass")
+        login_button = driver.find_element(By.ID, "wp-submit")
+    except NoSuchElementException:
+        return False
+    if (
+        username_field.is_displayed()
+        and password_field.is_displayed()
+        and login_button.is_displayed()
+        and login_button.is_enabled()
+    ):
+        return username_field, password_field, login_button
+    return False
+
+
+class BookmarksReady:
+    """
+    The BookmarksReady condition waits until the bookmarks page has finished loading
+    and the number of bookmark units stopped changing between two polls. A login form
+    in place of the bookmarks also counts as ready, the caller deals with it.
+    """
+
+    SCRIPT = (
+        "return [document.readyState, "
+        "document.querySelectorAll('.unit').length, "
+        "!!document.getElementById('user_login')];"
+    )
+
+    def __init__(self):
+        self.last_count = None
+
+    def __call__(self, driver):
+        ready_state, count, login_form = driver.execute_script(self.SCRIPT)
+        if login_form:
+            return True
+        if ready_state != "complete":
+            self.last_count = None
+            return False
+        # Also holds for an empty list, once it stayed empty for a second poll
+        stable = count == self.last_count
+        self.last_count = count
+        return stable
@@ -0,0 +1,162 @@
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Every unit the website (and our own fallbacks) may write, mapped to a canonical unit.
+UNIT_ALIASES = {
+    "second": ("s", "sec", "secs", "second", "seconds"),
+    "minute": ("m", "min", "mins", "minute", "minutes"),
+    "hour": ("h", "hr", "hrs", "hour", "hours"),
+    "day": ("d", "day", "days"),
+    "week": ("w", "wk", "wks", "week", "weeks"),
+    "month": ("mo", "mos", "month", "months"),
+    "year": ("y", "yr", "yrs", "year", "years"),
+}
+UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+}
+UNITS = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+
+# Words that stand for a count, as in "an hour ago".
+COUNT_WORDS = {"a": 1, "an": 1, "one": 1, "few": 3, "a few": 3}
+
+# Phrases that do not follow the "<count> <unit> ago" pattern.
+FIXED_OFFSETS = {
+    "just now": 0,
+    "now": 0,
+    "today": 0,
+    "yesterday": 86400,
+}
+
+MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [
+            ("jan", "january"),
+            ("feb", "february"),
+            ("mar", "march"),
+            ("apr", "april"),
+            ("may",),
+            ("jun", "june"),
+            ("jul", "july"),
+            ("aug", "august"),
+            ("sep", "sept", "september"),
+            ("oct", "october"),
+            ("nov", "november"),
+            ("dec", "december"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+
+_UNIT_PATTERN = "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True))
+_COUNT_PATTERN = "|".join(sorted(map(re.escape, COUNT_WORDS), key=len, reverse=True))
+_MONTH_PATTERN = "|".join(sorted(map(re.escape, MONTHS), key=len, reverse=True))
+
+RELATIVE_RE = re.compile(
+    rf"^(?P<count>\d+|{_COUNT_PATTERN})\s*(?P<unit>{_UNIT_PATTERN})\.?\s+ago$"
+)
+
+# Absolute date layouts, tried in order. Each regex exposes year, month and day groups.
+ABSOLUTE_RES = [
+    # 2023-12-28, 2023/12/28
+    re.compile(r"^(?P<year>\d{4})[-/.](?P<month>\d{1,2})[-/.](?P<day>\d{1,2})$"),
+    # 28/12/2023, 28.12.2023, 28-12-2023
+    re.compile(r"^(?P<day>\d{1,2})[-/.](?P<month>\d{1,2})[-/.](?P<year>\d{4})$"),
+    # December 28, 2023 / Dec 28 2023
+    re.compile(
+        rf"^(?P<month>{_MONTH_PATTERN})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})$"
+    ),
+    # 28 December 2023 / 28th Dec, 2023
+    re.compile(
+        rf"^(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<month>{_MONTH_PATTERN})\.?,?\s+(?P<year>\d{{4}})$"
+    ),
+]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _subtract_months(moment, months):
+    month_index = moment.year * 12 + moment.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    # Clamp the day, the 31st of March minus one month is the end of February
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - timedelta(days=1)).day
+    return moment.replace(year=year, month=month, day=min(moment.day, last_day))
+
+
+@lru_cache(maxsize=4096)
+def _parse(text):
+    """
+    Parse a normalised string into ("ago", unit, count) or ("date", year, month, day).
+    The result does not depend on the current time, so it can be cached.
+    """
+    if text in FIXED_OFFSETS:
+        return ("ago", "second", FIXED_OFFSETS[text])
+
+    match = RELATIVE_RE.match(text)
+    if match:
+        count = match.group("count")
+        count = int(count) if count.isdigit() else COUNT_WORDS[count]
+        return ("ago", UNITS[match.group("unit")], count)
+
+    for pattern in ABSOLUTE_RES:
+        match = pattern.match(text)
+        if match:
+            month = match.group("month")
+            month = int(month) if month.isdigit() else MONTHS[month]
+            return ("date", int(match.group("year")), month, int(match.group("day")))
+    return None
+
+
+def parse_last_update(text, now=None):
+    """
+    The parse_last_update function converts the "last update" text of a bookmark, such
+    as "3 hours ago", "yesterday" or "December 28, 2023", into an absolute UTC datetime.
+
+    :param text: The text scraped from the bookmark
+    :param now: The moment the text was scraped, defaults to the current UTC time
+    :return: A timezone aware datetime, or None if the text can not be understood
+    """
+    if not text:
+        return None
+    parsed = _parse(_WHITESPACE_RE.sub(" ", text.strip().lower()))
+    if parsed is None:
+        return None
+
+    if parsed[0] == "date":
+        _, year, month, day = parsed
+        try:
+            return datetime(year, month, day, tzinfo=timezone.utc)
+        except ValueError:
+            return None
+
+    _, unit, count = parsed
+    now = now or datetime.now(timezone.utc)
+    try:
+        if unit == "month":
+            return _subtract_months(now, count)
+        if unit == "year":
+            return _subtract_months(now, count * 12)
+        return now - timedelta(seconds=UNIT_SECONDS[unit] * count)
+    except (OverflowError, ValueError):
+        return None
+
+
+def last_update_timestamp(text, now=None):
+    """
+    The last_update_timestamp function is parse_last_update returning a unix timestamp,
+    which is what the bookmark records store.
+
+    :param text: The text scraped from the bookmark
+    :param now: The moment the text was scraped, defaults to the current UTC time
+    :return: A unix timestamp as a float, or None if the text can not be understood
+    """
+    moment = parse_last_update(text, now)
+    return moment.timestamp() if moment else None
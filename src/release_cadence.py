@@ -0,0 +1,185 @@
+import logging
+import os
+import statistics
+import time
+from collections import namedtuple
+from dotenv import load_dotenv
+
+from src.history_store import get_history_store
+from src.send_queue import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+# Releases needed before a title's cadence is trusted.
+MIN_RELEASES = 3
+# Releases older than this no longer tell the title's cadence.
+HISTORY_WINDOW = 120 * DAY
+# A title silent for this many periods is on hiatus, its cadence is forgotten.
+MAX_MISSED_PERIODS = 4
+
+Cadence = namedtuple("Cadence", ["period", "next_release", "spread"])
+
+
+def learn_cadence(releases, now):
+    """
+    The learn_cadence function finds the release pattern of a title from when its
+    chapters came out, for example every 7 days around Friday 18:00. A period close
+    to a whole number of days is rounded to it, so a weekly release keeps its weekday
+    and hour.
+
+    :param releases: The release times of the title, oldest first
+    :param now: The current unix time
+    :return: A Cadence with the period, the middle of the next release window and
+        the half width of the window, all in seconds, or None if the releases follow
+        no regular pattern
+    """
+    # Chapters released together count as one release
+    intervals = [later - earlier for earlier, later in zip(releases, releases[1:])]
+    intervals = [interval for interval in intervals if interval >= HOUR]
+    if len(intervals) < MIN_RELEASES - 1:
+        return None
+    period = statistics.median(intervals)
+    if statistics.median(abs(interval - period) for interval in intervals) > period / 4:
+        return None
+    days = round(period / DAY)
+    if days and abs(period - days * DAY) <= 0.15 * days * DAY:
+        period = days * DAY
+    last = releases[-1]
+    if now - last > MAX_MISSED_PERIODS * period:
+        return None
+    # How early or late every release came, relative to the last one
+    offsets = [(release - last + period / 2) % period - period / 2 for release in releases]
+    center = statistics.median(offsets)
+    spread = max(HOUR, 1.5 * statistics.median(abs(offset - center) for offset in offsets))
+    if spread > period / 4:
+        return None
+    next_release = last + center + period
+    while next_release + spread < now:
+        next_release += period
+    return Cadence(period, next_release, spread)
+
+
+def poll_interval(cadence, now, min_interval, max_interval):
+    """
+    The poll_interval function tells how often to look for a new chapter of a title.
+    Inside the predicted release window it is min_interval, before the window the
+    interval halves as the window gets closer, and without a cadence it is
+    max_interval.
+
+    :param cadence: The Cadence of the title, or None
+    :param now: The current unix time
+    :param min_interval: The shortest interval in seconds
+    :param max_interval: The longest interval in seconds
+    :return: The interval in seconds
+    """
+    if cadence is None:
+        return max_interval
+    distance = abs(now - cadence.next_release) - cadence.spread
+    if distance <= 0:
+        return min_interval
+    return min(max_interval, max(min_interval, distance / 2))
+
+
+class PollPlanner:
+    """
+    The PollPlanner picks which accounts to scrape between the scheduled checks. Every
+    account is due at the poll interval of its most urgent title, so accounts whose
+    titles are about to release are scraped often and the others wait for the daily
+    check. The polls come out of a budget of scrapes per hour shared by all accounts,
+    the most overdue accounts first.
+    """
+
+    def __init__(
+        self,
+        budget=20,
+        min_interval=900,
+        max_interval=DAY,
+        history=None,
+        clock=time.time,
+    ):
+        self.budget = TokenBucket(budget / HOUR, budget, clock)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.history = history
+        self.clock = clock
+        self.started = clock()
+        self._last_polled = {}
+
+    def record_polled(self, key, when=None):
+        """
+        The record_polled function remembers that an account was scraped.
+
+        :param key: The account key, from account_key
+        :param when: The unix time of the scrape, defaults to now
+        :return: None
+        """
+        self._last_polled[key] = self.clock() if when is None else when
+
+    def account_interval(self, titles, cadences, now):
+        """
+        The account_interval function tells how often to scrape an account.
+
+        :param titles: The titles the account has bookmarked
+        :param cadences: A dictionary from title to its Cadence
+        :param now: The current unix time
+        :return: The interval in seconds of the account's most urgent title
+        """
+        return min(
+            (
+                poll_interval(cadences.get(title), now, self.min_interval, self.max_interval)
+                for title in titles
+            ),
+            default=self.max_interval,
+        )
+
+    def due(self, accounts):
+        """
+        The due function picks the accounts to poll now, within the budget. It reads
+        the chapter history, call it from a worker thread.
+
+        :param accounts: The accounts to consider
+        :return: A list of accounts, most overdue first, with every chat of an account
+            key for one poll of the budget
+        """
+        if self.budget.capacity <= 0:
+            return []
+        history = self.history or get_history_store()
+        now = self.clock()
+        cadences = {}
+        for title, releases in history.releases_since(now - HISTORY_WINDOW).items():
+            cadence = learn_cadence(releases, now)
+            if cadence is not None:
+                cadences[title] = cadence
+
+        chats = {}
+        for account in accounts:
+            chats.setdefault(account.key, []).append(account)
+
+        overdue = []
+        for key, account_chats in chats.items():
+            interval = self.account_interval(history.titles(key), cadences, now)
+            elapsed = now - self._last_polled.get(key, self.started)
+            if elapsed >= interval:
+                overdue.append((elapsed / interval, account_chats))
+        overdue.sort(key=lambda item: item[0], reverse=True)
+
+        chosen = []
+        for polled, (_, account_chats) in enumerate(overdue):
+            if self.budget.wait_time(now) > 0:
+                logger.info(f"Poll budget spent, {len(overdue) - polled} accounts wait.")
+                break
+            self.budget.consume(now)
+            # One scrape serves every chat of the account
+            chosen.extend(account_chats)
+        return chosen
+
+
+poll_planner = PollPlanner(
+    budget=float(os.getenv("POLL_BUDGET", "20")),
+    min_interval=float(os.getenv("POLL_MIN_INTERVAL", "900")),
+    max_interval=float(os.getenv("POLL_MAX_INTERVAL", str(DAY))),
+)
@@ -1,39 +1,123 @@
-import schedule
-import time
+import asyncio
+import logging
 import os
-from src.utils import check_for_updates
+from functools import partial
+from dotenv import load_dotenv
+from telegram.error import TelegramError
 
+from src.utils import check_for_updates_async
+from src.delivery import deliver_updates
+from src.send_queue import DIGEST
+from src.account_store import all_accounts
+from src.scrape_scheduler import scrape_scheduler
+from src.job_scheduler import job_scheduler
+from src.release_cadence import poll_planner
+from src.tracing import tracer
 
-def scheduled_check(bot_context):
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Most seconds a poll round may start late.
+POLL_JITTER = 60
+
+
+async def check_all_accounts(bot, scheduler=None, accounts=None, fresh=False, planner=None):
     """
-    The scheduled_check function is a function that checks for updates every day at midnight.
-    If there are any updates, it sends them to the chat ID specified in the SHEDULE_CHAT_ID environment variable.
+    The check_all_accounts function checks the bookmarks of every registered account
+    for updates and sends them to every chat that registered the account. The scrapes
+    go through the scrape scheduler, so only a few accounts are scraped at once, and
+    an account shared by several chats is scraped once for all of them.
 
-    :return: A list of updates
-    :doc-author: Trelent
+    :param bot: The telegram Bot used to send the updates
+    :param scheduler: The ScrapeScheduler to use, defaults to the shared one
+    :param accounts: The accounts to check, defaults to all of them
+    :param fresh: Scrape the website even when the cache holds recent bookmarks
+    :param planner: The PollPlanner told about every scrape, defaults to the shared one
+    :return: A dictionary from account key to its list of updates
     """
-    if bot_context:
-        updates = check_for_updates()  # Replace with your actual scraping function
-        if updates:
-            bot_context.bot.send_message(
-                chat_id=os.getenv("SCHEDULE_CHAT_ID"),
-                text=f"Daily Updates: {updates}",  # Replace 'your_chat_id' with your actual chat ID
+    scheduler = scheduler or scrape_scheduler
+    planner = planner or poll_planner
+    accounts = all_accounts() if accounts is None else accounts
+
+    async def check_account(chats):
+        account = chats[0]
+        with tracer.span("check_account", {"chats.count": len(chats)}):
+            updates = await check_for_updates_async(
+                account.username, account.password, fresh=fresh
             )
+            planner.record_polled(account.key)
+            for chat in chats:
+                try:
+                    await deliver_updates(bot, chat.chat_id, updates, priority=DIGEST)
+                except TelegramError as e:
+                    # A failed send is not a failed scrape, do not back the account off
+                    logger.warning(f"Could not send the updates to chat {chat.chat_id}: {e}")
+            return updates
+
+    return await scheduler.run_round(accounts, check_account)
+
+
+async def scheduled_check(bot):
+    """
+    The scheduled_check function is the daily job: it scrapes every account again,
+    past the bookmark cache, and sends each one its digest.
+
+    :param bot: The telegram Bot used to send the updates
+    :return: A dictionary from account key to its list of updates
+    """
+    results = await check_all_accounts(bot, fresh=True)
+    updates = sum(len(account_updates or []) for account_updates in results.values())
+    logger.info(f"Scheduled check sent {updates} updates to {len(results)} accounts.")
+    return results
 
 
-# Run the schedule in a separate thread
-def run_schedule():
+async def scheduled_poll(bot, planner=None, scheduler=None):
     """
-    The run_schedule function is a simple while loop that runs the schedule.run_pending() function every second.
-    The run_schedule function is called in the main thread of execution, and it will block until all scheduled jobs have been executed.
+    The scheduled_poll function runs between the daily checks. It scrapes only the
+    accounts whose titles are due for a new chapter, as predicted from their release
+    cadence, within the poll budget.
 
-    :return: The schedule
-    :doc-author: Trelent
+    :param bot: The telegram Bot used to send the updates
+    :param planner: The PollPlanner to use, defaults to the shared one
+    :param scheduler: The ScrapeScheduler to use, defaults to the shared one
+    :return: A dictionary from account key to its list of updates
     """
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    planner = planner or poll_planner
+    accounts = await asyncio.to_thread(planner.due, all_accounts())
+    if not accounts:
+        return {}
+    logger.info(f"Polling {len(accounts)} accounts near a predicted release.")
+    return await check_all_accounts(
+        bot, scheduler, accounts=accounts, fresh=True, planner=planner
+    )
 
 
-# Schedule the job
-schedule.every().day.at("09:00").do(scheduled_check)
+def schedule_checks(bot, scheduler=None):
+    """
+    The schedule_checks function schedules the daily check on the SCHEDULE_CRON
+    expression, 09:00 every day by default, in the SCHEDULE_TIMEZONE timezone, and
+    the adaptive polls on the POLL_CRON expression, every 15 minutes by default.
+
+    :param bot: The telegram Bot used to send the updates
+    :param scheduler: The JobScheduler to use, defaults to the shared one
+    :return: The scheduled daily Job
+    """
+    scheduler = scheduler or job_scheduler
+    if float(os.getenv("POLL_BUDGET", "20")) > 0:
+        scheduler.add_job(
+            "scheduled_poll",
+            os.getenv("POLL_CRON", "*/15 * * * *"),
+            partial(scheduled_poll, bot),
+            timezone=os.getenv("SCHEDULE_TIMEZONE", "UTC"),
+            jitter=POLL_JITTER,
+            catch_up=False,
+        )
+    return scheduler.add_job(
+        "scheduled_check",
+        os.getenv("SCHEDULE_CRON", "0 9 * * *"),
+        partial(scheduled_check, bot),
+        timezone=os.getenv("SCHEDULE_TIMEZONE", "UTC"),
+        jitter=float(os.getenv("SCHEDULE_JITTER", "300")),
+        catch_up=os.getenv("SCHEDULE_CATCH_UP", "true").lower() != "false",
+    )
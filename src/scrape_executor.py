@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from src.tracing import in_context
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeQueueFull(Exception):
+    """
+    Raised when too many scrapes are already waiting for a worker.
+    """
+
+
+class ScrapeExecutor:
+    """
+    The ScrapeExecutor runs the blocking scraping code on a dedicated, bounded pool of
+    worker threads so that the Telegram event loop never waits for a browser or the
+    network. At most max_workers scrapes run at once and at most max_pending more
+    are queued; anything beyond that is rejected right away.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scrape"
+        )
+        self._lock = threading.Lock()
+        self._submitted = 0
+
+    @property
+    def submitted(self):
+        """
+        The submitted property returns the number of scrapes running or waiting.
+
+        :return: The number of scrapes in the executor
+        """
+        with self._lock:
+            return self._submitted
+
+    def _release(self, future):
+        with self._lock:
+            self._submitted -= 1
+
+    async def run(self, func, *args, **kwargs):
+        """
+        The run function executes a blocking function on a scrape worker and waits
+        for its result without blocking the event loop.
+
+        :param func: The blocking function to run
+        :param args: Positional arguments for the function
+        :param kwargs: Keyword arguments for the function
+        :return: Whatever the function returns
+        """
+        with self._lock:
+            if self._submitted >= self.max_workers + self.max_pending:
+                raise ScrapeQueueFull("Too many scrapes are already waiting")
+            self._submitted += 1
+        try:
+            # The worker continues the trace of the caller
+            future = self._executor.submit(in_context(func, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait=True):
+        """
+        The shutdown function stops the worker threads.
+
+        :param wait: Whether to wait for the running scrapes to finish
+        :return: None
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+scrape_executor = ScrapeExecutor(
+    max_workers=int(os.getenv("SCRAPE_WORKERS", "2")),
+    max_pending=int(os.getenv("SCRAPE_MAX_PENDING", "8")),
+)
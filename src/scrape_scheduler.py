@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+from src.scrape_executor import ScrapeQueueFull
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class AccountState:
+    """
+    The AccountState keeps what the scheduler knows about one account.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_started = None
+        self.running = False
+
+
+class ScrapeScheduler:
+    """
+    The ScrapeScheduler fans a job out over many accounts with a fixed number of
+    workers, so hundreds of accounts never mean hundreds of browsers at once. Accounts
+    that waited longest since their last scrape go first, an account never runs twice
+    at the same time, and an account whose scrape failed is backed off exponentially
+    without holding up the others. Chats that registered the same website account
+    share one job.
+    """
+
+    def __init__(self, concurrency=2, base_backoff=300, max_backoff=21600, clock=time.monotonic):
+        self.concurrency = concurrency
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._states = {}
+
+    def _state(self, key):
+        if key not in self._states:
+            self._states[key] = AccountState()
+        return self._states[key]
+
+    def backoff_remaining(self, key):
+        """
+        The backoff_remaining function tells how long an account still has to wait
+        after its last failure.
+
+        :param key: The account key, from account_key
+        :return: The remaining seconds, 0 if the account may run
+        """
+        state = self._states.get(key)
+        if not state:
+            return 0
+        return max(0.0, state.retry_at - self.clock())
+
+    def record_success(self, key):
+        """
+        The record_success function clears the backoff of an account.
+
+        :param key: The account key
+        :return: None
+        """
+        state = self._state(key)
+        state.failures = 0
+        state.retry_at = 0.0
+
+    def record_failure(self, key):
+        """
+        The record_failure function backs an account off, doubling the delay with every
+        failure in a row up to max_backoff. A little jitter keeps accounts that failed
+        together from retrying together.
+
+        :param key: The account key
+        :return: The backoff delay in seconds
+        """
+        state = self._state(key)
+        state.failures += 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (state.failures - 1))
+        delay *= random.uniform(0.9, 1.1)
+        state.retry_at = self.clock() + delay
+        return delay
+
+    def due(self, accounts):
+        """
+        The due function picks the accounts that may run now, in fairness order: never
+        scraped first, then the ones scraped longest ago. The chats of an account come
+        together, in the order they were given.
+
+        :param accounts: A list of Account tuples
+        :return: A list of lists of Account tuples sharing an account key
+        """
+        now = self.clock()
+        due = {}
+        for account in accounts:
+            state = self._state(account.key)
+            if state.running or state.retry_at > now:
+                continue
+            due.setdefault(account.key, []).append(account)
+        return sorted(
+            due.values(),
+            key=lambda chats: (
+                self._states[chats[0].key].last_started is not None,
+                self._states[chats[0].key].last_started or 0,
+            ),
+        )
+
+    async def run_round(self, accounts, job):
+        """
+        The run_round function runs job once for every due account, with at most
+        concurrency jobs in flight.
+
+        :param accounts: A list of Account tuples
+        :param job: An async function taking the list of Accounts of the chats that
+            registered the same website account
+        :return: A dictionary from account key to the result of its job, for the jobs
+            that succeeded
+        """
+        queue = deque(self.due(accounts))
+        results = {}
+
+        async def worker():
+            while queue:
+                chats = queue.popleft()
+                key, username = chats[0].key, chats[0].username
+                state = self._state(key)
+                state.running = True
+                state.last_started = self.clock()
+                try:
+                    results[key] = await job(chats)
+                except ScrapeQueueFull:
+                    # Interactive requests filled the queue, not the account's fault
+                    logger.info(f"Scrape queue full, {username} waits for the next round.")
+                except Exception as e:
+                    delay = self.record_failure(key)
+                    logger.warning(
+                        f"Scrape of {username} failed ({e}), retrying in {delay:.0f}s."
+                    )
+                else:
+                    self.record_success(key)
+                finally:
+                    state.running = False
+
+        workers = min(self.concurrency, len(queue))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+
+scrape_scheduler = ScrapeScheduler(
+    concurrency=int(os.getenv("SCHEDULE_CONCURRENCY", os.getenv("SCRAPE_WORKERS", "2"))),
+    base_backoff=float(os.getenv("SCRAPE_BACKOFF_BASE", "300")),
+    max_backoff=float(os.getenv("SCRAPE_BACKOFF_MAX", "21600")),
+)
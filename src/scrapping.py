@@ -1,13 +1,26 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-import time
 import logging
 import requests
+import os
+from datetime import datetime, timezone
+
+from src.relative_time import last_update_timestamp
+from src.readiness import wait_until, login_form_ready, BookmarksReady
+from src.metrics import DRIVER_LAUNCH_SECONDS, LOGIN_SECONDS, SCRAPE_ITEMS, SCRAPE_SECONDS
+from src.tracing import set_attribute, traced
+from src.site import (
+    DOMAIN,
+    LOGIN_URL,
+    BOOKMARKS_URL,
+    bookmarks_page_url,
+    max_page_number,
+    merge_pages,
+)
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -16,6 +29,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@DRIVER_LAUNCH_SECONDS.time()
+@traced("setup_driver")
 def setup_driver():
     """
     The setup_driver function initializes a new browser session with ChromeDriverManager.
@@ -40,6 +55,7 @@ def setup_driver():
     return driver
 
 
+@traced("check_connectivity", attributes=lambda url: {"url": url})
 def check_connectivity(url):
     try:
         response = requests.get(url, timeout=15)
@@ -49,6 +65,8 @@ def check_connectivity(url):
         return False
 
 
+@LOGIN_SECONDS.time(backend="selenium")
+@traced("login", attributes={"scrape.backend": "selenium"})
 def login(driver, username, password):
     """
     The login function logs into the Manga Scans website.
@@ -60,7 +78,7 @@ def login(driver, username, password):
     :doc-author: Trelent
     """
 
-    if check_connectivity("https://manga-scans.com/login"):
+    if check_connectivity(LOGIN_URL):
         logging.info(
             "Connectivity check to manga website passed. Proceeding with Selenium WebDriver."
         )
@@ -78,30 +96,14 @@ def login(driver, username, password):
             "Connectivity check to google failed. Cannot reach the login page."
         )
     # Open the login page
-    driver.get("https://manga-scans.com/login")
+    driver.get(LOGIN_URL)
 
-    # Initialize WebDriverWait
-    wait = WebDriverWait(driver, 60)
     logging.info("Selenium WebDriver try reach the login page.")
-    # Wait for the username field to be present and visible
-    username_field = wait.until(
-        EC.visibility_of_element_located((By.ID, "user_login")),
-        message="Can not find username field",
-    )
-    logging.info("Got username field.")
-
-    # Wait for the password field to be present and visible
-    password_field = wait.until(
-        EC.visibility_of_element_located((By.ID, "user_pass")),
-        message="Can not find password field",
-    )
-    logging.info("Got password field.")
-    # Wait for the login button to be present and clickable
-    login_button = wait.until(
-        EC.element_to_be_clickable((By.ID, "wp-submit")),
-        message="Can not find login button",
+    # Wait for the whole form at once, it is rendered in one go
+    username_field, password_field, login_button = wait_until(
+        driver, "login_form", login_form_ready, message="Can not find login form"
     )
-    logging.info("Got login button.")
+    logging.info("Got login form.")
     # Enter the login credentials
     username_field.send_keys(username)
     password_field.send_keys(password)
@@ -111,18 +113,138 @@ def login(driver, username, password):
     logging.info("Login succesfully.")
 
 
-def scrape_bookmarks(driver):
+def inject_cookies(driver, cookies):
     """
-    The scrape_bookmarks function scrapes the bookmarks page of manga-scans.com and returns a list of dictionaries containing information about each bookmark.
+    The inject_cookies function loads saved session cookies straight into the browser
+    through the DevTools protocol, so no page has to be opened first.
+
+    :param driver: Pass in the webdriver object
+    :param cookies: A list of cookie dictionaries as returned by driver.get_cookies()
+    :return: None
+    """
+    cdp_cookies = []
+    for cookie in cookies:
+        cdp_cookie = {
+            "name": cookie["name"],
+            "value": cookie["value"],
+            "domain": cookie.get("domain", DOMAIN),
+            "path": cookie.get("path", "/"),
+            "secure": cookie.get("secure", False),
+            "httpOnly": cookie.get("httpOnly", False),
+        }
+        if "expiry" in cookie:
+            cdp_cookie["expires"] = cookie["expiry"]
+        if "sameSite" in cookie:
+            cdp_cookie["sameSite"] = cookie["sameSite"]
+        cdp_cookies.append(cdp_cookie)
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": cdp_cookies})
+
+
+def clear_cookies(driver):
+    """
+    The clear_cookies function removes every cookie from the browser, whatever
+    page it is currently on.
+
+    :param driver: Pass in the webdriver object
+    :return: None
+    """
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+
+
+def is_login_page(driver):
+    """
+    The is_login_page function checks whether the website redirected the browser
+    to the login form, which means the session is not authenticated.
+
+    :param driver: Pass in the webdriver object
+    :return: True if the login form is shown
+    """
+    if "/login" in driver.current_url or "wp-login" in driver.current_url:
+        return True
+    return bool(driver.find_elements(By.ID, "user_login"))
+
+
+# Reads every bookmark on the page in a single WebDriver round-trip. Units missing
+# one of the required elements come back as null, like the per-element path skips them.
+EXTRACT_BOOKMARKS_SCRIPT = """
+const text = (element) => element.innerText.trim();
+return Array.from(document.querySelectorAll('.unit')).map((unit) => {
+    const poster = unit.querySelector('.poster');
+    const image = unit.querySelector('.poster img');
+    const title = unit.querySelector('.info a');
+    const chapter = unit.querySelector('.richdata');
+    const dropdown = unit.querySelector('.dropdown');
+    if (!poster || !image || !title || !chapter) {
+        return null;
+    }
+    return {
+        title: text(title),
+        link: poster.href,
+        chapter_title: text(chapter),
+        last_update: dropdown ? text(dropdown) : null,
+        image: image.src,
+    };
+});
+"""
+
+
+def _bookmark_record(title, link, chapter_title, last_update, image, scraped_at):
+    return {
+        "title": title,
+        "link": link,
+        "chapter_title": chapter_title,
+        "last_update": last_update,
+        "updated_at": last_update_timestamp(last_update, scraped_at),
+        "image": image,
+    }
+
+
+def extract_bookmarks_script(driver):
+    """
+    The extract_bookmarks_script function reads all of the bookmarks on the current page
+    with one execute_script call instead of several WebDriver calls per bookmark.
+
+    :param driver: Pass the webdriver object to the function
+    :return: A list of dictionaries, or None if the script could not be run
+    """
+    try:
+        records = driver.execute_script(EXTRACT_BOOKMARKS_SCRIPT)
+    except Exception as e:
+        logger.warning(f"Bookmark extraction script failed: {e}")
+        return None
+    if not isinstance(records, list):
+        return None
+
+    scraped_at = datetime.now(timezone.utc)
+    bookmarks_data = []
+    for record in records:
+        if not record:
+            logger.error("Error processing a bookmark: missing element")
+            continue
+        bookmarks_data.append(
+            _bookmark_record(
+                record["title"],
+                record["link"],
+                record["chapter_title"],
+                record["last_update"] or "many time ago",
+                record["image"],
+                scraped_at,
+            )
+        )
+    return bookmarks_data
+
+
+def extract_bookmarks_elements(driver):
+    """
+    The extract_bookmarks_elements function reads the bookmarks on the current page one
+    element at a time. It is the slow fallback for extract_bookmarks_script.
 
     :param driver: Pass the webdriver object to the function
     :return: A list of dictionaries
-    :doc-author: Trelent
     """
-    driver.get("https://manga-scans.com/bookmarks/")
-    time.sleep(2)
     bookmarks = driver.find_elements(By.CLASS_NAME, "unit")
     logging.info("Bookmarks elements are here.")
+    scraped_at = datetime.now(timezone.utc)
 
     bookmarks_data = []
     for bookmark in bookmarks:
@@ -139,16 +261,112 @@ def scrape_bookmarks(driver):
                 last_update = "many time ago"
 
             bookmarks_data.append(
-                {
-                    "title": title,
-                    "link": link,
-                    "chapter_title": chapter_title,
-                    "last_update": last_update,
-                    "image": image,
-                }
+                _bookmark_record(
+                    title, link, chapter_title, last_update, image, scraped_at
+                )
             )
             logging.info("Got another one bookmark.")
         except Exception as e:
             logger.error(f"Error processing a bookmark: {e}")
 
     return bookmarks_data
+
+
+PAGINATION_SCRIPT = """
+return Array.from(document.querySelectorAll('.pagination a, a.page-numbers'))
+    .map((link) => [link.href, link.innerText]);
+"""
+
+
+def extract_bookmarks(driver):
+    """
+    The extract_bookmarks function reads the bookmarks on the current page, in one
+    round-trip when possible and element by element otherwise.
+
+    :param driver: Pass the webdriver object to the function
+    :return: A list of dictionaries
+    """
+    bookmarks_data = extract_bookmarks_script(driver)
+    if bookmarks_data is None:
+        bookmarks_data = extract_bookmarks_elements(driver)
+    return bookmarks_data
+
+
+def discover_page_count(driver):
+    """
+    The discover_page_count function reads the number of bookmark pages from the
+    pagination block of the current page.
+
+    :param driver: Pass the webdriver object to the function
+    :return: The number of pages, at least 1
+    """
+    try:
+        links = driver.execute_script(PAGINATION_SCRIPT)
+    except Exception as e:
+        logger.warning(f"Could not read the pagination: {e}")
+        return 1
+    return max_page_number(links) if isinstance(links, list) else 1
+
+
+def scrape_remaining_pages(driver, page_count, max_tabs):
+    """
+    The scrape_remaining_pages function loads bookmark pages 2 to page_count in
+    background tabs, max_tabs at a time so they load concurrently, and reads each of them.
+
+    :param driver: Pass the webdriver object to the function
+    :param page_count: The number of bookmark pages
+    :param max_tabs: How many tabs may load at the same time
+    :return: A list of bookmark lists, one per page, in page order
+    """
+    main_window = driver.current_window_handle
+    pages = []
+    for first_page in range(2, page_count + 1, max_tabs):
+        tabs = []
+        for page in range(first_page, min(first_page + max_tabs, page_count + 1)):
+            known_handles = set(driver.window_handles)
+            driver.execute_script(
+                "window.open(arguments[0], '_blank');", bookmarks_page_url(page)
+            )
+            tabs.extend(set(driver.window_handles) - known_handles)
+        # The tabs load in parallel, read them in page order
+        for handle in tabs:
+            driver.switch_to.window(handle)
+            try:
+                wait_until(driver, "bookmarks", BookmarksReady())
+            except TimeoutException:
+                logger.warning("Bookmarks page did not settle in time.")
+            pages.append(extract_bookmarks(driver))
+            driver.close()
+        driver.switch_to.window(main_window)
+    return pages
+
+
+@SCRAPE_SECONDS.time(backend="selenium")
+@traced("scrape_bookmarks", attributes={"scrape.backend": "selenium"})
+def scrape_bookmarks(driver):
+    """
+    The scrape_bookmarks function scrapes the bookmarks page of manga-scans.com and returns a list of dictionaries containing information about each bookmark.
+    When the bookmarks span several pages the remaining pages are scraped as well.
+
+    :param driver: Pass the webdriver object to the function
+    :return: A list of dictionaries
+    :doc-author: Trelent
+    """
+    driver.get(BOOKMARKS_URL)
+    try:
+        wait_until(driver, "bookmarks", BookmarksReady())
+    except TimeoutException:
+        # Read whatever made it onto the page rather than failing the whole scrape
+        logger.warning("Bookmarks page did not settle in time.")
+
+    bookmarks_data = extract_bookmarks(driver)
+    page_count = discover_page_count(driver)
+    if page_count > 1:
+        logging.info(f"Bookmarks span {page_count} pages.")
+        max_tabs = int(os.getenv("PAGE_PARALLELISM", "4"))
+        pages = [bookmarks_data] + scrape_remaining_pages(driver, page_count, max_tabs)
+        bookmarks_data = merge_pages(pages)
+    logging.info(f"Got {len(bookmarks_data)} bookmarks.")
+    SCRAPE_ITEMS.observe(len(bookmarks_data), backend="selenium")
+    set_attribute("bookmarks.count", len(bookmarks_data))
+    return bookmarks_data
@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+from telegram.error import RetryAfter
+
+from src.metrics import SEND_ERRORS, SEND_SECONDS, Counter, Gauge
+from src.tracing import KIND_CLIENT, current_span, tracer
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first: replies to a user before scheduled digests.
+INTERACTIVE = 0
+DIGEST = 1
+LANES = {INTERACTIVE: "interactive", DIGEST: "digest"}
+
+# Drop idle per-chat buckets once this many are tracked.
+MAX_IDLE_BUCKETS = 1000
+
+
+class TokenBucket:
+    """
+    The TokenBucket allows rate sends per second on average, and bursts of up to
+    capacity sends after a quiet period.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """
+        The wait_time function tells how long until the next send is allowed.
+
+        :param now: The current time of the bucket's clock
+        :return: The delay in seconds, 0 if a send is allowed now
+        """
+        now = self.clock() if now is None else now
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now=None):
+        """
+        The consume function takes the token of one send.
+
+        :param now: The current time of the bucket's clock
+        :return: None
+        """
+        now = self.clock() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+
+    @property
+    def idle(self):
+        """
+        The idle property tells whether the bucket is full again, so forgetting it
+        changes nothing.
+
+        :return: True if no send is being limited by the bucket
+        """
+        self._refill(self.clock())
+        return self.tokens >= self.capacity
+
+
+class SendJob:
+    """
+    A SendJob is one Bot API call waiting in the send queue.
+    """
+
+    __slots__ = (
+        "chat_id", "func", "args", "kwargs", "priority", "future", "attempts", "span", "queued_at"
+    )
+
+    def __init__(self, chat_id, func, args, kwargs, priority, future, span=None):
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+        # The span of the caller, the call is traced as its child
+        self.span = span
+        self.queued_at = time.perf_counter()
+
+
+class SendQueue:
+    """
+    The SendQueue is the single way out to the Bot API. It keeps every send within
+    Telegram's limits with a global token bucket and one bucket per chat (private
+    chats and groups have different limits), sends the calls of one chat in order,
+    serves interactive replies before scheduled digests, and waits out RetryAfter
+    answers before trying the same call again instead of losing it.
+    """
+
+    def __init__(
+        self,
+        global_rate=30,
+        chat_rate=1,
+        chat_burst=3,
+        group_rate=20 / 60,
+        group_burst=20,
+        max_retries=5,
+        clock=time.monotonic,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.reset()
+
+    def reset(self):
+        """
+        The reset function drops the waiting calls, the dispatcher and the per-chat
+        limits, used when the queue moves to another event loop.
+
+        :return: None
+        """
+        self._chat_buckets = {}
+        self._paused_until = {}
+        self._lanes = {priority: deque() for priority in LANES}
+        self._busy = set()
+        self._tasks = set()
+        self._loop = None
+        self._wake = None
+        self._dispatcher = None
+
+    def depth(self):
+        """
+        The depth function counts the calls waiting in every lane.
+
+        :return: A dictionary from lane name to the number of waiting calls
+        """
+        return {LANES[priority]: len(lane) for priority, lane in self._lanes.items()}
+
+    def stats(self):
+        """
+        The stats function returns the queue metrics.
+
+        :return: A dictionary with the depth of every lane, the calls in flight and
+            the sent, retried and failed counters
+        """
+        return {
+            "depth": self.depth(),
+            "in_flight": len(self._busy),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_BUCKETS:
+                for idle_chat in [c for c, b in self._chat_buckets.items() if b.idle]:
+                    del self._chat_buckets[idle_chat]
+            # Group and channel ids are negative
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst, self.clock)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, self.clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def submit(self, chat_id, func, /, *args, priority=INTERACTIVE, **kwargs):
+        """
+        The submit function queues a Bot API call and waits for its result.
+
+        :param chat_id: The chat the call sends to, for the per-chat limit
+        :param func: The Bot API coroutine function, for example message.reply_text
+        :param args: Positional arguments for the call
+        :param priority: INTERACTIVE or DIGEST
+        :param kwargs: Keyword arguments for the call
+        :return: Whatever the call returns
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.reset()
+            self._loop = loop
+            self._wake = asyncio.Event()
+        future = loop.create_future()
+        self._lanes[priority].append(
+            SendJob(chat_id, func, args, kwargs, priority, future, current_span())
+        )
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        self._wake.set()
+        return await future
+
+    def _next_job(self):
+        """
+        Pick the first sendable call in priority order.
+        Return (job, None), or (None, seconds until something may be sendable).
+        """
+        now = self.clock()
+        wait = self.global_bucket.wait_time(now)
+        if wait:
+            return None, wait
+        wait = None
+        for priority, lane in self._lanes.items():
+            if any(job.future.done() for job in lane):
+                # Drop the calls whose caller gave up
+                lane = self._lanes[priority] = deque(j for j in lane if not j.future.done())
+            seen = set()
+            for index, job in enumerate(lane):
+                if job.chat_id in seen or job.chat_id in self._busy:
+                    # Keep the calls of one chat in order
+                    seen.add(job.chat_id)
+                    continue
+                seen.add(job.chat_id)
+                paused = self._paused_until.get(job.chat_id, 0) - now
+                if paused <= 0:
+                    self._paused_until.pop(job.chat_id, None)
+                bucket = self._chat_bucket(job.chat_id)
+                chat_wait = max(paused, bucket.wait_time(now))
+                if chat_wait > 0:
+                    wait = chat_wait if wait is None else min(wait, chat_wait)
+                    continue
+                del lane[index]
+                self.global_bucket.consume(now)
+                bucket.consume(now)
+                return job, None
+        return None, wait
+
+    async def _dispatch(self):
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._busy.add(job.chat_id)
+            task = asyncio.create_task(self._send(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, job):
+        method = getattr(job.func, "__name__", "call")
+        started = time.perf_counter()
+        attributes = {
+            "chat.id": job.chat_id,
+            "send.attempt": job.attempts + 1,
+            "send.queued_ms": round((started - job.queued_at) * 1000, 1),
+        }
+        try:
+            with tracer.span(f"telegram.{method}", attributes, parent=job.span, kind=KIND_CLIENT):
+                try:
+                    result = await job.func(*job.args, **job.kwargs)
+                finally:
+                    SEND_SECONDS.observe(time.perf_counter() - started, method=method)
+        except RetryAfter as e:
+            SEND_ERRORS.inc(method=method, error="RetryAfter")
+            retry_after = getattr(e.retry_after, "total_seconds", lambda: e.retry_after)()
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                # Telegram asked us to slow down, wait before anything else goes to this chat
+                self.retried += 1
+                logger.info(f"Flood limit hit for chat {job.chat_id}, retrying in {retry_after}s.")
+                self._paused_until[job.chat_id] = self.clock() + retry_after
+                self._lanes[job.priority].appendleft(job)
+        except Exception as e:
+            SEND_ERRORS.inc(method=method, error=type(e).__name__)
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._busy.discard(job.chat_id)
+            self._wake.set()
+
+
+send_queue = SendQueue(
+    global_rate=float(os.getenv("SEND_RATE_GLOBAL", "30")),
+    chat_rate=float(os.getenv("SEND_RATE_CHAT", "1")),
+    chat_burst=int(os.getenv("SEND_BURST_CHAT", "3")),
+    group_rate=float(os.getenv("SEND_RATE_GROUP", "20")) / 60,
+    group_burst=int(os.getenv("SEND_BURST_GROUP", "20")),
+)
+
+SEND_QUEUE_DEPTH = Gauge(
+    "notti_send_queue_depth",
+    "Bot API calls waiting in the send queue.",
+    ["lane"],
+    function=lambda: send_queue.depth(),
+)
+SEND_QUEUE_SENT = Counter(
+    "notti_send_queue_sent_total",
+    "Bot API calls the send queue delivered.",
+    function=lambda: send_queue.sent,
+)
+SEND_QUEUE_RETRIED = Counter(
+    "notti_send_queue_retried_total",
+    "Bot API calls the send queue tried again after a flood limit.",
+    function=lambda: send_queue.retried,
+)
+SEND_QUEUE_FAILED = Counter(
+    "notti_send_queue_failed_total",
+    "Bot API calls the send queue gave up on.",
+    function=lambda: send_queue.failed,
+)
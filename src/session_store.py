@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import os
+
+from src.account_store import account_key
+
+logger = logging.getLogger(__name__)
+
+
+def _session_path(username, password):
+    """
+    The _session_path function returns the file that holds the cookies of an account.
+    The file is named after the account key, so only the right password finds the
+    session, and it is hashed so the login never shows up in file names.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: A path to the session file
+    """
+    session_dir = os.path.join(os.getenv("DATA_DIR", "data"), "sessions")
+    key = account_key(username, password)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(session_dir, f"{digest}.json")
+
+
+def save_session(username, password, cookies):
+    """
+    The save_session function stores the cookies of an authenticated session on disk.
+    The directory and the file are only readable by the bot user.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :param cookies: A list of cookie dictionaries as returned by driver.get_cookies()
+    :return: None
+    """
+    path = _session_path(username, password)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as session_file:
+        json.dump(cookies, session_file)
+    # Replace atomically so a crash never leaves a half written session behind
+    os.replace(tmp_path, path)
+    logger.info("Saved the authenticated session.")
+
+
+def load_session(username, password):
+    """
+    The load_session function reads previously saved cookies of an account.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: A list of cookie dictionaries, or None if there is no usable session
+    """
+    path = _session_path(username, password)
+    try:
+        with open(path) as session_file:
+            cookies = json.load(session_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable session file: {e}")
+        return None
+    return cookies or None
+
+
+def clear_session(username, password):
+    """
+    The clear_session function forgets the saved session of an account.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: None
+    """
+    try:
+        os.remove(_session_path(username, password))
+    except FileNotFoundError:
+        pass
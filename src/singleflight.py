@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+from src.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    The SingleFlight class makes sure that only one call per key is in flight at a
+    time. Callers that arrive while a call for their key is running do not start a
+    new one; they wait for the running call and all receive its result. Calls for
+    different keys run independently.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def in_flight(self, key):
+        """
+        The in_flight function tells whether a call for the key is running.
+
+        :param key: The key of the call, for example the account key
+        :return: True if a call is running
+        """
+        return key in self._calls
+
+    async def do(self, key, func):
+        """
+        The do function runs func for the key, unless a call for the key is already
+        running, in which case it waits for that call instead.
+
+        :param key: The key of the call, for example the account key
+        :param func: A function without arguments returning an awaitable
+        :return: The result of the call
+        """
+        self.requests += 1
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            # The call runs as its own task, so one impatient caller being
+            # cancelled does not cancel the work the other callers wait for.
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            logger.info("Joined an in-flight call instead of starting a new one.")
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self):
+        """
+        The stats function returns the counters of the single-flight layer.
+
+        :return: A dictionary with the requests, executions and coalesced counts
+        """
+        return {
+            "requests": self.requests,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+scrape_flight = SingleFlight()
+
+SCRAPE_REQUESTS = Counter(
+    "notti_scrape_requests_total",
+    "Bookmark scrapes asked for, started or joined.",
+    function=lambda: scrape_flight.requests,
+)
+SCRAPE_EXECUTIONS = Counter(
+    "notti_scrape_executions_total",
+    "Bookmark scrapes started.",
+    function=lambda: scrape_flight.executions,
+)
+SCRAPE_COALESCED = Counter(
+    "notti_scrape_coalesced_total",
+    "Bookmark scrapes that joined one already in flight for the account.",
+    function=lambda: scrape_flight.coalesced,
+)
+SCRAPES_IN_FLIGHT = Gauge(
+    "notti_scrapes_in_flight",
+    "Bookmark scrapes running.",
+    function=lambda: len(scrape_flight._calls),
+)
@@ -0,0 +1,67 @@
+import os
+import re
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The website is read from MANGA_WEB_SITE, which the benchmarks point at a local emulator.
+BASE_URL = (os.getenv("MANGA_WEB_SITE") or "https://manga-scans.com").rstrip("/")
+DOMAIN = urlsplit(BASE_URL).hostname
+LOGIN_URL = f"{BASE_URL}/login"
+BOOKMARKS_URL = f"{BASE_URL}/bookmarks/"
+
+_PAGE_NUMBER_RE = re.compile(r"/page/(\d+)/?|[?&]paged?=(\d+)")
+
+
+def bookmarks_page_url(page):
+    """
+    The bookmarks_page_url function returns the address of a page of the bookmarks list.
+
+    :param page: The page number, starting at 1
+    :return: The url of the page
+    """
+    if page <= 1:
+        return BOOKMARKS_URL
+    return f"{BOOKMARKS_URL}page/{page}/"
+
+
+def max_page_number(links):
+    """
+    The max_page_number function finds the number of bookmark pages from the links of
+    the pagination block, such as /bookmarks/page/7/ or a plain "7" link text.
+
+    :param links: A list of (href, text) pairs of the pagination links
+    :return: The number of pages, at least 1
+    """
+    pages = 1
+    for link in links:
+        if not isinstance(link, (list, tuple)) or len(link) != 2:
+            continue
+        href, text = link
+        if isinstance(href, str):
+            match = _PAGE_NUMBER_RE.search(href)
+            if match:
+                pages = max(pages, int(match.group(1) or match.group(2)))
+        if isinstance(text, str) and text.strip().isdigit():
+            pages = max(pages, int(text.strip()))
+    return pages
+
+
+def merge_pages(pages):
+    """
+    The merge_pages function joins the bookmarks of several pages in page order and
+    drops bookmarks that show up more than once, keeping their first occurrence.
+
+    :param pages: A list of bookmark lists, one per page, in page order
+    :return: A list of dictionaries
+    """
+    seen = set()
+    merged = []
+    for bookmarks in pages:
+        for bookmark in bookmarks:
+            if bookmark["link"] in seen:
+                continue
+            seen.add(bookmark["link"])
+            merged.append(bookmark)
+    return merged
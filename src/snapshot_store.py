@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    version TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    bookmarks TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_account ON snapshots (account, created_at);
+"""
+
+VERSION_LENGTH = 10
+
+
+def snapshot_version(account, bookmarks):
+    """
+    The snapshot_version function derives a short version from the account and the
+    content of its bookmarks list, so the same list always gets the same version.
+
+    :param account: The account the bookmarks belong to
+    :param bookmarks: The list of bookmarks
+    :return: A hex string of VERSION_LENGTH characters
+    """
+    payload = json.dumps([account, bookmarks], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:VERSION_LENGTH]
+
+
+class SnapshotStore:
+    """
+    The SnapshotStore keeps the bookmark lists shown to users, by version, in an
+    embedded SQLite database with the most recently used ones in memory. Page
+    buttons carry the version, so a page can be shown again after a restart without
+    scraping. Only the newest snapshots of every account are kept.
+    """
+
+    def __init__(self, path, keep=5, memory_size=32):
+        self.path = path
+        self.keep = keep
+        self.memory_size = memory_size
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _remember(self, version, bookmarks):
+        self._memory[version] = bookmarks
+        self._memory.move_to_end(version)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def save(self, account, bookmarks):
+        """
+        The save function stores a bookmarks snapshot of an account and drops the
+        account's snapshots beyond the newest keep.
+
+        :param account: The account the bookmarks belong to
+        :param bookmarks: The list of bookmarks
+        :return: The version of the snapshot
+        """
+        version = snapshot_version(account, bookmarks)
+        payload = json.dumps(bookmarks)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO snapshots (version, account, bookmarks, created_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (version) DO UPDATE SET created_at = excluded.created_at
+                    """,
+                    (version, account, payload, time.time()),
+                )
+                self._conn.execute(
+                    "DELETE FROM snapshots WHERE account = ? AND version NOT IN ("
+                    "SELECT version FROM snapshots WHERE account = ? "
+                    "ORDER BY created_at DESC LIMIT ?)",
+                    (account, account, self.keep),
+                )
+            self._remember(version, bookmarks)
+        return version
+
+    def load(self, version):
+        """
+        The load function returns the bookmarks of a snapshot, from memory or disk.
+
+        :param version: The version of the snapshot
+        :return: The list of bookmarks, or None if the snapshot is gone
+        """
+        with self._lock:
+            bookmarks = self._memory.get(version)
+            if bookmarks is not None:
+                self._memory.move_to_end(version)
+                return bookmarks
+            row = self._conn.execute(
+                "SELECT bookmarks FROM snapshots WHERE version = ?", (version,)
+            ).fetchone()
+            if row is None:
+                return None
+            bookmarks = json.loads(row[0])
+            self._remember(version, bookmarks)
+            return bookmarks
+
+    def latest(self, account):
+        """
+        The latest function returns the newest snapshot of an account.
+
+        :param account: The account the bookmarks belong to
+        :return: A (version, bookmarks) tuple, or None if the account has none
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM snapshots WHERE account = ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (account,),
+            ).fetchone()
+        if row is None:
+            return None
+        bookmarks = self.load(row[0])
+        return (row[0], bookmarks) if bookmarks is not None else None
+
+    def close(self):
+        """
+        The close function closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """
+    The get_snapshot_store function returns the snapshot store kept in DATA_DIR.
+
+    :return: A SnapshotStore instance
+    """
+    path = os.path.join(os.getenv("DATA_DIR", "data"), "snapshots.sqlite3")
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SnapshotStore(path)
+        return _stores[path]
@@ -0,0 +1,453 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Attributes describing the whole request. Every span of a trace carries them, even
+# the spans that ended before they were known, such as the login before the scrape.
+TRACE_ATTRIBUTES = ("chat.id", "bookmarks.count")
+# A trace whose root never ends is exported in parts of this many spans.
+MAX_TRACE_SPANS = 1000
+# How many exported traces are remembered, so their late spans are exported at once
+MAX_EXPORTED_TRACES = 1000
+SERVICE_NAME = "notti-bot"
+
+# OpenTelemetry span kinds and status codes
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Marks a span started without an explicit parent
+_CURRENT = object()
+
+
+class Span:
+    """
+    A Span is one timed step of a request, with the fields of an OpenTelemetry span:
+    its trace, its parent, start and end in Unix nanoseconds, attributes and status.
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind",
+        "start_ns", "end_ns", "attributes", "status", "status_message",
+    )
+
+    def __init__(self, name, trace_id, parent_id=None, kind=KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        """
+        The set_attribute function adds an attribute to the span.
+
+        :param key: The attribute name, for example chat.id
+        :param value: A string, number or boolean
+        :return: None
+        """
+        self.attributes[key] = value
+
+    @property
+    def duration(self):
+        """
+        The duration property tells how long the span took.
+
+        :return: The duration in seconds, or None while the span runs
+        """
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e9
+
+
+class _NoSpan:
+    """
+    The span handed out while tracing is off, it records nothing.
+    """
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _ActiveSpan:
+    """
+    The context manager making a span the current one until it ends.
+    """
+
+    __slots__ = ("tracer", "span", "_token")
+
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.span.status = STATUS_ERROR
+            self.span.status_message = f"{exc_type.__name__}: {exc}"
+        self.tracer.end(self.span)
+        return False
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP/JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """
+    The to_otlp function writes spans in the OTLP/JSON format of OpenTelemetry, the
+    format the otlpjsonfile receiver of the OpenTelemetry Collector reads.
+
+    :param spans: A list of ended Spans
+    :return: A dictionary ready for json.dumps
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": span.kind,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [
+                                    {"key": key, "value": _otlp_value(value)}
+                                    for key, value in span.attributes.items()
+                                ],
+                                "status": {"code": span.status, "message": span.status_message},
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class FileExporter:
+    """
+    The FileExporter appends every finished trace to a file as one line of OTLP/JSON.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, spans):
+        """
+        The export function writes the spans of a trace.
+
+        :param spans: A list of ended Spans
+        :return: None
+        """
+        line = json.dumps(to_otlp(spans), separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self):
+        """
+        The shutdown function closes the file.
+
+        :return: None
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ConsoleExporter:
+    """
+    The ConsoleExporter prints every finished trace as an indented tree, one span per
+    line with its duration and attributes.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        depth = {}
+        lines = []
+        for span in sorted(spans, key=lambda span: span.start_ns):
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+            attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            error = f" ERROR {span.status_message}" if span.status == STATUS_ERROR else ""
+            lines.append(
+                f"{'  ' * depth[span.span_id]}{span.name} {span.duration * 1000:.1f}ms"
+                f" trace={span.trace_id} {attributes}{error}".rstrip()
+            )
+        with self._lock:
+            stream = self.stream or sys.stderr
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+
+    def shutdown(self):
+        pass
+
+
+class Tracer:
+    """
+    The Tracer times the steps of a request as spans. The current span is kept in a
+    context variable, so spans started in a coroutine, in the tasks it creates and in
+    the threads it hands work to with in_context become its children. A trace is
+    exported when its root span ends, with its request attributes copied to every
+    span. Without an exporter tracing is off and a span costs a single check.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        # trace id -> ended spans waiting for the root of their trace
+        self._traces = {}
+        # ids of the traces exported when their root ended, oldest first
+        self._exported = OrderedDict()
+
+    @property
+    def enabled(self):
+        """
+        The enabled property tells whether spans are recorded.
+
+        :return: True if there is an exporter
+        """
+        return self.exporter is not None
+
+    def span(self, name, attributes=None, parent=_CURRENT, kind=KIND_INTERNAL):
+        """
+        The span function starts a span, use it as a context manager.
+
+        :param name: The name of the step, for example login
+        :param attributes: A dictionary of attributes
+        :param parent: The parent Span, defaults to the current span, None starts a
+            new trace
+        :param kind: KIND_INTERNAL, or KIND_CLIENT for calls to other services
+        :return: A context manager giving the Span
+        """
+        if self.exporter is None:
+            return NO_SPAN
+        if parent is _CURRENT:
+            parent = _current_span.get()
+        if parent is None or parent is NO_SPAN:
+            span = Span(name, f"{random.getrandbits(128):032x}", None, kind, attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        return _ActiveSpan(self, span)
+
+    def end(self, span):
+        """
+        The end function ends a span and exports its trace once the root has ended. A
+        span ending after its root, in a task the request left running, is exported on
+        its own.
+
+        :param span: The Span
+        :return: None
+        """
+        span.end_ns = time.time_ns()
+        with self._lock:
+            if span.trace_id in self._exported:
+                spans = [span]
+            else:
+                spans = self._traces.setdefault(span.trace_id, [])
+                spans.append(span)
+                if span.parent_id is not None and len(spans) < MAX_TRACE_SPANS:
+                    return
+                del self._traces[span.trace_id]
+                if span.parent_id is None:
+                    self._exported[span.trace_id] = True
+                    if len(self._exported) > MAX_EXPORTED_TRACES:
+                        self._exported.popitem(last=False)
+        self.export(spans)
+
+    def export(self, spans):
+        """
+        The export function hands the spans of a trace to the exporter.
+
+        :param spans: A list of ended Spans of one trace
+        :return: None
+        """
+        exporter = self.exporter
+        if exporter is None:
+            return
+        shared = {}
+        # The root's values win, then those of the spans that learned them
+        for span in reversed(spans):
+            for key in TRACE_ATTRIBUTES:
+                if key in span.attributes:
+                    shared.setdefault(key, span.attributes[key])
+        for span in spans:
+            for key, value in shared.items():
+                span.attributes.setdefault(key, value)
+        try:
+            exporter.export(spans)
+        except Exception as e:
+            logger.warning(f"Could not export {len(spans)} spans: {e}")
+
+    def shutdown(self):
+        """
+        The shutdown function exports the unfinished traces and closes the exporter.
+
+        :return: None
+        """
+        with self._lock:
+            traces, self._traces = list(self._traces.values()), {}
+        for spans in traces:
+            self.export(spans)
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def get_exporter():
+    """
+    The get_exporter function creates the exporter selected by TRACE_EXPORTER: file
+    writes OTLP/JSON lines to TRACE_FILE (DATA_DIR/traces.jsonl by default), console
+    prints the traces to stderr, and none, the default, turns tracing off.
+
+    :return: An exporter, or None
+    """
+    name = os.getenv("TRACE_EXPORTER", "none").lower()
+    if name == "file":
+        path = os.getenv("TRACE_FILE") or os.path.join(
+            os.getenv("DATA_DIR", "data"), "traces.jsonl"
+        )
+        return FileExporter(path)
+    if name == "console":
+        return ConsoleExporter()
+    if name not in ("", "none"):
+        logger.warning(f"Unknown trace exporter {name}, tracing is off.")
+    return None
+
+
+tracer = Tracer(get_exporter())
+
+
+def current_span():
+    """
+    The current_span function returns the span of the running step.
+
+    :return: The Span, or None outside of any span
+    """
+    return _current_span.get()
+
+
+def set_attribute(key, value):
+    """
+    The set_attribute function adds an attribute to the current span, if there is one.
+
+    :param key: The attribute name, for example bookmarks.count
+    :param value: A string, number or boolean
+    :return: None
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def traced(name, attributes=None, kind=KIND_INTERNAL):
+    """
+    The traced function decorates a plain or coroutine function so every call is a
+    span.
+
+    :param name: The name of the span
+    :param attributes: A dictionary of attributes, or a function taking the arguments
+        of the call and returning one
+    :param kind: The span kind
+    :return: The decorator
+    """
+
+    def decorator(func):
+        def span_for(args, kwargs):
+            extra = attributes(*args, **kwargs) if callable(attributes) else attributes
+            return tracer.span(name, extra, kind=kind)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if tracer.exporter is None:
+                    return await func(*args, **kwargs)
+                with span_for(args, kwargs):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if tracer.exporter is None:
+                    return func(*args, **kwargs)
+                with span_for(args, kwargs):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def in_context(func, *args, **kwargs):
+    """
+    The in_context function binds a call to the current context, so a function run on
+    another thread, for example by a ThreadPoolExecutor, continues the current trace.
+    Call it on the thread handing out the work.
+
+    :param func: The function
+    :param args: Positional arguments for the function
+    :param kwargs: Keyword arguments for the function
+    :return: A function without arguments making the call
+    """
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
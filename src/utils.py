@@ -1,27 +1,19 @@
-from src.scrapping import setup_driver, login, scrape_bookmarks,logging
+import asyncio
+import os
+import time
 
-
-async def format_bookmarks_page(bookmarks, page, page_size):
-    """
-    The format_bookmarks_page function takes a list of bookmarks, the page number to display, and the page size.
-    It returns a formatted message containing all of the bookmarks on that page.
-
-    :param bookmarks: Pass the list of bookmarks to the function
-    :param page: Determine which page of bookmarks to display
-    :param page_size: Determine how many bookmarks to show per page
-    :return: A string that contains the bookmarks for a page
-    """
-    # Calculate the starting and ending indices of the bookmarks for this page
-    page_start = page * page_size
-    page_end = page_start + page_size
-    # Initialize the message with a header
-    message = "<b>Your Bookmarked Mangas:</b>\n\n"
-    # Add each bookmark to the message with HTML formatting for hyperlinks
-    for bookmark in bookmarks[page_start:page_end]:
-        message += f"<a href='{bookmark['link']}'>{bookmark['title']}</a> - Last updated: {bookmark['last_update']}\n"
-    return message
+from src.scrapping import logging
+from src.account_store import account_key
+from src.backends import get_backend
+from src.scrape_executor import scrape_executor
+from src.singleflight import scrape_flight
+from src.bookmark_cache import bookmark_cache
+from src.history_store import get_history_store
+from src.metrics import CHECK_SECONDS
+from src.tracing import set_attribute, traced
 
 
+@traced("format_update_message")
 def format_update_message(update):
     """
     Formats the details of a manga update into a user-friendly message.
@@ -42,25 +34,149 @@ def format_update_message(update):
     return message
 
 
-def check_for_updates(username, password):
+@traced("fetch_bookmarks")
+def fetch_bookmarks(username, password):
     """
-    The check_for_updates function checks for updates to the bookmarks on your account.
-    It returns a list of dictionaries, each dictionary containing information about a bookmark that has been updated recently.
-    The keys in each dictionary are: 'title', 'url', and 'last_update'.
-
+    The fetch_bookmarks function scrapes all of the bookmarks of the account with the
+    configured scraping backend.
 
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
     :return: A list of dictionaries
     """
-    driver = setup_driver()
-    login(driver, username, password)
-    bookmarks_data = scrape_bookmarks(driver)
+    backend = get_backend()
+    set_attribute("scrape.backend", backend.name)
+    bookmarks = backend.fetch_bookmarks(username, password)
     logging.info("Got all bookmarks.")
-    driver.quit()
+    return bookmarks
+
+
+@traced("log_in")
+def log_in(username, password):
+    """
+    The log_in function logs into the website with the configured scraping backend.
+    The session is kept, so the next scrape of the account does not log in again.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: True if the website accepted the credentials
+    """
+    backend = get_backend()
+    set_attribute("scrape.backend", backend.name)
+    return backend.log_in(username, password)
+
+
+async def verify_credentials(username, password):
+    """
+    The verify_credentials function checks credentials with a real login on the
+    website, run on the scrape executor.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: True if the website accepted the credentials
+    """
+    return await scrape_executor.run(log_in, username, password)
+
 
-    recent_updates = []
-    for bookmark in bookmarks_data:
-        # Check if 'last_update' indicates a recent update (within hours or minutes)
-        if "hour" in bookmark["last_update"] or "min" in bookmark["last_update"]:
-            recent_updates.append(bookmark)
+def is_recent_update(bookmark, now=None):
+    """
+    The is_recent_update function tells whether a bookmark was updated within the last
+    RECENT_UPDATE_WINDOW seconds (24 hours by default).
+
+    :param bookmark: A scraped bookmark
+    :param now: The unix time to compare with, defaults to the current time
+    :return: True if the bookmark was updated recently
+    """
+    updated_at = bookmark.get("updated_at")
+    if updated_at is None:
+        # Records without a parsed time, check if 'last_update' indicates a recent
+        # update (within hours or minutes)
+        return "hour" in bookmark["last_update"] or "min" in bookmark["last_update"]
+    now = time.time() if now is None else now
+    window = int(os.getenv("RECENT_UPDATE_WINDOW", "86400"))
+    return updated_at > now - window
+
+
+def filter_recent_updates(bookmarks_data):
+    """
+    The filter_recent_updates function keeps only the bookmarks that were updated recently.
+
+    :param bookmarks_data: The list of scraped bookmarks
+    :return: A list of dictionaries
+    """
+    return [bookmark for bookmark in bookmarks_data if is_recent_update(bookmark)]
 
-    return recent_updates
+
+def detect_new_chapters(account, bookmarks_data):
+    """
+    The detect_new_chapters function compares a scrape with the chapter history of the
+    account and returns only the chapters that were not seen before.
+
+    :param account: The key of the account the bookmarks belong to
+    :param bookmarks_data: The list of scraped bookmarks
+    :return: A list of dictionaries
+    """
+    new_chapters = []
+    for bookmark, is_new_title in get_history_store().record(account, bookmarks_data):
+        # A title seen for the first time has no history to compare with, it is only
+        # reported when the website says it was updated recently.
+        if is_new_title and not is_recent_update(bookmark):
+            continue
+        new_chapters.append(bookmark)
+    return new_chapters
+
+
+async def fetch_bookmarks_async(username, password):
+    """
+    The fetch_bookmarks_async function is the awaitable version of fetch_bookmarks.
+    The scrape runs on the scrape executor, so the event loop keeps serving other users.
+    Concurrent calls for the same account share a single scrape.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: A list of dictionaries
+    """
+    return await scrape_flight.do(
+        account_key(username, password),
+        lambda: scrape_executor.run(fetch_bookmarks, username, password),
+    )
+
+
+async def get_bookmarks(username, password):
+    """
+    The get_bookmarks function returns the bookmarks of the account from the shared
+    bookmark cache, scraping the website only when the cache has nothing usable.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :return: A list of dictionaries
+    """
+    return await bookmark_cache.get(
+        account_key(username, password),
+        lambda: fetch_bookmarks_async(username, password),
+    )
+
+
+@CHECK_SECONDS.time()
+@traced("check_for_updates")
+async def check_for_updates_async(username, password, fresh=False):
+    """
+    The check_for_updates_async function checks for updates to the bookmarks on your account.
+    It returns a list of dictionaries, each dictionary containing information about a bookmark with a chapter that was not seen before.
+    The keys in each dictionary are: 'title', 'link', 'chapter_title', 'last_update' and 'image'.
+    It reads the bookmarks through the shared bookmark cache.
+
+    :param username: The login of the account on the website
+    :param password: The password of the account on the website
+    :param fresh: Scrape the website even when the cache holds recent bookmarks
+    :return: A list of dictionaries
+    """
+    account = account_key(username, password)
+    if fresh:
+        bookmarks_data = await bookmark_cache.refresh(
+            account, lambda: fetch_bookmarks_async(username, password)
+        )
+    else:
+        bookmarks_data = await get_bookmarks(username, password)
+    set_attribute("bookmarks.count", len(bookmarks_data))
+    return await asyncio.to_thread(detect_new_chapters, account, bookmarks_data)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from collections import namedtuple
+from http import HTTPStatus
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# Telegram sends updates far smaller than this.
+MAX_BODY = 1024 * 1024
+# Seconds an idle keep-alive connection stays open.
+KEEP_ALIVE_TIMEOUT = 75
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+Request = namedtuple("Request", ["method", "path", "headers", "body"])
+Response = namedtuple(
+    "Response", ["status", "body", "content_type"], defaults=["text/plain; charset=utf-8"]
+)
+
+
+class WebServer:
+    """
+    The WebServer is a small HTTP/1.1 server on the bot's event loop. It serves the
+    health check and, in webhook mode, receives the updates Telegram posts, so the
+    bot needs no web framework and no thread of its own. Handlers are coroutine
+    functions taking a Request and returning a Response.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8000):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self._server = None
+
+    def route(self, method, path, handler):
+        """
+        The route function serves a path with a handler.
+
+        :param method: The HTTP method, for example GET
+        :param path: The path, for example /health
+        :param handler: The coroutine function answering the requests
+        :return: None
+        """
+        self.routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        """
+        The start function starts listening.
+
+        :return: None
+        """
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # The port the system picked when it was 0
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Web server listening on port {self.port}.")
+
+    async def stop(self):
+        """
+        The stop function closes the server.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), timeout=KEEP_ALIVE_TIMEOUT
+                    )
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                if request is None:
+                    await self._write(writer, Response(HTTPStatus.BAD_REQUEST, "Bad Request"), False)
+                    return
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write(writer, await self._dispatch(request), keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            return None
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0")
+        if not length.isdigit() or int(length) > MAX_BODY:
+            return None
+        body = await reader.readexactly(int(length))
+        return Request(method.upper(), target.split("?", 1)[0], headers, body)
+
+    async def _dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return Response(HTTPStatus.METHOD_NOT_ALLOWED, "Method Not Allowed")
+            return Response(HTTPStatus.NOT_FOUND, "Not Found")
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"{request.method} {request.path} failed: {e}")
+            return Response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal Server Error")
+
+    @staticmethod
+    async def _write(writer, response, keep_alive):
+        body = response.body if isinstance(response.body, bytes) else response.body.encode()
+        status = HTTPStatus(response.status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def webhook_secret(bot_token):
+    """
+    The webhook_secret function derives the secret token Telegram sends with every
+    webhook request from the bot token, for when WEBHOOK_SECRET is not set.
+
+    :param bot_token: The token of the bot
+    :return: A secret of letters and digits
+    """
+    return hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()[:32]
+
+
+def telegram_webhook(application, secret_token):
+    """
+    The telegram_webhook function creates the handler receiving the updates Telegram
+    posts. Requests without the secret token are refused, and accepted updates are
+    put on the Application's update queue.
+
+    :param application: The telegram Application processing the updates
+    :param secret_token: The secret token given to Telegram with set_webhook
+    :return: A coroutine function taking a Request
+    """
+
+    async def receive_update(request):
+        # Compared in constant time, so the secret can not be guessed from timings
+        received = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(received.encode(), secret_token.encode()):
+            return Response(HTTPStatus.FORBIDDEN, "Forbidden")
+        try:
+            update = Update.de_json(json.loads(request.body), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid update received: {e}")
+            return Response(HTTPStatus.BAD_REQUEST, "Bad Request")
+        await application.update_queue.put(update)
+        return Response(HTTPStatus.OK, "OK")
+
+    return receive_update
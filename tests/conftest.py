@@ -6,4 +6,36 @@ from unittest.mock import Mock, patch, call
 def mock_driver():
     driver = Mock()
     driver.quit = Mock()
+    driver.current_url = "https://manga-scans.com/bookmarks/"
+    driver.find_elements = Mock(return_value=[])
+    driver.get_cookies = Mock(return_value=[{"name": "wordpress_logged_in", "value": "1"}])
     return driver
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # Keep sessions and other persistent state out of the working tree
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_bookmark_cache():
+    # The bookmark cache is process-wide, do not leak entries between tests
+    from src.bookmark_cache import bookmark_cache
+
+    bookmark_cache.invalidate()
+    yield
+    bookmark_cache.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def no_cover_downloads(monkeypatch):
+    # Tests never download cover images, Telegram is handed the url instead
+    monkeypatch.setattr("src.delivery.download_cover", lambda url: None)
+
+
+@pytest.fixture(autouse=True)
+def no_trace_export(monkeypatch):
+    # Tests do not write traces, whatever TRACE_EXPORTER says
+    monkeypatch.setattr("src.tracing.tracer.exporter", None)
@@ -0,0 +1,82 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import stat
+import pytest
+from src.account_store import (
+    Account,
+    AccountStore,
+    account_for_chat,
+    all_accounts,
+    get_account_store,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AccountStore(str(tmp_path / "accounts.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def operator(monkeypatch):
+    monkeypatch.setenv("SCHEDULE_CHAT_ID", "1")
+    monkeypatch.setenv("WORK_USER_LOGIN", "operator")
+    monkeypatch.setenv("WORK_USER_PASSWORD", "secret")
+
+
+def test_register_and_get(store):
+    store.register(10, "alice", "pw1")
+    store.register(20, "bob", "pw2")
+
+    assert store.get(10) == Account(10, "alice", "pw1")
+    assert store.get(30) is None
+    assert store.all() == [Account(10, "alice", "pw1"), Account(20, "bob", "pw2")]
+
+
+def test_register_replaces_credentials(store):
+    store.register(10, "alice", "pw1")
+    store.register(10, "alice", "pw2")
+
+    assert store.get(10) == Account(10, "alice", "pw2")
+    assert len(store.all()) == 1
+
+
+def test_remove(store):
+    store.register(10, "alice", "pw1")
+
+    assert store.remove(10) is True
+    assert store.remove(10) is False
+    assert store.get(10) is None
+
+
+def test_database_is_private(store):
+    mode = stat.S_IMODE(os.stat(store.path).st_mode)
+    assert mode == 0o600
+
+
+def test_operator_account_fallback(operator):
+    # Only the operator's own chat falls back to the configured credentials
+    assert account_for_chat(1) == Account(1, "operator", "secret")
+    assert account_for_chat(2) is None
+
+    get_account_store().register(2, "alice", "pw")
+    assert account_for_chat(2) == Account(2, "alice", "pw")
+    assert all_accounts() == [Account(1, "operator", "secret"), Account(2, "alice", "pw")]
+
+
+def test_registered_operator_chat_wins(operator):
+    get_account_store().register(1, "own-login", "pw")
+
+    assert account_for_chat(1) == Account(1, "own-login", "pw")
+    assert all_accounts() == [Account(1, "own-login", "pw")]
+
+
+def test_no_operator_account(monkeypatch):
+    monkeypatch.delenv("SCHEDULE_CHAT_ID", raising=False)
+
+    assert account_for_chat(1) is None
+    assert all_accounts() == []
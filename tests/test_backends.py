@@ -0,0 +1,239 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from src.backends import LoginFailed, SeleniumBackend, HttpBackend, get_backend
+from src.session_store import load_session, save_session
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture:
+        return fixture.read()
+
+
+def make_pool(driver):
+    pool = MagicMock()
+    pool.driver.return_value.__enter__.return_value = driver
+    return pool
+
+
+class FakeSiteSession(requests.Session):
+    """
+    A requests session that answers from the saved HTML fixtures instead of the network.
+    The bookmarks page is only served to a session holding the login cookie.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.posts = []
+
+    def _response(self, url, name):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = read_fixture(name).encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+    def get(self, url, **kwargs):
+        if "bookmarks" in url and self.cookies.get("wordpress_logged_in") == "valid":
+            return self._response(url, "bookmarks.html")
+        return self._response("https://manga-scans.com/login", "login.html")
+
+    def post(self, url, data=None, **kwargs):
+        self.posts.append(data)
+        if data.get("pwd") == "password":
+            self.cookies.set("wordpress_logged_in", "valid", domain="manga-scans.com")
+        return self._response("https://manga-scans.com/bookmarks/", "bookmarks.html")
+
+
+@pytest.fixture
+def fake_site():
+    session = FakeSiteSession()
+    with patch("src.backends.http_scrapping.setup_session", return_value=session):
+        yield session
+
+
+def test_get_backend(monkeypatch):
+    monkeypatch.delenv("SCRAPE_BACKEND", raising=False)
+    assert isinstance(get_backend(), HttpBackend)
+    assert isinstance(get_backend("selenium"), SeleniumBackend)
+
+    monkeypatch.setenv("SCRAPE_BACKEND", "selenium")
+    assert isinstance(get_backend(), SeleniumBackend)
+
+    with pytest.raises(ValueError):
+        get_backend("carrier-pigeon")
+
+
+def test_http_backend_logs_in_and_saves_session(fake_site):
+    bookmarks = HttpBackend().fetch_bookmarks("username", "password")
+
+    assert [bookmark["title"] for bookmark in bookmarks] == [
+        "Solo Leveling",
+        "Omniscient Reader & Co",
+        "Tower of God",
+    ]
+    assert len(fake_site.posts) == 1
+    assert load_session("username", "password")[0]["value"] == "valid"
+
+
+def test_http_backend_reuses_saved_session(fake_site):
+    save_session(
+        "username",
+        "password",
+        [{"name": "wordpress_logged_in", "value": "valid", "domain": "manga-scans.com"}],
+    )
+
+    bookmarks = HttpBackend().fetch_bookmarks("username", "password")
+
+    assert len(bookmarks) == 3
+    assert fake_site.posts == []  # No login form was submitted
+
+
+def test_http_backend_logs_in_when_session_expired(fake_site):
+    save_session(
+        "username",
+        "password",
+        [{"name": "wordpress_logged_in", "value": "expired", "domain": "manga-scans.com"}],
+    )
+
+    bookmarks = HttpBackend().fetch_bookmarks("username", "password")
+
+    assert len(bookmarks) == 3
+    assert len(fake_site.posts) == 1
+    assert load_session("username", "password")[0]["value"] == "valid"
+
+
+def test_http_backend_wrong_password(fake_site):
+    # A failed login is a failed scrape, not an empty bookmarks list
+    with pytest.raises(LoginFailed):
+        HttpBackend().fetch_bookmarks("username", "wrong")
+
+    assert load_session("username", "wrong") is None
+
+
+def test_http_backend_session_needs_the_password(fake_site):
+    save_session(
+        "username",
+        "password",
+        [{"name": "wordpress_logged_in", "value": "valid", "domain": "manga-scans.com"}],
+    )
+
+    # The login alone does not unlock the session of the account
+    with pytest.raises(LoginFailed):
+        HttpBackend().fetch_bookmarks("username", "wrong")
+    assert len(fake_site.posts) == 1
+
+
+def test_http_backend_log_in(fake_site):
+    assert HttpBackend().log_in("username", "wrong") is False
+    assert load_session("username", "wrong") is None
+
+    assert HttpBackend().log_in("username", "password") is True
+    assert load_session("username", "password")[0]["value"] == "valid"
+
+
+
+@patch("src.backends.login")
+@patch("src.backends.scrape_bookmarks")
+def test_selenium_backend_saves_session_after_login(
+    mock_scrape_bookmarks, mock_login, mock_driver
+):
+    backend = SeleniumBackend(pool=make_pool(mock_driver))
+    mock_scrape_bookmarks.return_value = [{"title": "Manga 1"}]
+
+    bookmarks = backend.fetch_bookmarks("username", "password")
+
+    assert bookmarks == [{"title": "Manga 1"}]
+    mock_login.assert_called_once_with(mock_driver, "username", "password")
+    assert load_session("username", "password") == mock_driver.get_cookies.return_value
+
+
+@patch("src.backends.login")
+@patch("src.backends.scrape_bookmarks")
+def test_selenium_backend_reuses_saved_session(
+    mock_scrape_bookmarks, mock_login, mock_driver
+):
+    backend = SeleniumBackend(pool=make_pool(mock_driver))
+    mock_scrape_bookmarks.return_value = [{"title": "Manga 1"}]
+    cookies = [{"name": "wordpress_logged_in", "value": "saved"}]
+    save_session("username", "password", cookies)
+
+    bookmarks = backend.fetch_bookmarks("username", "password")
+
+    # The saved cookies are injected and the login form is skipped
+    assert bookmarks == [{"title": "Manga 1"}]
+    mock_login.assert_not_called()
+    mock_scrape_bookmarks.assert_called_once_with(mock_driver)
+    mock_driver.execute_cdp_cmd.assert_any_call(
+        "Network.setCookies",
+        {
+            "cookies": [
+                {
+                    "name": "wordpress_logged_in",
+                    "value": "saved",
+                    "domain": "manga-scans.com",
+                    "path": "/",
+                    "secure": False,
+                    "httpOnly": False,
+                }
+            ]
+        },
+    )
+
+
+@patch("src.backends.login")
+@patch("src.backends.scrape_bookmarks")
+def test_selenium_backend_logs_in_when_session_expired(
+    mock_scrape_bookmarks, mock_login, mock_driver
+):
+    backend = SeleniumBackend(pool=make_pool(mock_driver))
+    save_session("username", "password", [{"name": "wordpress_logged_in", "value": "old"}])
+
+    # The first scrape lands on the login form, the second one after login does not
+    urls = iter(["https://manga-scans.com/login", "https://manga-scans.com/bookmarks/"])
+
+    def scrape(driver):
+        driver.current_url = next(urls)
+        return [] if "/login" in driver.current_url else [{"title": "Manga 1"}]
+
+    mock_scrape_bookmarks.side_effect = scrape
+
+    bookmarks = backend.fetch_bookmarks("username", "password")
+
+    assert bookmarks == [{"title": "Manga 1"}]
+    mock_login.assert_called_once_with(mock_driver, "username", "password")
+    assert load_session("username", "password") == mock_driver.get_cookies.return_value
+
+
+@patch("src.backends.login")
+@patch("src.backends.scrape_bookmarks")
+def test_selenium_backend_wrong_password(mock_scrape_bookmarks, mock_login, mock_driver):
+    backend = SeleniumBackend(pool=make_pool(mock_driver))
+    mock_scrape_bookmarks.return_value = []
+    mock_driver.current_url = "https://manga-scans.com/login"
+
+    with pytest.raises(LoginFailed):
+        backend.fetch_bookmarks("username", "wrong")
+    assert load_session("username", "wrong") is None
+
+
+@patch("src.backends.login")
+def test_selenium_backend_log_in(mock_login, mock_driver):
+    backend = SeleniumBackend(pool=make_pool(mock_driver))
+
+    assert backend.log_in("username", "password") is True
+    mock_login.assert_called_once_with(mock_driver, "username", "password")
+    assert load_session("username", "password") == mock_driver.get_cookies.return_value
+
+    # Wrong credentials leave the browser on the login form
+    mock_driver.current_url = "https://manga-scans.com/login"
+    assert backend.log_in("username", "wrong") is False
+    assert load_session("username", "wrong") is None
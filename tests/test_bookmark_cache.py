@@ -0,0 +1,125 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.bookmark_cache import BookmarkCache
+
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+    with patch("src.bookmark_cache.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_served_from_cache(clock):
+    cache = BookmarkCache(ttl=60)
+    loader = AsyncMock(return_value=["v1"])
+
+    assert await cache.get("alice", loader) == ["v1"]
+    clock[0] += 30
+    assert await cache.get("alice", loader) == ["v1"]
+
+    loader.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_revalidating(clock):
+    cache = BookmarkCache(ttl=60)
+    await cache.get("alice", AsyncMock(return_value=["v1"]))
+    clock[0] += 61
+
+    refreshed = asyncio.Event()
+
+    async def slow_loader():
+        await refreshed.wait()
+        return ["v2"]
+
+    # The stale copy comes back immediately, the refresh runs in the background
+    assert await cache.get("alice", slow_loader) == ["v1"]
+    assert await cache.get("alice", slow_loader) == ["v1"]
+    refreshed.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert cache.peek("alice") == ["v2"]
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_started_once(clock):
+    cache = BookmarkCache(ttl=60)
+    await cache.get("alice", AsyncMock(return_value=["v1"]))
+    clock[0] += 61
+    loader = AsyncMock(return_value=["v2"])
+
+    await asyncio.gather(*(cache.get("alice", loader) for _ in range(3)))
+    await asyncio.sleep(0)
+
+    loader.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_entry(clock):
+    cache = BookmarkCache(ttl=60)
+    await cache.get("alice", AsyncMock(return_value=["v1"]))
+    clock[0] += 61
+
+    await cache.get("alice", AsyncMock(side_effect=RuntimeError("site is down")))
+    await asyncio.sleep(0)
+
+    assert cache.peek("alice") == ["v1"]
+
+
+@pytest.mark.asyncio
+async def test_too_old_entry_reloaded(clock):
+    cache = BookmarkCache(ttl=60, max_stale=3600)
+    await cache.get("alice", AsyncMock(return_value=["v1"]))
+    clock[0] += 3601
+
+    assert await cache.get("alice", AsyncMock(return_value=["v2"])) == ["v2"]
+
+
+@pytest.mark.asyncio
+async def test_accounts_cached_separately(clock):
+    cache = BookmarkCache(ttl=60)
+
+    assert await cache.get("alice", AsyncMock(return_value=["a"])) == ["a"]
+    assert await cache.get("bob", AsyncMock(return_value=["b"])) == ["b"]
+    assert cache.peek("alice") == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_invalidate(clock):
+    cache = BookmarkCache(ttl=60)
+    await cache.get("alice", AsyncMock(return_value=["a"]))
+    await cache.get("bob", AsyncMock(return_value=["b"]))
+
+    cache.invalidate("alice")
+    assert cache.peek("alice") is None
+    assert cache.peek("bob") == ["b"]
+
+    cache.invalidate()
+    assert cache.peek("bob") is None
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_not_repopulated(clock):
+    cache = BookmarkCache(ttl=60)
+    release = asyncio.Event()
+
+    async def slow_loader():
+        await release.wait()
+        return ["old"]
+
+    load = asyncio.ensure_future(cache.get("alice", slow_loader))
+    await asyncio.sleep(0)
+    cache.invalidate("alice")
+    release.set()
+
+    assert await load == ["old"]
+    assert cache.peek("alice") is None
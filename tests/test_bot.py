@@ -3,6 +3,8 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import asyncio
+import time
 import pytest
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -10,21 +12,51 @@ from src.bot import (
     start,
     check_updates_command,
     list_bookmarks_command,
-    create_pagination_buttons,
     send_paginated_bookmarks,
     button,
     run_bot,
+    build_application,
+    post_init,
+    post_shutdown,
+    health_check,
+    metrics,
+    run_webhook,
     error,
+    refresh_command,
+    register_command,
+    unregister_command,
+    REGISTER_HINT,
+    EXPIRED_LIST,
 )
+from src.snapshot_store import get_snapshot_store
+from src.web_server import webhook_secret
+from src.account_store import account_key, get_account_store
 from src.utils import format_update_message
+from src.paginator import Paginator, create_pagination_buttons
+from src.backends import LoginFailed
+from src.scrape_executor import ScrapeQueueFull
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import Update, User
 from telegram.ext import CallbackContext
 
 
 load_dotenv()
 
+OPERATOR_CHAT_ID = 424242
+
+
+@pytest.fixture(autouse=True)
+def operator_account(monkeypatch):
+    # The operator's own chat scrapes with the configured credentials
+    monkeypatch.setenv("SCHEDULE_CHAT_ID", str(OPERATOR_CHAT_ID))
+    monkeypatch.setenv("WORK_USER_LOGIN", os.getenv("WORK_USER_LOGIN") or "operator")
+    monkeypatch.setenv("WORK_USER_PASSWORD", os.getenv("WORK_USER_PASSWORD") or "secret")
+
+
+def operator_key():
+    return account_key(os.getenv("WORK_USER_LOGIN"), os.getenv("WORK_USER_PASSWORD"))
+
 
 @pytest.mark.asyncio
 async def test_start():
@@ -53,7 +85,7 @@ async def test_start():
 
 
 @pytest.mark.asyncio
-@patch("src.bot.check_for_updates")
+@patch("src.bot.check_for_updates_async")
 async def test_check_updates_command(mock_check_for_updates):
     # Setup mock for check_for_updates
     mock_check_for_updates.return_value = [
@@ -69,40 +101,65 @@ async def test_check_updates_command(mock_check_for_updates):
 
     # Mock update and query objects
     mock_query = MagicMock()
-    mock_query.message = MagicMock()
-    mock_query.message.reply_photo = AsyncMock()
+    mock_query.message.chat_id = OPERATOR_CHAT_ID
 
     mock_update = MagicMock()
     mock_update.callback_query = mock_query
+    mock_update.effective_chat.id = OPERATOR_CHAT_ID
+
+    mock_context = MagicMock()
+    mock_context.bot.send_photo = AsyncMock()
 
     # Call the check_updates_command function
-    await check_updates_command(mock_update, MagicMock())
+    await check_updates_command(mock_update, mock_context)
 
-    # Assert that reply_photo is called for each manga update
-    assert mock_query.message.reply_photo.call_count == len(
-        mock_check_for_updates.return_value
-    )
+    # A single update is sent as a photo to the chat of the query
     for manga_update in mock_check_for_updates.return_value:
         message = format_update_message(manga_update)
-        mock_query.message.reply_photo.assert_any_await(
-            photo=manga_update["image"], caption=message, parse_mode="HTML"
+        mock_context.bot.send_photo.assert_any_await(
+            chat_id=OPERATOR_CHAT_ID,
+            photo=manga_update["image"],
+            caption=message,
+            parse_mode="HTML",
         )
 
 
 @pytest.mark.asyncio
-@patch("src.bot.setup_driver")
-@patch("src.bot.login")
-@patch("src.bot.scrape_bookmarks")
+@patch("src.bot.check_for_updates_async")
+async def test_check_updates_command_batches_updates(mock_check_for_updates):
+    mock_check_for_updates.return_value = [
+        {
+            "title": f"Manga {index}",
+            "image": f"http://example.com/img{index}",
+            "chapter_title": "Chapter 1",
+            "last_update": "1 hour ago",
+            "link": f"http://example.com/manga{index}",
+        }
+        for index in range(25)
+    ]
+    mock_update = MagicMock()
+    mock_update.effective_chat.id = OPERATOR_CHAT_ID
+    mock_update.callback_query.message.chat_id = OPERATOR_CHAT_ID
+    mock_context = MagicMock()
+    mock_context.bot.send_media_group = AsyncMock()
+
+    await check_updates_command(mock_update, mock_context)
+
+    # 25 updates go out in three media groups of 10, 10 and 5 photos
+    sizes = [
+        len(call.kwargs["media"]) for call in mock_context.bot.send_media_group.await_args_list
+    ]
+    assert sizes == [10, 10, 5]
+
+
+@pytest.mark.asyncio
+@patch("src.bot.get_bookmarks")
 @patch("src.bot.send_paginated_bookmarks")
-async def test_list_bookmarks_command(
-    mock_send_paginated_bookmarks, mock_scrape_bookmarks, mock_login, mock_setup_driver
-):
+async def test_list_bookmarks_command(mock_send_paginated_bookmarks, mock_fetch_bookmarks):
     # Setup mocks
     username = os.getenv("WORK_USER_LOGIN")
     password = os.getenv("WORK_USER_PASSWORD")
-    mock_driver = MagicMock()
-    mock_setup_driver.return_value = mock_driver
-    mock_scrape_bookmarks.return_value = [
+    mock_fetch_bookmarks.return_value = [
         {
             "title": "Bookmark 1",
             "link": "http://example.com/bookmark1",
@@ -117,6 +174,7 @@ async def test_list_bookmarks_command(
 
     mock_update = MagicMock()
     mock_update.callback_query = mock_query
+    mock_update.effective_chat.id = OPERATOR_CHAT_ID
 
     mock_context = MagicMock()
     mock_context.user_data = {}
@@ -124,70 +182,26 @@ async def test_list_bookmarks_command(
     # Call the list_bookmarks_command function
     await list_bookmarks_command(mock_update, mock_context)
 
-    # Verify web scraping functions were called
-    mock_setup_driver.assert_called_once()
-    mock_login.assert_called_once_with(mock_driver, username, password)
-    mock_scrape_bookmarks.assert_called_once_with(mock_driver)
-    mock_driver.quit.assert_called_once()
+    # Verify the bookmarks were fetched with the bot credentials
+    mock_fetch_bookmarks.assert_awaited_once_with(username, password)
 
-    # Verify that send_paginated_bookmarks was called
+    # Verify that send_paginated_bookmarks was called with the stored snapshot
+    version = get_snapshot_store().latest(operator_key())[0]
     mock_send_paginated_bookmarks.assert_awaited_once_with(
         mock_query.message,
         mock_context,
-        mock_scrape_bookmarks.return_value,
+        mock_fetch_bookmarks.return_value,
         page=0,
-        page_size=10,
+        version=version,
     )
 
 
-def test_create_pagination_buttons():
-    # Test for the first page
-    buttons_first_page = create_pagination_buttons(0, 3)
-    assert len(buttons_first_page.inline_keyboard[0]) == 2  # 'Page 1 of 3' and 'Next'
-    assert buttons_first_page.inline_keyboard[0][1].text == "Next ➡️"
-    assert buttons_first_page.inline_keyboard[0][1].callback_data == "next_1"
-
-    # Test for a middle page
-    buttons_middle_page = create_pagination_buttons(1, 3)
-    assert (
-        len(buttons_middle_page.inline_keyboard[0]) == 3
-    )  # 'Previous', 'Page 2 of 3', and 'Next'
-    assert buttons_middle_page.inline_keyboard[0][0].text == "⬅️ Previous"
-    assert buttons_middle_page.inline_keyboard[0][0].callback_data == "prev_0"
-    assert buttons_middle_page.inline_keyboard[0][2].text == "Next ➡️"
-    assert buttons_middle_page.inline_keyboard[0][2].callback_data == "next_2"
-
-    # Test for the last page
-    buttons_last_page = create_pagination_buttons(2, 3)
-    assert (
-        len(buttons_last_page.inline_keyboard[0]) == 2
-    )  # 'Previous' and 'Page 3 of 3'
-    assert buttons_last_page.inline_keyboard[0][0].text == "⬅️ Previous"
-    assert buttons_last_page.inline_keyboard[0][0].callback_data == "prev_1"
-
-    # Test when there are no pages
-    buttons_no_pages = create_pagination_buttons(0, 0)
-    assert len(buttons_no_pages.inline_keyboard) == 0  # No buttons
-
-
 @pytest.mark.asyncio
-@patch("src.bot.format_bookmarks_page")
-@patch("src.bot.create_pagination_buttons")
-async def test_send_paginated_bookmarks(
-    mock_create_pagination_buttons, mock_format_bookmarks_page
-):
-    # Mock data
+async def test_send_paginated_bookmarks():
+    # Short bookmarks all fit on one page
     bookmarks = [
-        {"title": "Bookmark 1", "link": "http://example.com/bookmark1"}
+        {"title": "Bookmark 1", "link": "http://example.com/bookmark1", "last_update": "1 hour ago"}
     ] * 20  # Example bookmarks
-    page = 0
-    page_size = 10
-    formatted_message = "Formatted bookmarks page"
-    reply_markup = MagicMock()
-
-    # Setup mocks
-    mock_format_bookmarks_page.return_value = formatted_message
-    mock_create_pagination_buttons.return_value = reply_markup
 
     mock_message = MagicMock()
     mock_message.reply_text = AsyncMock()
@@ -195,21 +209,12 @@ async def test_send_paginated_bookmarks(
     mock_context = MagicMock()
 
     # Call the function
-    await send_paginated_bookmarks(
-        mock_message, mock_context, bookmarks, page, page_size
-    )
-
-    # Verify that format_bookmarks_page was called correctly
-    mock_format_bookmarks_page.assert_called_once_with(bookmarks, page, page_size)
+    await send_paginated_bookmarks(mock_message, mock_context, bookmarks, 0)
 
-    # Verify that create_pagination_buttons was called correctly
-    total_pages = 2  # Based on 20 bookmarks and 10 per page
-    mock_create_pagination_buttons.assert_called_once_with(page, total_pages)
-
-    # Verify that the message was sent with correct parameters
+    # Verify that the message was sent with the first page and its buttons
     mock_message.reply_text.assert_awaited_once_with(
-        formatted_message,
-        reply_markup=reply_markup,
+        Paginator(bookmarks).page(0)[0],
+        reply_markup=create_pagination_buttons(0, 1),
         parse_mode="HTML",
         disable_web_page_preview=True,
     )
@@ -218,17 +223,9 @@ async def test_send_paginated_bookmarks(
 @pytest.mark.asyncio
 @patch("src.bot.check_updates_command")
 @patch("src.bot.send_paginated_bookmarks")
-@patch("src.bot.format_bookmarks_page")
-@patch("src.bot.create_pagination_buttons")
-@patch("src.bot.setup_driver")
-@patch("src.bot.login")
-@patch("src.bot.scrape_bookmarks")
+@patch("src.bot.get_bookmarks")
 async def test_button(
-    mock_scrape_bookmarks,
-    mock_login,
-    mock_setup_driver,
-    mock_create_pagination_buttons,
-    mock_format_bookmarks_page,
+    mock_fetch_bookmarks,
     mock_send_paginated_bookmarks,
     mock_check_updates_command,
 ):
@@ -240,16 +237,18 @@ async def test_button(
     mock_query.edit_message_text = AsyncMock()  # Use AsyncMock here
     mock_update = MagicMock()
     mock_update.callback_query = mock_query
+    mock_update.effective_chat.id = OPERATOR_CHAT_ID
     mock_context = MagicMock()
     mock_context.user_data = {}
 
     # Setup for web scraping
-    mock_driver = MagicMock()
-    mock_setup_driver.return_value = mock_driver
-    mock_scrape_bookmarks.return_value = [
-        {"title": "Bookmark 1", "link": "http://example.com/bookmark1"},
-        # ... other mock bookmarks
+    # Long titles, the 15 bookmarks need two pages
+    mock_fetch_bookmarks.return_value = [
+        {"title": f"Bookmark {index} " + "x" * 400, "link": f"http://example.com/bookmark{index}", "last_update": "1 hour ago"}
+        for index in range(15)
     ]
+    pages = Paginator(mock_fetch_bookmarks.return_value)
+    assert pages.total_pages == 2
 
     # Test "get_update" scenario
     mock_query.data = "get_update"
@@ -259,58 +258,137 @@ async def test_button(
     # Test "get_all_list" scenario
     mock_query.data = "get_all_list"
     await button(mock_update, mock_context)
-    mock_setup_driver.assert_called_once()
-    mock_login.assert_called_once_with(
-        mock_driver, username, password
-    )  # Replace with actual credentials
-    mock_scrape_bookmarks.assert_called_once_with(mock_driver)
-    mock_driver.quit.assert_called_once()
+    mock_fetch_bookmarks.assert_awaited_once_with(username, password)
+    version = get_snapshot_store().latest(operator_key())[0]
     mock_send_paginated_bookmarks.assert_awaited_once_with(
         mock_query.message,
         mock_context,
-        mock_scrape_bookmarks.return_value,
+        mock_fetch_bookmarks.return_value,
         page=0,
-        page_size=10,
+        version=version,
     )
+    pages = Paginator(mock_fetch_bookmarks.return_value, version=version)
+    assert pages.total_pages == 2
 
-    # Reset mocks for pagination test
-    mock_check_updates_command.reset_mock()
-    mock_send_paginated_bookmarks.reset_mock()
-
-    # Test "next_" scenario
-    mock_query.data = "next_1"
-    mock_context.user_data["bookmarks"] = mock_scrape_bookmarks.return_value
+    # Test the "Next" button
+    mock_query.data = pages.page(0)[1].inline_keyboard[0][-1].callback_data
+    assert mock_query.data == f"p:{version}:1"
     await button(mock_update, mock_context)
-    mock_format_bookmarks_page.assert_awaited_once_with(
-        mock_context.user_data["bookmarks"], 1, page_size=10
+    text, reply_markup = pages.page(1)
+    mock_query.edit_message_text.assert_awaited_once_with(
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
     )
-    mock_create_pagination_buttons.assert_called_once()
-    mock_query.edit_message_text.assert_awaited_once()
 
-    # Reset mocks for previous page test
-    mock_format_bookmarks_page.reset_mock()
-    mock_create_pagination_buttons.reset_mock()
+    # Test the "Previous" button
     mock_query.edit_message_text.reset_mock()
-
-    # Test "prev_" scenario
-    mock_query.data = "prev_0"
+    mock_query.data = f"p:{version}:0"
     await button(mock_update, mock_context)
-    mock_format_bookmarks_page.assert_awaited_once_with(
-        mock_context.user_data["bookmarks"], 0, page_size=10
+    text, reply_markup = pages.page(0)
+    mock_query.edit_message_text.assert_awaited_once_with(
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
     )
-    mock_create_pagination_buttons.assert_called_once()
-    mock_query.edit_message_text.assert_awaited_once()
+    mock_fetch_bookmarks.assert_awaited_once()
+
+
+def page_button_update(data, chat_id=OPERATOR_CHAT_ID):
+    query = MagicMock()
+    query.answer = AsyncMock()
+    query.edit_message_text = AsyncMock()
+    query.data = data
+    update = MagicMock()
+    update.callback_query = query
+    update.effective_chat.id = chat_id
+    update.effective_message.reply_text = AsyncMock()
+    return update
+
+
+@pytest.mark.asyncio
+@patch("src.paginator.create_pagination_buttons", wraps=create_pagination_buttons)
+async def test_page_navigation_renders_once(mock_create_pagination_buttons):
+    bookmarks = [{"title": "T" * 300, "link": "L", "last_update": "U"}] * 30
+    version = get_snapshot_store().save("operator", bookmarks)
+    assert Paginator(bookmarks).total_pages == 3
+
+    # Two chats paging through the same snapshot, back and forth
+    for page in [1, 2, 1, 0, 1]:
+        await button(page_button_update(f"p:{version}:{page}", 1), MagicMock())
+        await button(page_button_update(f"p:{version}:{page}", 2), MagicMock())
+
+    # Each of the three pages was rendered exactly once
+    assert mock_create_pagination_buttons.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("src.bot.get_bookmarks")
+async def test_page_navigation_survives_restart(mock_get_bookmarks, data_dir):
+    import src.snapshot_store as snapshot_store
+
+    bookmarks = [{"title": f"T{index}" * 100, "link": "L", "last_update": "U"} for index in range(30)]
+    version = get_snapshot_store().save(operator_key(), bookmarks)
+
+    # A restart forgets everything kept in memory
+    snapshot_store._stores.clear()
+    update = page_button_update(f"p:{version}:2")
+    await button(update, MagicMock())
+
+    text, reply_markup = Paginator(bookmarks, version=version).page(2)
+    update.callback_query.edit_message_text.assert_awaited_once_with(
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+    )
+    mock_get_bookmarks.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("src.bot.get_bookmarks")
+async def test_stale_page_button_shows_latest_snapshot(mock_get_bookmarks):
+    bookmarks = [{"title": "T", "link": "L", "last_update": "U"}]
+    version = get_snapshot_store().save(operator_key(), bookmarks)
+
+    # An old button, or one from before versioned pages
+    for data in ["p:0123456789:3", "next_3"]:
+        update = page_button_update(data)
+        await button(update, MagicMock())
+
+        text, reply_markup = Paginator(bookmarks, version=version).page(0)
+        update.callback_query.edit_message_text.assert_awaited_once_with(
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+        )
+    # Without scraping again
+    mock_get_bookmarks.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stale_page_button_without_snapshot():
+    update = page_button_update("p:0123456789:1")
+
+    await button(update, MagicMock())
+
+    kwargs = update.callback_query.edit_message_text.await_args.kwargs
+    assert kwargs["text"] == EXPIRED_LIST
+    assert kwargs["reply_markup"].inline_keyboard[0][0].callback_data == "get_all_list"
 
 
 @patch("src.bot.Application")
 @patch("src.bot.CommandHandler")
 @patch("src.bot.CallbackQueryHandler")
 @patch("src.bot.error")
-@patch("src.bot.run_schedule")
-@patch("os.getenv", return_value="test_bot_token")
+@patch("src.bot.get_persistence")
+@patch("os.getenv", side_effect=lambda name, default=None: {"BOT_TOKEN": "test_bot_token"}.get(name, default))
 def test_run_bot(
     mock_getenv,
-    mock_run_schedule,
+    mock_get_persistence,
     mock_error,
     mock_CallbackQueryHandler,
     mock_CommandHandler,
@@ -318,18 +396,31 @@ def test_run_bot(
 ):
     # Mocking Application and its methods
     mock_application = MagicMock()
-    mock_Application.builder.return_value.token.return_value.build.return_value = (
-        mock_application
-    )
+    builder = mock_Application.builder.return_value
+    builder.token.return_value = builder
+    builder.persistence.return_value = builder
+    builder.concurrent_updates.return_value = builder
+    builder.post_init.return_value = builder
+    builder.post_shutdown.return_value = builder
+    builder.build.return_value = mock_application
 
     # Call the function
     run_bot()
 
     # Check if environment variable BOT_TOKEN is retrieved
-    mock_getenv.assert_called_once_with("BOT_TOKEN")
+    mock_getenv.assert_any_call("BOT_TOKEN")
+
+    # Verify that user_data and chat_data are persisted
+    builder.persistence.assert_called_once_with(mock_get_persistence.return_value)
+    # A slow scrape does not hold up the updates of the other chats
+    builder.concurrent_updates.assert_called_once_with(True)
+    builder.post_init.assert_called_once_with(post_init)
+    builder.post_shutdown.assert_called_once_with(post_shutdown)
 
     # Verify that command handlers are added
-    assert mock_CommandHandler.call_count == 3  # start, check_updates, list_bookmarks
+    assert (
+        mock_CommandHandler.call_count == 6
+    )  # start, check_updates, list_bookmarks, refresh, register, unregister
 
     # Verify that callback query handler is added
     mock_CallbackQueryHandler.assert_called_once()
@@ -337,11 +428,116 @@ def test_run_bot(
     # Verify that the error handler is added
     mock_application.add_error_handler.assert_called_once_with(mock_error)
 
-    # Verify that the bot is started
+    # Without a webhook url the bot long-polls
     mock_application.run_polling.assert_called_once()
 
-    # Verify that the schedule thread is started
-    mock_run_schedule.assert_called_once()
+
+@patch("src.bot.asyncio.run")
+@patch("src.bot.run_webhook", new_callable=MagicMock)
+@patch("src.bot.Application")
+@patch("src.bot.get_persistence")
+def test_run_bot_webhook_mode(
+    mock_get_persistence, mock_Application, mock_run_webhook, mock_asyncio_run, monkeypatch
+):
+    monkeypatch.setenv("BOT_TOKEN", "test_bot_token")
+    monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com/telegram")
+    monkeypatch.delenv("WEBHOOK_SECRET", raising=False)
+    builder = mock_Application.builder.return_value
+    for step in ["token", "persistence", "concurrent_updates", "post_init", "post_shutdown"]:
+        getattr(builder, step).return_value = builder
+
+    run_bot()
+
+    # Updates come in through the webhook, no long polling
+    mock_run_webhook.assert_called_once_with(
+        builder.build.return_value,
+        "https://bot.example.com/telegram",
+        webhook_secret("test_bot_token"),
+    )
+    mock_asyncio_run.assert_called_once_with(mock_run_webhook.return_value)
+    builder.build.return_value.run_polling.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.bot.web_server")
+@patch("src.bot.job_scheduler")
+@patch("src.bot.schedule_checks")
+async def test_post_init_starts_scheduled_jobs(
+    mock_schedule_checks, mock_job_scheduler, mock_web_server
+):
+    application = MagicMock()
+    mock_job_scheduler.stop = AsyncMock()
+    mock_web_server.start = AsyncMock()
+    mock_web_server.stop = AsyncMock()
+
+    await post_init(application)
+
+    application.persistence.bind.assert_called_once_with(application)
+    mock_schedule_checks.assert_called_once_with(application.bot)
+    mock_job_scheduler.start.assert_called_once()
+    mock_web_server.start.assert_awaited_once()
+
+    await post_shutdown(application)
+    mock_job_scheduler.stop.assert_awaited_once()
+    mock_web_server.stop.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("src.bot.web_server")
+async def test_run_webhook_until_terminated(mock_web_server):
+    import signal
+
+    application = MagicMock()
+    application.running = True
+    for method in ["initialize", "post_init", "start", "stop", "shutdown", "post_shutdown"]:
+        setattr(application, method, AsyncMock())
+    # Terminate the bot once the webhook is set
+    application.bot.set_webhook = AsyncMock(
+        side_effect=lambda *args, **kwargs: os.kill(os.getpid(), signal.SIGTERM)
+    )
+
+    await run_webhook(application, "https://bot.example.com/telegram", "secret")
+
+    assert mock_web_server.route.call_args.args[:2] == ("POST", "/telegram")
+    application.post_init.assert_awaited_once_with(application)
+    application.bot.set_webhook.assert_awaited_once_with(
+        "https://bot.example.com/telegram", secret_token="secret", allowed_updates=Update.ALL_TYPES
+    )
+    application.start.assert_awaited_once()
+    application.stop.assert_awaited_once()
+    application.shutdown.assert_awaited_once()
+    application.post_shutdown.assert_awaited_once_with(application)
+
+
+@pytest.mark.asyncio
+@patch("src.bot.check_for_updates_async")
+async def test_metrics_endpoint(mock_check_for_updates_async):
+    from src.metrics import HANDLER_SECONDS
+
+    mock_check_for_updates_async.return_value = []
+    handled = HANDLER_SECONDS.count(handler="check_updates")
+    update = MagicMock()
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.message.chat_id = OPERATOR_CHAT_ID
+    update.callback_query.message.reply_text = AsyncMock()
+    update.effective_chat.id = OPERATOR_CHAT_ID
+    await check_updates_command(update, MagicMock())
+
+    response = await metrics(MagicMock())
+
+    assert response.status == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert HANDLER_SECONDS.count(handler="check_updates") == handled + 1
+    assert 'notti_handler_seconds_count{handler="check_updates"}' in response.body
+    assert "notti_driver_pool_size 0" in response.body
+
+
+@pytest.mark.asyncio
+async def test_health_check():
+    response = await health_check(MagicMock())
+
+    assert response.status == 200
+    assert response.body == "OK"
 
 
 @pytest.mark.asyncio
@@ -359,3 +555,238 @@ async def test_error_handler():
         mock_logger_warning.assert_called_once_with(
             'Update "%s" caused error "%s"', mock_update, mock_context.error
         )
+
+
+@pytest.mark.asyncio
+async def test_error_handler_login_failed():
+    mock_update = MagicMock(spec=Update)
+    mock_update.effective_chat.id = 1001
+    mock_update.effective_message.reply_text = AsyncMock()
+    mock_context = MagicMock()
+    mock_context.error = LoginFailed("Login failed, the website still shows the login form.")
+
+    await error(mock_update, mock_context)
+
+    mock_update.effective_message.reply_text.assert_awaited_once_with(
+        "The website did not accept the password of your account, please /register it again."
+    )
+
+
+@pytest.mark.asyncio
+async def test_error_handler_scrape_queue_full():
+    mock_update = MagicMock(spec=Update)
+    mock_update.effective_message.reply_text = AsyncMock()
+    mock_context = MagicMock()
+    mock_context.error = ScrapeQueueFull("Too many scrapes are already waiting")
+
+    await error(mock_update, mock_context)
+
+    mock_update.effective_message.reply_text.assert_awaited_once_with(
+        "The bot is busy right now, please try again in a minute."
+    )
+
+
+def telegram_update(update_id, chat_id, text=None, data=None):
+    # The json Telegram sends, a command message or a button press in a private chat
+    user = {"id": chat_id, "is_bot": False, "first_name": "Reader"}
+    message = {
+        "message_id": update_id,
+        "date": 0,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": user,
+        "text": text or "MangaMate",
+    }
+    if data is None:
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"update_id": update_id, "message": message}
+    callback_query = {
+        "id": str(update_id),
+        "from": user,
+        "chat_instance": str(chat_id),
+        "data": data,
+        "message": message,
+    }
+    return {"update_id": update_id, "callback_query": callback_query}
+
+
+async def fake_get_me(bot, *args, **kwargs):
+    # Bot.initialize asks Telegram who the bot is
+    bot._bot_user = User(123456, "MangaMate", True, username="mangamate_bot")
+    return bot._bot_user
+
+
+@pytest.mark.asyncio
+@patch("telegram.ext.ExtBot.answer_callback_query", new_callable=AsyncMock)
+@patch("telegram.ext.ExtBot.edit_message_text", new_callable=AsyncMock)
+@patch("telegram.ext.ExtBot.send_message", new_callable=AsyncMock)
+@patch("telegram.ext.ExtBot.get_me", new=fake_get_me)
+@patch("src.bot.web_server")
+@patch("src.utils.get_backend")
+async def test_bot_responsive_during_slow_scrape(
+    mock_get_backend,
+    mock_web_server,
+    mock_send_message,
+    mock_edit_message_text,
+    mock_answer_callback_query,
+):
+    # A scrape that holds its worker thread for half a second
+    scraped = []
+
+    def slow_scrape(username, password):
+        time.sleep(0.5)
+        scraped.append(username)
+        return []
+
+    mock_get_backend.return_value.fetch_bookmarks.side_effect = slow_scrape
+    application = build_application("123456:TEST")
+    await application.initialize()
+    await application.start()
+    try:
+        bot = application.bot
+        await application.update_queue.put(
+            Update.de_json(telegram_update(1, OPERATOR_CHAT_ID, data="get_update"), bot)
+        )
+        await asyncio.sleep(0.05)
+
+        # /start from another chat goes through the dispatcher while the scrape is in flight
+        await application.update_queue.put(
+            Update.de_json(telegram_update(2, 1001, text="/start"), bot)
+        )
+        # So does a pagination callback
+        version = get_snapshot_store().save(
+            "reader", [{"title": "T", "link": "L", "last_update": "U"}] * 15
+        )
+        await application.update_queue.put(
+            Update.de_json(telegram_update(3, 1001, data=f"p:{version}:0"), bot)
+        )
+        await asyncio.sleep(0.1)
+
+        mock_send_message.assert_awaited_once()
+        assert mock_send_message.await_args.kwargs["chat_id"] == 1001
+        mock_edit_message_text.assert_awaited_once()
+        assert not scraped
+
+        await application.update_queue.join()
+        assert len(scraped) == 1
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+
+@pytest.mark.asyncio
+@patch("src.bot.bookmark_cache")
+async def test_refresh_command(mock_bookmark_cache):
+    mock_update = MagicMock()
+    mock_update.effective_chat.id = OPERATOR_CHAT_ID
+    mock_update.message.reply_text = AsyncMock()
+
+    await refresh_command(mock_update, MagicMock())
+
+    mock_bookmark_cache.invalidate.assert_called_once_with(operator_key())
+    mock_update.message.reply_text.assert_awaited_once_with(
+        "Your bookmarks will be fetched fresh from the website next time."
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.bot.get_bookmarks")
+async def test_unregistered_chat_is_asked_to_register(mock_get_bookmarks):
+    mock_query = MagicMock()
+    mock_query.answer = AsyncMock()
+    mock_query.data = "get_all_list"
+    mock_update = MagicMock()
+    mock_update.callback_query = mock_query
+    mock_update.effective_chat.id = 1001
+    mock_update.effective_message.reply_text = AsyncMock()
+
+    await button(mock_update, MagicMock())
+
+    mock_get_bookmarks.assert_not_awaited()
+    mock_update.effective_message.reply_text.assert_awaited_once_with(REGISTER_HINT)
+
+
+def register_update(chat_id=1001):
+    update = MagicMock()
+    update.effective_chat.id = chat_id
+    update.effective_chat.send_message = AsyncMock()
+    update.message.delete = AsyncMock()
+    return update
+
+
+@pytest.mark.asyncio
+@patch("src.bot.verify_credentials", return_value=True)
+@patch("src.bot.get_bookmarks")
+async def test_register_command(mock_get_bookmarks, mock_verify_credentials):
+    mock_get_bookmarks.return_value = []
+    mock_update = register_update()
+    mock_context = MagicMock()
+    mock_context.args = ["reader", "hunter2"]
+
+    await register_command(mock_update, mock_context)
+
+    # The password does not stay in the chat
+    mock_update.message.delete.assert_awaited_once()
+    mock_verify_credentials.assert_awaited_once_with("reader", "hunter2")
+    mock_update.effective_chat.send_message.assert_awaited_once()
+    assert get_account_store().get(1001).username == "reader"
+
+    # The chat now scrapes its own account, not the operator's
+    mock_update.callback_query.answer = AsyncMock()
+    mock_update.callback_query.data = "get_all_list"
+    mock_update.callback_query.message.reply_text = AsyncMock()
+    context = MagicMock()
+    context.user_data = {}
+    await button(mock_update, context)
+    mock_get_bookmarks.assert_awaited_once_with("reader", "hunter2")
+
+    # Unregistering forgets the account again
+    mock_update.message.reply_text = AsyncMock()
+    await unregister_command(mock_update, MagicMock())
+    assert get_account_store().get(1001) is None
+    mock_update.message.reply_text.assert_awaited_once_with("Your account has been removed.")
+
+
+@pytest.mark.asyncio
+@patch("src.bot.verify_credentials", return_value=False)
+async def test_register_command_rejects_wrong_password(mock_verify_credentials):
+    update = register_update()
+    context = MagicMock()
+    context.args = ["reader", "guess"]
+
+    await register_command(update, context)
+
+    # Knowing a login is not enough to read its bookmarks
+    update.message.delete.assert_awaited_once()
+    assert get_account_store().get(1001) is None
+    update.effective_chat.send_message.assert_awaited_once_with(
+        "The website did not accept the password of reader, the account was not registered."
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.bot.verify_credentials", side_effect=ConnectionError("offline"))
+async def test_register_command_when_website_unreachable(mock_verify_credentials):
+    update = register_update()
+    context = MagicMock()
+    context.args = ["reader", "hunter2"]
+
+    await register_command(update, context)
+
+    assert get_account_store().get(1001) is None
+    update.effective_chat.send_message.assert_awaited_once_with(
+        "Could not reach the website to check the account, please try again later."
+    )
+
+
+@pytest.mark.asyncio
+async def test_register_command_usage():
+    mock_update = MagicMock()
+    mock_update.message.reply_text = AsyncMock()
+    mock_context = MagicMock()
+    mock_context.args = ["only-a-login"]
+
+    await register_command(mock_update, mock_context)
+
+    mock_update.message.reply_text.assert_awaited_once_with(
+        "Usage: /register <login> <password>"
+    )
@@ -0,0 +1,201 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import hashlib
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import BadRequest
+from src.delivery import chunk_updates, deliver_updates
+from src.file_id_cache import FileIdCache
+from src.send_queue import SendQueue
+from src.utils import format_update_message
+
+
+def make_updates(count):
+    return [
+        {
+            "title": f"Manga {index}",
+            "image": f"http://example.com/img{index}.jpg",
+            "chapter_title": f"Chapter {index}",
+            "last_update": "1 hour ago",
+            "link": f"http://example.com/manga{index}",
+        }
+        for index in range(count)
+    ]
+
+
+def make_bot():
+    bot = MagicMock()
+    bot.send_photo = AsyncMock()
+    bot.send_message = AsyncMock()
+    bot.send_media_group = AsyncMock()
+    return bot
+
+
+@pytest.fixture
+def queue():
+    # No rate limits, these tests are about batching
+    return SendQueue(global_rate=10000, chat_rate=10000, chat_burst=10000)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FileIdCache(str(tmp_path / "file_ids.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def sent_photo(file_id):
+    message = MagicMock()
+    message.photo = [MagicMock(file_id=f"{file_id}-small"), MagicMock(file_id=file_id)]
+    return message
+
+
+def test_chunk_updates():
+    assert chunk_updates([]) == []
+    assert [len(batch) for batch in chunk_updates(make_updates(21))] == [10, 10, 1]
+
+
+@pytest.mark.asyncio
+async def test_media_groups_carry_captions(queue):
+    bot = make_bot()
+    updates = make_updates(12)
+
+    calls = await deliver_updates(bot, 42, updates, queue=queue)
+
+    # One group of ten, and the last two in a group of their own
+    assert calls == 2
+    first_group = bot.send_media_group.await_args_list[0].kwargs
+    assert first_group["chat_id"] == 42
+    assert [photo.media for photo in first_group["media"]] == [u["image"] for u in updates[:10]]
+    assert first_group["media"][0].caption == format_update_message(updates[0])
+    assert first_group["media"][0].parse_mode == "HTML"
+    bot.send_photo.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_single_update_is_a_photo(queue):
+    bot = make_bot()
+    update = make_updates(1)[0]
+
+    assert await deliver_updates(bot, 42, [update], queue=queue) == 1
+
+    bot.send_media_group.assert_not_awaited()
+    bot.send_photo.assert_awaited_once_with(
+        chat_id=42, photo=update["image"], caption=format_update_message(update), parse_mode="HTML"
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejected_group_falls_back_to_single_sends(queue):
+    bot = make_bot()
+    updates = make_updates(3)
+    bot.send_media_group.side_effect = BadRequest("Wrong file identifier/http url specified")
+
+    async def send_photo(chat_id, photo, caption, parse_mode):
+        if photo == updates[1]["image"]:
+            raise BadRequest("Failed to get http url content")
+
+    bot.send_photo.side_effect = send_photo
+
+    await deliver_updates(bot, 42, updates, queue=queue)
+
+    # Every update went out, the one with a broken cover as text
+    assert bot.send_photo.await_count == 3
+    bot.send_message.assert_awaited_once_with(
+        chat_id=42, text=format_update_message(updates[1]), parse_mode="HTML"
+    )
+
+
+@pytest.mark.asyncio
+async def test_batching_cuts_delivery_time(queue):
+    latency = 0.01
+
+    async def slow_call(**kwargs):
+        await asyncio.sleep(latency)
+
+    bot = make_bot()
+    bot.send_media_group.side_effect = slow_call
+    updates = make_updates(50)
+
+    started = time.perf_counter()
+    calls = await deliver_updates(bot, 42, updates, queue=queue)
+    elapsed = time.perf_counter() - started
+
+    # Five round-trips instead of fifty
+    assert calls == 5
+    assert elapsed < len(updates) * latency / 3
+
+
+@pytest.mark.asyncio
+async def test_cover_sent_once_then_by_file_id(queue, cache, monkeypatch):
+    downloads = []
+
+    def download_cover(url):
+        downloads.append(url)
+        return b"cover image"
+
+    monkeypatch.setattr("src.delivery.download_cover", download_cover)
+    bot = make_bot()
+    bot.send_photo.return_value = sent_photo("file-1")
+    update = make_updates(1)[0]
+
+    # The first send uploads the image itself
+    await deliver_updates(bot, 42, [update], queue=queue, cache=cache)
+    assert bot.send_photo.await_args.kwargs["photo"] == b"cover image"
+    assert cache.get(update["image"]) == "file-1"
+
+    # Later sends reuse the file_id, nothing is downloaded again
+    await deliver_updates(bot, 43, [update], queue=queue, cache=cache)
+    assert bot.send_photo.await_args.kwargs["photo"] == "file-1"
+    assert downloads == [update["image"]]
+
+
+@pytest.mark.asyncio
+async def test_moved_cover_reuses_file_id_by_content(queue, cache, monkeypatch):
+    monkeypatch.setattr("src.delivery.download_cover", lambda url: b"same image")
+    update = make_updates(1)[0]
+    cache.put("http://example.com/old.jpg", hashlib.sha256(b"same image").hexdigest(), "file-1")
+    bot = make_bot()
+
+    await deliver_updates(bot, 42, [update], queue=queue, cache=cache)
+
+    # Same content under a new url, no upload needed
+    assert bot.send_photo.await_args.kwargs["photo"] == "file-1"
+    assert cache.get(update["image"]) == "file-1"
+
+
+@pytest.mark.asyncio
+async def test_rejected_file_id_is_forgotten(queue, cache):
+    update = make_updates(1)[0]
+    cache.put(update["image"], "hash", "stale-file")
+    bot = make_bot()
+
+    async def send_photo(chat_id, photo, caption, parse_mode):
+        if photo == "stale-file":
+            raise BadRequest("Wrong file identifier/http url specified")
+
+    bot.send_photo.side_effect = send_photo
+
+    await deliver_updates(bot, 42, [update], queue=queue, cache=cache)
+
+    # The url was sent instead and the stale file_id is gone
+    assert bot.send_photo.await_args.kwargs["photo"] == update["image"]
+    assert cache.get(update["image"]) is None
+    bot.send_message.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_media_group_file_ids_remembered(queue, cache, monkeypatch):
+    monkeypatch.setattr("src.delivery.download_cover", lambda url: url.encode())
+    updates = make_updates(3)
+    bot = make_bot()
+    bot.send_media_group.return_value = [sent_photo(f"file-{index}") for index in range(3)]
+
+    await deliver_updates(bot, 42, updates, queue=queue, cache=cache)
+
+    assert [cache.get(update["image"]) for update in updates] == ["file-0", "file-1", "file-2"]
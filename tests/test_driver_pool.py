@@ -0,0 +1,121 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import pytest
+from unittest.mock import MagicMock, PropertyMock, patch
+from src.driver_pool import DriverPool
+
+
+@pytest.fixture
+def factory():
+    return MagicMock(side_effect=lambda: MagicMock())
+
+
+def test_driver_is_reused(factory):
+    pool = DriverPool(factory=factory, max_size=1)
+
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+
+    # Only one browser was launched and it was kept warm
+    assert first is second
+    factory.assert_called_once()
+    first.quit.assert_not_called()
+    assert pool.live_count == 1
+
+
+def test_driver_recycled_after_max_uses(factory):
+    pool = DriverPool(factory=factory, max_size=1, max_uses=2)
+
+    drivers = []
+    for _ in range(3):
+        with pool.driver() as driver:
+            drivers.append(driver)
+
+    assert drivers[0] is drivers[1]
+    assert drivers[2] is not drivers[0]
+    drivers[0].quit.assert_called_once()
+    assert factory.call_count == 2
+
+
+def test_driver_recycled_after_max_age(factory):
+    pool = DriverPool(factory=factory, max_size=1, max_age=60)
+
+    with patch("src.driver_pool.time.monotonic", return_value=0):
+        with pool.driver() as first:
+            pass
+    with patch("src.driver_pool.time.monotonic", return_value=61):
+        with pool.driver() as second:
+            pass
+
+    assert first is not second
+    first.quit.assert_called_once()
+
+
+def test_unhealthy_driver_discarded_on_checkout(factory):
+    pool = DriverPool(factory=factory, max_size=1)
+
+    with pool.driver() as first:
+        pass
+    type(first).current_url = PropertyMock(side_effect=Exception("session deleted"))
+
+    with pool.driver() as second:
+        pass
+
+    assert first is not second
+    first.quit.assert_called_once()
+
+
+def test_broken_driver_not_returned(factory):
+    pool = DriverPool(factory=factory, max_size=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.driver() as driver:
+            raise RuntimeError("scrape failed")
+
+    driver.quit.assert_called_once()
+    assert pool.live_count == 0
+
+
+def test_concurrent_browsers_capped(factory):
+    pool = DriverPool(factory=factory, max_size=1)
+    driver = pool.checkout()
+
+    # The only slot is taken, so a second caller times out
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+
+    # Once the driver is returned a waiting caller gets it
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.checkout(timeout=1)))
+    waiter.start()
+    pool.checkin(driver)
+    waiter.join()
+    assert result == [driver]
+
+
+def test_checkin_unknown_driver(factory):
+    pool = DriverPool(factory=factory)
+
+    with pytest.raises(ValueError):
+        pool.checkin(MagicMock())
+
+
+def test_close_quits_idle_drivers(factory):
+    pool = DriverPool(factory=factory, max_size=2)
+    busy = pool.checkout()
+    with pool.driver() as idle:
+        pass
+
+    pool.close()
+    idle.quit.assert_called_once()
+    busy.quit.assert_not_called()
+
+    # Drivers returned after close are quit as well
+    pool.checkin(busy)
+    busy.quit.assert_called_once()
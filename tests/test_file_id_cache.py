@@ -0,0 +1,99 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sqlite3
+import pytest
+from src.file_id_cache import FileIdCache, get_file_id_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FileIdCache(str(tmp_path / "file_ids.sqlite3"), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_put_and_get(cache):
+    assert cache.get("http://example.com/a.jpg") is None
+
+    cache.put("http://example.com/a.jpg", "hash-a", "file-a")
+
+    assert cache.get("http://example.com/a.jpg") == "file-a"
+    assert cache.get_by_hash("hash-a") == "file-a"
+    assert cache.get_by_hash("hash-b") is None
+
+
+def test_least_recently_used_evicted(cache, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.file_id_cache.time.time", lambda: now[0])
+    for name in "abc":
+        now[0] += 1
+        cache.put(f"http://example.com/{name}.jpg", f"hash-{name}", f"file-{name}")
+
+    # Using a keeps it, b is now the least recently used
+    now[0] += 1
+    assert cache.get("http://example.com/a.jpg") == "file-a"
+    now[0] += 1
+    cache.put("http://example.com/d.jpg", "hash-d", "file-d")
+
+    assert len(cache) == 3
+    assert cache.get("http://example.com/b.jpg") is None
+    assert cache.get("http://example.com/a.jpg") == "file-a"
+
+
+def test_lookups_do_not_commit(tmp_path, monkeypatch):
+    path = str(tmp_path / "file_ids.sqlite3")
+    monkeypatch.setattr("src.file_id_cache.time.time", lambda: 100.0)
+    cache = FileIdCache(path)
+    cache.put("http://example.com/a.jpg", "hash-a", "file-a")
+    reader = sqlite3.connect(path)
+
+    def last_used():
+        return reader.execute(
+            "SELECT last_used FROM covers WHERE url = ?", ("http://example.com/a.jpg",)
+        ).fetchone()[0]
+
+    monkeypatch.setattr("src.file_id_cache.time.time", lambda: 200.0)
+    assert cache.get("http://example.com/a.jpg") == "file-a"
+    assert last_used() == 100.0
+
+    # The use is written with the next put, or on close
+    cache.put("http://example.com/b.jpg", "hash-b", "file-b")
+    assert last_used() == 200.0
+    reader.close()
+    cache.close()
+
+
+def test_changed_cover_url_drops_old_entry(cache):
+    cache.put("http://example.com/old.jpg", "hash-old", "file-old", link="http://example.com/manga")
+    cache.put("http://example.com/other.jpg", "hash-other", "file-other", link="http://example.com/other")
+
+    cache.put("http://example.com/new.jpg", "hash-new", "file-new", link="http://example.com/manga")
+
+    assert cache.get("http://example.com/old.jpg") is None
+    assert cache.get("http://example.com/new.jpg") == "file-new"
+    assert cache.get("http://example.com/other.jpg") == "file-other"
+
+
+def test_invalidate(cache):
+    cache.put("http://example.com/a.jpg", "hash-a", "file-a")
+
+    cache.invalidate("http://example.com/a.jpg")
+
+    assert cache.get("http://example.com/a.jpg") is None
+
+
+def test_survives_restart(tmp_path):
+    path = str(tmp_path / "file_ids.sqlite3")
+    cache = FileIdCache(path)
+    cache.put("http://example.com/a.jpg", "hash-a", "file-a")
+    cache.close()
+
+    assert FileIdCache(path).get("http://example.com/a.jpg") == "file-a"
+
+
+def test_get_file_id_cache_lives_in_data_dir(data_dir):
+    assert get_file_id_cache().path == str(data_dir / "file_ids.sqlite3")
+    assert get_file_id_cache() is get_file_id_cache()
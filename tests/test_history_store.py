@@ -0,0 +1,108 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from src.history_store import HistoryStore, get_history_store
+
+
+def bookmark(title, chapter_title):
+    return {"title": title, "chapter_title": chapter_title}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_first_scrape_reports_new_titles(store):
+    scrape = [bookmark("Manga 1", "Chapter 1"), bookmark("Manga 2", "Chapter 5")]
+
+    changes = store.record("alice", scrape, now=100)
+
+    assert changes == [(scrape[0], True), (scrape[1], True)]
+    assert store.last_seen("alice", "Manga 1") == ("Chapter 1", 100)
+
+
+def test_unchanged_chapters_not_reported(store):
+    scrape = [bookmark("Manga 1", "Chapter 1"), bookmark("Manga 2", "Chapter 5")]
+    store.record("alice", scrape, now=100)
+
+    assert store.record("alice", scrape, now=200) == []
+    # The first-seen time is kept while the chapter stays the same
+    assert store.last_seen("alice", "Manga 1") == ("Chapter 1", 100)
+
+
+def test_new_chapter_reported_once(store):
+    store.record("alice", [bookmark("Manga 1", "Chapter 1")], now=100)
+    scrape = [bookmark("Manga 1", "Chapter 2")]
+
+    assert store.record("alice", scrape, now=200) == [(scrape[0], False)]
+    assert store.record("alice", scrape, now=300) == []
+    assert store.last_seen("alice", "Manga 1") == ("Chapter 2", 200)
+
+
+def test_accounts_have_separate_history(store):
+    scrape = [bookmark("Manga 1", "Chapter 1")]
+    store.record("alice", scrape, now=100)
+
+    assert store.record("bob", scrape, now=100) == [(scrape[0], True)]
+
+
+def test_seen_since(store):
+    store.record("alice", [bookmark("Manga 1", "Chapter 1")], now=100)
+    store.record(
+        "alice", [bookmark("Manga 1", "Chapter 2"), bookmark("Manga 2", "Chapter 1")], now=200
+    )
+
+    assert store.seen_since("alice", 150) == [
+        ("Manga 1", "Chapter 2", 200),
+        ("Manga 2", "Chapter 1", 200),
+    ]
+
+
+def test_diff_uses_indexes(store):
+    # The diff joins on the primary key instead of scanning the whole history
+    plan = store._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT chapter_title FROM chapters "
+        "WHERE account = ? AND title = ?",
+        ("alice", "Manga 1"),
+    ).fetchall()
+    assert any("USING INDEX" in row[-1] or "PRIMARY KEY" in row[-1] for row in plan)
+
+    indexes = {row[1] for row in store._conn.execute("PRAGMA index_list(chapters)")}
+    assert {"chapters_by_title", "chapters_by_first_seen"} <= indexes
+
+
+def test_thousands_of_bookmarks(store):
+    scrape = [bookmark(f"Manga {i}", "Chapter 1") for i in range(5000)]
+    assert len(store.record("alice", scrape, now=100)) == 5000
+
+    scrape[1234] = bookmark("Manga 1234", "Chapter 2")
+    assert store.record("alice", scrape, now=200) == [(scrape[1234], False)]
+
+
+def test_releases_logged(store):
+    store.record("alice", [bookmark("Manga 1", "Chapter 1"), bookmark("Manga 2", "Chapter 5")], now=100)
+    # Bob sees the same chapter later, it came out when alice saw it
+    store.record("alice", [bookmark("Manga 1", "Chapter 2"), bookmark("Manga 2", "Chapter 5")], now=200)
+    store.record("bob", [bookmark("Manga 1", "Chapter 1")], now=250)
+    store.record("bob", [bookmark("Manga 1", "Chapter 2")], now=300)
+    # The website's update time is used when it is known
+    store.record("alice", [dict(bookmark("Manga 2", "Chapter 6"), updated_at=280)], now=400)
+
+    # First-seen titles have no known release time
+    assert store.releases_since(0) == {"Manga 1": [200], "Manga 2": [280]}
+    assert store.releases_since(250) == {"Manga 2": [280]}
+    assert store.titles("alice") == ["Manga 1", "Manga 2"]
+    assert store.titles("carol") == []
+
+
+def test_get_history_store_uses_data_dir(data_dir):
+    store = get_history_store()
+
+    assert store.path == os.path.join(str(data_dir), "history.sqlite3")
+    assert get_history_store() is store
@@ -0,0 +1,172 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import pytest
+from unittest.mock import MagicMock
+from src.http_scrapping import (
+    setup_session,
+    login,
+    parse_bookmarks,
+    is_login_html,
+    export_cookies,
+    import_cookies,
+    parse_page_count,
+    scrape_all_pages,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture:
+        return fixture.read()
+
+
+def make_response(url, text=""):
+    response = MagicMock()
+    response.url = url
+    response.text = text
+    return response
+
+
+def test_parse_bookmarks():
+    bookmarks = parse_bookmarks(read_fixture("bookmarks.html"))
+
+    # The last update text is also stored as a unix timestamp
+    updated_at = [bookmark.pop("updated_at") for bookmark in bookmarks]
+    assert updated_at[0] == pytest.approx(time.time() - 3 * 3600, abs=60)
+    assert updated_at[1] is None
+    assert updated_at[2] == pytest.approx(time.time() - 2 * 86400, abs=60)
+
+    # The unit without a poster is skipped, like in scrape_bookmarks
+    assert bookmarks == [
+        {
+            "title": "Solo Leveling",
+            "link": "https://manga-scans.com/manga/solo-leveling/",
+            "chapter_title": "Chapter 200",
+            "last_update": "3 hours ago",
+            "image": "https://manga-scans.com/wp-content/uploads/solo-leveling.jpg",
+        },
+        {
+            "title": "Omniscient Reader & Co",
+            "link": "https://manga-scans.com/manga/omniscient-reader/",
+            "chapter_title": "Chapter 180",
+            "last_update": "many time ago",  # Fallback text
+            "image": "https://manga-scans.com/wp-content/uploads/omniscient-reader.jpg",
+        },
+        {
+            "title": "Tower of God",
+            "link": "https://manga-scans.com/manga/tower-of-god/",
+            "chapter_title": "Chapter 600",
+            "last_update": "2 days ago",
+            "image": "https://manga-scans.com/wp-content/uploads/tower-of-god.jpg",
+        },
+    ]
+
+
+def test_is_login_html():
+    login_html = read_fixture("login.html")
+    bookmarks_html = read_fixture("bookmarks.html")
+
+    assert is_login_html("https://manga-scans.com/login", login_html)
+    assert is_login_html("https://manga-scans.com/bookmarks/", login_html)
+    assert not is_login_html("https://manga-scans.com/bookmarks/", bookmarks_html)
+
+
+def test_login_submits_form():
+    session = MagicMock()
+    session.get.return_value = make_response(
+        "https://manga-scans.com/login", read_fixture("login.html")
+    )
+
+    login(session, "testuser", "testpass")
+
+    session.get.assert_called_once_with("https://manga-scans.com/login", timeout=15)
+    session.post.assert_called_once_with(
+        "https://manga-scans.com/wp-login.php",
+        data={
+            "log": "testuser",
+            "pwd": "testpass",
+            "wp-submit": "Log In",
+            "redirect_to": "https://manga-scans.com/bookmarks/",
+        },
+        timeout=15,
+    )
+
+
+def test_login_without_form():
+    session = MagicMock()
+    session.get.return_value = make_response(
+        "https://manga-scans.com/login", read_fixture("bookmarks.html")
+    )
+
+    with pytest.raises(ValueError):
+        login(session, "testuser", "testpass")
+    session.post.assert_not_called()
+
+
+def test_cookies_round_trip():
+    session = setup_session()
+    import_cookies(
+        session,
+        [{"name": "wordpress_logged_in", "value": "abc", "domain": "manga-scans.com"}],
+    )
+
+    exported = export_cookies(session)
+
+    assert exported[0]["name"] == "wordpress_logged_in"
+    assert exported[0]["value"] == "abc"
+    assert exported[0]["domain"] == "manga-scans.com"
+    assert exported[0]["path"] == "/"
+
+
+def make_page(page, page_count, links):
+    units = "".join(
+        f"""
+        <div class="unit">
+          <a class="poster" href="{link}"><img src="{link}.jpg"></a>
+          <div class="info"><a href="{link}">{link}</a>
+            <span class="richdata">Chapter 1</span></div>
+        </div>"""
+        for link in links
+    )
+    pagination = "".join(
+        f'<a class="page-numbers" href="https://manga-scans.com/bookmarks/page/{n}/">{n}</a>'
+        for n in range(1, page_count + 1)
+        if n != page
+    )
+    return f"<html><body>{units}<div class='pagination'>{pagination}</div></body></html>"
+
+
+def test_parse_page_count():
+    assert parse_page_count(read_fixture("bookmarks.html")) == 1
+    assert parse_page_count(make_page(1, 5, ["a"])) == 5
+
+
+def test_scrape_all_pages(monkeypatch):
+    monkeypatch.setenv("PAGE_PARALLELISM", "4")
+    page_count = 5
+    # Neighbouring pages overlap by one bookmark, as happens when the list shifts
+    page_links = {n: [f"m{n}a", f"m{n}b", f"m{n + 1}a"] for n in range(1, page_count + 1)}
+
+    def slow_get(url, timeout):
+        time.sleep(0.2)
+        page = int(url.rstrip("/").rsplit("/", 1)[-1])
+        return make_response(url, make_page(page, page_count, page_links[page]))
+
+    session = MagicMock()
+    session.get.side_effect = slow_get
+
+    started = time.perf_counter()
+    bookmarks = scrape_all_pages(session, make_page(1, page_count, page_links[1]))
+    elapsed = time.perf_counter() - started
+
+    # Pages 2 to 5 were fetched together, not one after another
+    assert session.get.call_count == 4
+    assert elapsed < 0.6
+    # Merged in page order without duplicates
+    links = [bookmark["link"] for bookmark in bookmarks]
+    assert links == ["m1a", "m1b", "m2a", "m2b", "m3a", "m3b", "m4a", "m4b", "m5a", "m5b", "m6a"]
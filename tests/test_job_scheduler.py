@@ -0,0 +1,152 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from src.job_scheduler import (
+    CronExpression,
+    JobScheduler,
+    JobStore,
+    get_job_store,
+    parse_cron_field,
+)
+
+KYIV = ZoneInfo("Europe/Kyiv")
+
+
+def at(*args, tz=KYIV):
+    return datetime(*args, tzinfo=tz).timestamp()
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*", 0, 6) == set(range(7))
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("1-5", 0, 6) == {1, 2, 3, 4, 5}
+    assert parse_cron_field("9,18", 0, 23) == {9, 18}
+    assert parse_cron_field("10/20", 0, 59) == {10, 30, 50}
+    for invalid in ["60", "5-1", "*/0", "x"]:
+        with pytest.raises(ValueError):
+            parse_cron_field(invalid, 0, 59)
+
+
+def test_cron_expression_is_read_in_its_timezone():
+    cron = CronExpression("0 9 * * *", "Europe/Kyiv")
+
+    # 09:00 in Kyiv, before and after the switch to summer time
+    assert cron.next_after(at(2024, 3, 30, 9, 0)) == at(2024, 3, 31, 9, 0)
+    assert cron.next_after(at(2024, 3, 30, 9, 0)) - at(2024, 3, 30, 9, 0) == 23 * 3600
+    assert cron.next_after(at(2024, 3, 30, 8, 59, 30)) == at(2024, 3, 30, 9, 0)
+
+
+def test_cron_expression_days():
+    utc = ZoneInfo("UTC")
+    weekdays = CronExpression("0 8 * * 1-5")
+    # Friday evening runs on Monday morning
+    assert weekdays.next_after(at(2024, 1, 5, 18, 0, tz=utc)) == at(2024, 1, 8, 8, 0, tz=utc)
+
+    # Sunday may be written 0 or 7
+    assert CronExpression("0 0 * * 7").weekdays == {0}
+
+    # With both a day and a weekday, either one runs, as in cron
+    either = CronExpression("0 0 13 * 5")
+    assert either.next_after(at(2024, 1, 1, tz=utc)) == at(2024, 1, 5, tz=utc)
+    assert either.next_after(at(2024, 1, 12, 1, tz=utc)) == at(2024, 1, 13, tz=utc)
+
+    assert CronExpression("0 0 29 2 *").next_after(at(2024, 3, 1, tz=utc)) == at(
+        2028, 2, 29, tz=utc
+    )
+    with pytest.raises(ValueError):
+        CronExpression("0 0 30 2 *").next_after(at(2024, 1, 1, tz=utc))
+    with pytest.raises(ValueError):
+        CronExpression("0 9 * *")
+
+
+def test_next_run_catches_up_missed_runs():
+    scheduler = JobScheduler()
+    job = scheduler.add_job("check", "0 9 * * *", None, timezone="Europe/Kyiv")
+    now = at(2024, 5, 2, 12, 0)
+
+    # Never ran: wait for the next run
+    assert scheduler.next_run(job, now) == at(2024, 5, 3, 9, 0)
+    # Ran today at 09:00: wait for tomorrow
+    assert scheduler.next_run(job, now, at(2024, 5, 2, 9, 0)) == at(2024, 5, 3, 9, 0)
+    # The bot was down this morning: run now
+    assert scheduler.next_run(job, now, at(2024, 5, 1, 9, 0)) == now
+
+    job.catch_up = False
+    assert scheduler.next_run(job, now, at(2024, 5, 1, 9, 0)) == at(2024, 5, 3, 9, 0)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_jobs_sleep_until_due_and_remember_runs(tmp_path):
+    clock = FakeClock(at(2024, 5, 2, 12, 0))
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.record_run("check", at(2024, 5, 1, 9, 0))
+    scheduler = JobScheduler(store, clock=clock, sleep=clock.sleep, max_sleep=3600)
+    runs = []
+    done = asyncio.Event()
+
+    async def check():
+        runs.append(clock.now)
+        if len(runs) == 2:
+            done.set()
+            # Still running when the bot shuts down
+            await asyncio.Event().wait()
+
+    scheduler.add_job("check", "0 9 * * *", check, timezone="Europe/Kyiv")
+    scheduler.start()
+    await asyncio.wait_for(done.wait(), timeout=5)
+    await scheduler.stop()
+
+    # The missed run right away, then the next morning
+    assert runs == [at(2024, 5, 2, 12, 0), at(2024, 5, 3, 9, 0)]
+    # Sleeping in long steps, never polling
+    assert len(clock.sleeps) == 21
+    # The interrupted run is not recorded, it runs again after a restart
+    assert store.last_run("check") == at(2024, 5, 2, 12, 0)
+
+
+@pytest.mark.asyncio
+async def test_jitter_and_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.job_scheduler.random.uniform", lambda low, high: high)
+    clock = FakeClock(at(2024, 5, 2, 8, 59))
+    scheduler = JobScheduler(JobStore(":memory:"), clock=clock, sleep=clock.sleep)
+    runs = []
+
+    async def check():
+        runs.append(clock.now)
+        raise RuntimeError("website down")
+
+    scheduler.add_job("check", "0 9 * * *", check, timezone="Europe/Kyiv", jitter=30)
+    scheduler.start()
+    while len(runs) < 2:
+        await asyncio.sleep(0)
+    await scheduler.stop()
+
+    # A failed run does not stop the job
+    assert runs == [at(2024, 5, 2, 9, 0, 30), at(2024, 5, 3, 9, 0, 30)]
+
+
+def test_get_job_store_lives_in_data_dir(data_dir):
+    store = get_job_store()
+    assert store.path == str(data_dir / "jobs.sqlite3")
+    assert store.last_run("check") is None
@@ -0,0 +1,154 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from src.metrics import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    format_value,
+    resident_memory,
+)
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter(registry):
+    errors = Counter("errors_total", "Failed calls.", ["method"], registry=registry)
+
+    errors.inc(method="send_photo")
+    errors.inc(2, method="send_photo")
+    errors.inc(method="send_message")
+
+    assert errors.value(method="send_photo") == 3
+    assert registry.render() == (
+        "# HELP errors_total Failed calls.\n"
+        "# TYPE errors_total counter\n"
+        'errors_total{method="send_photo"} 3\n'
+        'errors_total{method="send_message"} 1\n'
+    )
+
+
+def test_labels_are_checked_and_escaped(registry):
+    errors = Counter("errors_total", "Failed calls.", ["method"], registry=registry)
+
+    with pytest.raises(ValueError):
+        errors.inc()
+    with pytest.raises(ValueError):
+        errors.inc(method="a", error="b")
+    errors.inc(method='say "hi"\\\n')
+
+    assert 'errors_total{method="say \\"hi\\"\\\\\\n"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        Counter("errors_total", "Again.", registry=registry)
+
+
+def test_gauges(registry):
+    depth = {"interactive": 2, "digest": 5}
+    Gauge("queue_depth", "Waiting calls.", ["lane"], function=lambda: depth, registry=registry)
+    Gauge("memory", "Memory.", function=lambda: None, registry=registry)
+    browsers = Gauge("browsers", "Browsers.", registry=registry)
+    browsers.set(2)
+
+    rendered = registry.render()
+
+    assert 'queue_depth{lane="interactive"} 2\nqueue_depth{lane="digest"} 5\n' in rendered
+    assert "browsers 2\n" in rendered
+    # A value that can not be read is left out
+    assert "# TYPE memory gauge\n# HELP browsers" in rendered
+
+
+def test_counter_with_function(registry):
+    totals = {"executed": 1, "coalesced": 4}
+    Counter("scrapes_total", "Scrapes.", ["outcome"], function=lambda: totals, registry=registry)
+
+    assert registry.render() == (
+        "# HELP scrapes_total Scrapes.\n"
+        "# TYPE scrapes_total counter\n"
+        'scrapes_total{outcome="executed"} 1\n'
+        'scrapes_total{outcome="coalesced"} 4\n'
+    )
+
+
+def test_histogram(registry):
+    latency = Histogram("latency_seconds", "Latency.", ["method"], buckets=[0.1, 1], registry=registry)
+
+    for value in [0.05, 0.1, 0.5, 3]:
+        latency.observe(value, method="send_photo")
+
+    assert latency.count(method="send_photo") == 4
+    assert latency.value(method="send_photo") == pytest.approx(3.65)
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{method="send_photo",le="0.1"} 2',
+        'latency_seconds_bucket{method="send_photo",le="1"} 3',
+        'latency_seconds_bucket{method="send_photo",le="+Inf"} 4',
+        'latency_seconds_sum{method="send_photo"} 3.65',
+        'latency_seconds_count{method="send_photo"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_histogram_timer(registry):
+    latency = Histogram("latency_seconds", "Latency.", ["handler"], registry=registry)
+
+    @latency.time(handler="sync")
+    def handle(value):
+        return value * 2
+
+    @latency.time(handler="async")
+    async def handle_async(value):
+        raise ValueError(value)
+
+    assert handle(2) == 4
+    assert handle.__name__ == "handle"
+    # Failed calls are measured too
+    with pytest.raises(ValueError):
+        await handle_async(1)
+    with latency.time(handler="block"):
+        pass
+
+    assert latency.count(handler="sync") == 1
+    assert latency.count(handler="async") == 1
+    assert latency.count(handler="block") == 1
+
+
+def test_format_value():
+    assert format_value(3.0) == "3"
+    assert format_value(0.25) == "0.25"
+    assert format_value(float("inf")) == "+Inf"
+
+
+def test_pipeline_metrics_registered():
+    import src.bot  # noqa: F401 registers the metrics of the driver pool, send queue and scrapes
+
+    for name in [
+        "notti_driver_launch_seconds",
+        "notti_login_seconds",
+        "notti_scrape_seconds",
+        "notti_scrape_items",
+        "notti_check_for_updates_seconds",
+        "notti_handler_seconds",
+        "notti_telegram_send_seconds",
+        "notti_telegram_send_errors_total",
+        "notti_driver_pool_size",
+        "notti_page_wait_seconds",
+        "notti_process_resident_memory_bytes",
+        "notti_send_queue_depth",
+        "notti_send_queue_sent_total",
+        "notti_send_queue_retried_total",
+        "notti_send_queue_failed_total",
+        "notti_scrape_requests_total",
+        "notti_scrape_executions_total",
+        "notti_scrape_coalesced_total",
+        "notti_scrapes_in_flight",
+    ]:
+        assert REGISTRY.get(name) is not None, name
+    if os.path.exists("/proc/self/statm"):
+        assert resident_memory() > 0
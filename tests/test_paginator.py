@@ -0,0 +1,201 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.paginator import (
+    BOOKMARKS_HEADER,
+    MESSAGE_LIMIT,
+    Paginator,
+    create_pagination_buttons,
+    format_bookmark_line,
+    get_paginator,
+    message_length,
+)
+
+
+def render_bookmarks(bookmarks):
+    return BOOKMARKS_HEADER + "".join(map(format_bookmark_line, bookmarks))
+
+
+def make_bookmarks(count, title_length=10):
+    return [
+        {
+            "title": f"Manga {index} " + "x" * title_length,
+            "link": f"http://example.com/{index}",
+            "last_update": "1 hour ago",
+        }
+        for index in range(count)
+    ]
+
+
+def test_page_text():
+    # Given a sample list of bookmarks
+    sample_bookmarks = [
+        {
+            "title": "Manga 1",
+            "link": "http://example.com/manga1",
+            "chapter_title": "Chapter 1",
+            "last_update": "1 hour ago",
+        },
+        {
+            "title": "Manga 2",
+            "link": "http://example.com/manga2",
+            "chapter_title": "Chapter 2",
+            "last_update": "2 hours ago",
+        },
+        {
+            "title": "Manga 3",
+            "link": "http://example.com/manga3",
+            "chapter_title": "Chapter 3",
+            "last_update": "3 hours ago",
+        }
+        # ... add more if needed for the test
+    ]
+
+    # When the first page of two items is rendered
+    result, _ = Paginator(sample_bookmarks, max_items=2).page(0)
+
+    # Then the result should be a formatted string for the first page
+    expected_message = (
+        "<b>Your Bookmarked Mangas:</b>\n\n"
+        "<a href='http://example.com/manga1'>Manga 1</a> - Last updated: 1 hour ago\n"
+        "<a href='http://example.com/manga2'>Manga 2</a> - Last updated: 2 hours ago\n"
+    )
+
+    assert result == expected_message
+
+
+def test_create_pagination_buttons():
+    # Test for the first page
+    buttons_first_page = create_pagination_buttons(0, 3)
+    assert len(buttons_first_page.inline_keyboard[0]) == 2  # 'Page 1 of 3' and 'Next'
+    assert buttons_first_page.inline_keyboard[0][1].text == "Next ➡️"
+    assert buttons_first_page.inline_keyboard[0][1].callback_data == "next_1"
+
+    # Test for a middle page
+    buttons_middle_page = create_pagination_buttons(1, 3)
+    assert (
+        len(buttons_middle_page.inline_keyboard[0]) == 3
+    )  # 'Previous', 'Page 2 of 3', and 'Next'
+    assert buttons_middle_page.inline_keyboard[0][0].text == "⬅️ Previous"
+    assert buttons_middle_page.inline_keyboard[0][0].callback_data == "prev_0"
+    assert buttons_middle_page.inline_keyboard[0][2].text == "Next ➡️"
+    assert buttons_middle_page.inline_keyboard[0][2].callback_data == "next_2"
+
+    # Test for the last page
+    buttons_last_page = create_pagination_buttons(2, 3)
+    assert (
+        len(buttons_last_page.inline_keyboard[0]) == 2
+    )  # 'Previous' and 'Page 3 of 3'
+    assert buttons_last_page.inline_keyboard[0][0].text == "⬅️ Previous"
+    assert buttons_last_page.inline_keyboard[0][0].callback_data == "prev_1"
+
+    # Test when there are no pages
+    buttons_no_pages = create_pagination_buttons(0, 0)
+    assert len(buttons_no_pages.inline_keyboard) == 0  # No buttons
+
+
+def test_pages_fit_in_one_message():
+    bookmarks = make_bookmarks(200, title_length=150)
+    paginator = Paginator(bookmarks)
+
+    assert paginator.total_pages > 1
+    for page in range(paginator.total_pages):
+        text, markup = paginator.page(page)
+        assert message_length(text) <= MESSAGE_LIMIT
+        assert text == render_bookmarks(bookmarks[paginator.page_slice(page)])
+        assert markup == create_pagination_buttons(page, paginator.total_pages)
+    # Every bookmark is on exactly one page, in order
+    assert paginator.boundaries[0] == 0
+    assert paginator.boundaries[-1] == len(bookmarks)
+
+
+def test_pages_are_packed():
+    # Short entries share a page, no matter how many there are
+    assert Paginator(make_bookmarks(40)).total_pages == 1
+
+    # A page is only cut when the next entry would not fit
+    paginator = Paginator(make_bookmarks(200, title_length=150))
+    for page in range(paginator.total_pages - 1):
+        text, _ = paginator.page(page)
+        next_line = render_bookmarks([paginator.bookmarks[paginator.boundaries[page + 1]]])
+        overflow = message_length(text) + message_length(next_line) - message_length(render_bookmarks([]))
+        assert overflow > MESSAGE_LIMIT
+
+
+def test_entry_sizes_vary():
+    bookmarks = make_bookmarks(10, title_length=10) + make_bookmarks(10, title_length=1500)
+    paginator = Paginator(bookmarks)
+
+    # Two long entries still fit after the short ones, then two long ones per page
+    assert paginator.boundaries == [0, 12, 14, 16, 18, 20]
+
+
+def test_unicode_is_measured_like_telegram():
+    # Emoji take two UTF-16 code units each
+    assert message_length("📚") == 2
+    bookmarks = make_bookmarks(100, title_length=0)
+    for bookmark in bookmarks:
+        bookmark["title"] += "📚" * 40
+    paginator = Paginator(bookmarks)
+    for page in range(paginator.total_pages):
+        assert message_length(paginator.page(page)[0]) <= MESSAGE_LIMIT
+
+
+def test_oversized_entry_is_shortened():
+    paginator = Paginator(make_bookmarks(1, title_length=10000))
+
+    text, _ = paginator.page(0)
+    assert message_length(text) <= MESSAGE_LIMIT
+    assert "…" in text
+
+
+def test_oversized_unicode_entry_is_shortened_to_fit():
+    bookmarks = make_bookmarks(1, title_length=0)
+    bookmarks[0]["title"] += "📚" * 5000
+    paginator = Paginator(bookmarks)
+
+    text, _ = paginator.page(0)
+    # Shortened by as many code units as needed, not by as many characters
+    assert MESSAGE_LIMIT - 2 < message_length(text) <= MESSAGE_LIMIT
+    assert text.count("📚") > 1000
+
+
+def test_max_items():
+    paginator = Paginator(make_bookmarks(25), max_items=10)
+
+    assert paginator.boundaries == [0, 10, 20, 25]
+
+
+def test_pages_are_rendered_lazily_and_memoized():
+    paginator = Paginator(make_bookmarks(25), max_items=10)
+    assert paginator.rendered_pages == 0
+
+    first = paginator.page(1)
+    assert paginator.page(1) is first
+    assert paginator.rendered_pages == 1
+
+
+def test_out_of_range_pages_are_clamped():
+    paginator = Paginator(make_bookmarks(25), max_items=10)
+
+    assert paginator.page(7) is paginator.page(2)
+    assert paginator.page(-1) is paginator.page(0)
+
+
+def test_empty_list_has_one_page():
+    paginator = Paginator([])
+
+    assert paginator.total_pages == 1
+    text, markup = paginator.page(0)
+    assert text == render_bookmarks([])
+    assert markup == create_pagination_buttons(0, 1)
+
+
+def test_snapshot_shares_one_paginator():
+    bookmarks = make_bookmarks(5)
+
+    assert get_paginator(bookmarks) is get_paginator(bookmarks)
+    # Another snapshot, even with equal content, gets its own paginator
+    assert get_paginator(make_bookmarks(5)) is not get_paginator(bookmarks)
@@ -0,0 +1,145 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+from src import persistence as persistence_module
+from src.persistence import SQLitePersistence, get_persistence
+
+
+@pytest.fixture(autouse=True)
+def no_batch_delay(monkeypatch):
+    monkeypatch.setattr(persistence_module, "BATCH_DELAY", 0)
+
+
+@pytest.fixture
+def now():
+    return [1000.0]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "persistence.sqlite3")
+
+
+@pytest.fixture
+def persistence(path, now):
+    return SQLitePersistence(path, max_idle=100, max_age=1000, clock=lambda: now[0])
+
+
+def stored_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT kind, key FROM entries ORDER BY kind, key").fetchall()
+
+
+@pytest.mark.asyncio
+async def test_data_survives_restart(persistence, path, now):
+    await persistence.update_user_data(1, {"page": 2})
+    await persistence.update_chat_data(-5, {"version": "abc"})
+    await persistence.update_bot_data({"runs": 3})
+    await persistence.update_conversation("register", (1, 1), "password")
+    await persistence.flush()
+
+    restarted = SQLitePersistence(path, clock=lambda: now[0])
+    assert await restarted.get_user_data() == {1: {"page": 2}}
+    assert await restarted.get_chat_data() == {-5: {"version": "abc"}}
+    assert await restarted.get_bot_data() == {"runs": 3}
+    assert await restarted.get_conversations("register") == {(1, 1): "password"}
+    assert await restarted.get_callback_data() is None
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched_behind(persistence, path, monkeypatch):
+    monkeypatch.setattr(persistence_module, "BATCH_DELAY", 60)
+
+    for user_id in range(3):
+        await persistence.update_user_data(user_id, {"n": user_id})
+
+    # Nothing has touched the disk yet
+    assert stored_rows(path) == []
+
+    await persistence.flush()
+    assert stored_rows(path) == [("user", "0"), ("user", "1"), ("user", "2")]
+
+
+@pytest.mark.asyncio
+async def test_drop_user_data(persistence, path):
+    await persistence.update_user_data(1, {"page": 2})
+    await persistence.flush()
+
+    await persistence.drop_user_data(1)
+    await persistence.flush()
+
+    assert stored_rows(path) == []
+
+
+@pytest.mark.asyncio
+async def test_idle_entries_evicted_and_reloaded(persistence, path, now):
+    application = MagicMock()
+    persistence.bind(application)
+    await persistence.update_user_data(1, {"page": 2})
+    await persistence.flush()
+    await persistence.refresh_user_data(1, {"page": 2})
+    await persistence.refresh_user_data(2, {})
+
+    # User 1 stays active, user 2 goes idle
+    now[0] += 60
+    await persistence.refresh_user_data(1, {"page": 2})
+    now[0] += 60
+    assert persistence.evict_idle() == 1
+    application.drop_user_data.assert_called_once_with(2)
+
+    # Evicting only drops the entry from memory
+    await persistence.update_user_data(2, {"page": 4})
+    await persistence.flush()
+    await persistence.drop_user_data(2)
+    await persistence.flush()
+    assert stored_rows(path) == [("user", "1"), ("user", "2")]
+
+    # Coming back reads the data from disk
+    user_data = {}
+    await persistence.refresh_user_data(2, user_data)
+    assert user_data == {"page": 4}
+
+
+@pytest.mark.asyncio
+async def test_restart_loads_recent_entries_only(persistence, path, now):
+    await persistence.update_user_data(1, {"page": 1})
+    await persistence.flush()
+    now[0] += 200
+    await persistence.update_user_data(2, {"page": 2})
+    await persistence.flush()
+
+    restarted = SQLitePersistence(path, max_idle=100, clock=lambda: now[0])
+    assert await restarted.get_user_data() == {2: {"page": 2}}
+
+    # The idle user is loaded when it comes back
+    user_data = {}
+    await restarted.refresh_user_data(1, user_data)
+    assert user_data == {"page": 1}
+
+
+@pytest.mark.asyncio
+async def test_old_entries_deleted(persistence, path, now):
+    await persistence.update_user_data(1, {"page": 1})
+    await persistence.update_bot_data({"runs": 1})
+    await persistence.flush()
+
+    now[0] += 2000
+    await persistence.update_user_data(2, {"page": 2})
+    await persistence.flush()
+
+    assert stored_rows(path) == [("bot", ""), ("user", "2")]
+
+
+def test_get_persistence_lives_in_data_dir(data_dir, monkeypatch):
+    monkeypatch.setenv("PERSISTENCE_INTERVAL", "30")
+
+    persistence = get_persistence()
+
+    assert persistence.path == str(data_dir / "persistence.sqlite3")
+    assert persistence.update_interval == 30
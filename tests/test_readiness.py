@@ -0,0 +1,113 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import pytest
+from unittest.mock import MagicMock
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+from src.metrics import PAGE_WAIT_SECONDS
+from src.readiness import (
+    wait_until,
+    step_timeout,
+    get_wait_times,
+    login_form_ready,
+    BookmarksReady,
+)
+
+
+class FakePage:
+    """
+    A driver whose page goes through a list of (readyState, unit count, login form)
+    states, one per execute_script call, and stays on the last one.
+    """
+
+    def __init__(self, *states):
+        self.states = list(states)
+
+    def execute_script(self, script):
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+def test_step_timeout(monkeypatch):
+    assert step_timeout("login_form") == 20
+    assert step_timeout("bookmarks") == 15
+
+    monkeypatch.setenv("WAIT_TIMEOUT_BOOKMARKS", "2.5")
+    assert step_timeout("bookmarks") == 2.5
+
+
+def test_wait_until_records_wait_time():
+    observed = PAGE_WAIT_SECONDS.count(step="instant")
+    result = wait_until(MagicMock(), "instant", lambda driver: "ready")
+
+    assert result == "ready"
+    assert get_wait_times()["instant"] < 0.05
+    # The wait is also exported on /metrics
+    assert PAGE_WAIT_SECONDS.count(step="instant") == observed + 1
+
+
+def test_wait_until_times_out_and_records():
+    with pytest.raises(TimeoutException):
+        wait_until(MagicMock(), "never", lambda driver: False, timeout=0.2)
+
+    assert 0.2 <= get_wait_times()["never"] < 1
+
+
+def test_bookmarks_ready_as_soon_as_units_settle():
+    page = FakePage(
+        ("loading", 0, False),
+        ("complete", 10, False),
+        ("complete", 30, False),
+        ("complete", 30, False),
+    )
+
+    started = time.perf_counter()
+    assert wait_until(page, "bookmarks", BookmarksReady(), timeout=5)
+    # Three polls, far from the old fixed two second sleep
+    assert time.perf_counter() - started < 1
+
+
+def test_bookmarks_ready_on_empty_list():
+    page = FakePage(("complete", 0, False))
+
+    assert wait_until(page, "bookmarks", BookmarksReady(), timeout=5)
+
+
+def test_bookmarks_ready_on_login_redirect():
+    condition = BookmarksReady()
+
+    assert condition(FakePage(("interactive", 0, True)))
+
+
+def test_bookmarks_not_ready_while_loading():
+    condition = BookmarksReady()
+    page = FakePage(("complete", 5, False), ("loading", 5, False), ("complete", 5, False))
+
+    assert not condition(page)
+    assert not condition(page)  # Navigation started again
+    assert not condition(page)  # Count seen once since the page completed
+
+
+def test_login_form_ready():
+    fields = {
+        (By.ID, "user_login"): MagicMock(),
+        (By.ID, "user_pass"): MagicMock(),
+        (By.ID, "wp-submit"): MagicMock(),
+    }
+    driver = MagicMock()
+    driver.find_element.side_effect = lambda by, value: fields[by, value]
+
+    assert login_form_ready(driver) == tuple(fields.values())
+
+    fields[By.ID, "wp-submit"].is_enabled.return_value = False
+    assert login_form_ready(driver) is False
+
+
+def test_login_form_missing():
+    driver = MagicMock()
+    driver.find_element.side_effect = NoSuchElementException("no form")
+
+    assert login_form_ready(driver) is False
@@ -0,0 +1,103 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+import string
+from datetime import datetime, timedelta, timezone
+import pytest
+from src.relative_time import parse_last_update, last_update_timestamp, UNITS
+
+NOW = datetime(2024, 3, 31, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("just now", NOW),
+        ("5 seconds ago", NOW - timedelta(seconds=5)),
+        ("1 min ago", NOW - timedelta(minutes=1)),
+        ("15 mins ago", NOW - timedelta(minutes=15)),
+        ("42 minutes ago", NOW - timedelta(minutes=42)),
+        ("an hour ago", NOW - timedelta(hours=1)),
+        ("3 hours ago", NOW - timedelta(hours=3)),
+        ("3h ago", NOW - timedelta(hours=3)),
+        ("  3   HOURS   Ago ", NOW - timedelta(hours=3)),
+        ("yesterday", NOW - timedelta(days=1)),
+        ("1 day ago", NOW - timedelta(days=1)),
+        ("6 days ago", NOW - timedelta(days=6)),
+        ("a week ago", NOW - timedelta(weeks=1)),
+        ("5 week ago", NOW - timedelta(weeks=5)),
+        ("1 month ago", datetime(2024, 2, 29, 12, 0, tzinfo=timezone.utc)),
+        ("13 months ago", datetime(2023, 2, 28, 12, 0, tzinfo=timezone.utc)),
+        ("2 years ago", datetime(2022, 3, 31, 12, 0, tzinfo=timezone.utc)),
+        ("December 28, 2023", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+        ("Dec 28 2023", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+        ("28th December, 2023", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+        ("2023-12-28", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+        ("28/12/2023", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+        ("28.12.2023", datetime(2023, 12, 28, tzinfo=timezone.utc)),
+    ],
+)
+def test_parse_last_update(text, expected):
+    assert parse_last_update(text, NOW) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        None,
+        "many time ago",  # Our own fallback when the website shows nothing
+        "ago",
+        "hours ago",
+        "3 fortnights ago",
+        "3 hours",
+        "31/02/2023",
+        "2023-13-01",
+        "Smarch 3, 2023",
+        "99999999999999 days ago",
+        "99999 years ago",
+    ],
+)
+def test_unparseable_text(text):
+    assert parse_last_update(text, NOW) is None
+
+
+def test_last_update_timestamp():
+    assert last_update_timestamp("1 hour ago", NOW) == (NOW - timedelta(hours=1)).timestamp()
+    assert last_update_timestamp("many time ago", NOW) is None
+
+
+def test_default_now_is_utc():
+    parsed = parse_last_update("1 min ago")
+    assert parsed.tzinfo == timezone.utc
+    assert datetime.now(timezone.utc) - parsed < timedelta(minutes=2)
+
+
+def test_fuzz_corpus():
+    rng = random.Random(1234)
+    aliases = sorted(UNITS)
+    corpus = []
+    for _ in range(5000):
+        kind = rng.random()
+        if kind < 0.5:
+            # Well formed relative strings with random spacing and case
+            text = f"{rng.randint(0, 500)}{' ' * rng.randint(0, 3)}{rng.choice(aliases)} ago"
+            text = "".join(c.upper() if rng.random() < 0.3 else c for c in text)
+        elif kind < 0.8:
+            # Random mutations of a well formed string
+            text = list(f"{rng.randint(1, 60)} {rng.choice(aliases)} ago")
+            for _ in range(rng.randint(1, 4)):
+                text.insert(rng.randrange(len(text) + 1), rng.choice(string.printable))
+            text = "".join(text)
+        else:
+            # Random noise
+            text = "".join(rng.choice(string.printable) for _ in range(rng.randint(0, 30)))
+        corpus.append(text)
+
+    for text in corpus:
+        parsed = parse_last_update(text, NOW)
+        # Never raises, and never returns anything but an aware UTC moment up to now
+        assert parsed is None or (parsed.tzinfo == timezone.utc and parsed <= NOW), text
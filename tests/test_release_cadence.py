@@ -0,0 +1,145 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import datetime, timezone
+
+import pytest
+from src.account_store import Account
+from src.history_store import HistoryStore
+from src.release_cadence import (
+    DAY,
+    HOUR,
+    PollPlanner,
+    learn_cadence,
+    poll_interval,
+)
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+# Fridays around 18:00
+WEEKLY = [at(2024, 5, 3, 18, 10), at(2024, 5, 10, 17, 40), at(2024, 5, 17, 18, 30), at(2024, 5, 24, 18, 0)]
+
+
+def test_learn_weekly_cadence():
+    cadence = learn_cadence(WEEKLY, at(2024, 5, 27, 12, 0))
+
+    assert cadence.period == 7 * DAY
+    # The next Friday around 18:00
+    assert abs(cadence.next_release - at(2024, 5, 31, 18, 5)) <= 30 * 60
+    assert HOUR <= cadence.spread <= 2 * HOUR
+
+
+def test_learn_cadence_window_still_open():
+    # Friday 19:00, the release is late but the window is still open
+    cadence = learn_cadence(WEEKLY, at(2024, 5, 31, 19, 0))
+    assert cadence.next_release < at(2024, 5, 31, 19, 0)
+
+    # Saturday, this week's window has passed
+    cadence = learn_cadence(WEEKLY, at(2024, 6, 1, 12, 0))
+    assert cadence.next_release > at(2024, 6, 7)
+
+
+def test_learn_cadence_needs_a_pattern():
+    now = at(2024, 5, 27)
+    # Too few releases
+    assert learn_cadence(WEEKLY[-2:], now) is None
+    # Chapters released together are one release
+    assert learn_cadence([WEEKLY[0], WEEKLY[0] + 60, WEEKLY[1] + 60], now) is None
+    # No regular rhythm
+    irregular = [at(2024, 4, 1), at(2024, 4, 3), at(2024, 4, 13), at(2024, 4, 15), at(2024, 4, 28)]
+    assert learn_cadence(irregular, at(2024, 4, 29)) is None
+    # On hiatus
+    assert learn_cadence(WEEKLY, at(2024, 7, 1)) is None
+
+
+def test_poll_interval():
+    cadence = learn_cadence(WEEKLY, at(2024, 5, 27, 12, 0))
+    assert poll_interval(None, at(2024, 5, 27), 900, DAY) == DAY
+    # Far from the window, back off
+    assert poll_interval(cadence, at(2024, 5, 27, 12, 0), 900, DAY) == DAY
+    # The interval shrinks as the window gets closer
+    assert poll_interval(cadence, at(2024, 5, 31, 10, 0), 900, DAY) < 4 * HOUR
+    assert poll_interval(cadence, at(2024, 5, 31, 16, 0), 900, DAY) < HOUR
+    # In the window, poll as often as allowed
+    assert poll_interval(cadence, at(2024, 5, 31, 18, 0), 900, DAY) == 900
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+ALICE = Account(1, "alice", "pw")
+BOB = Account(2, "bob", "pw")
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.sqlite3"))
+    history.record(ALICE.key, [{"title": "Weekly", "chapter_title": "Chapter 0"}], now=WEEKLY[0] - DAY)
+    for number, released_at in enumerate(WEEKLY, start=1):
+        scrape = [{"title": "Weekly", "chapter_title": f"Chapter {number}", "updated_at": released_at}]
+        history.record(ALICE.key, scrape, now=released_at + HOUR)
+    history.record(BOB.key, [{"title": "Monthly", "chapter_title": "Chapter 1"}], now=WEEKLY[0])
+    yield history
+    history.close()
+
+
+def test_planner_polls_accounts_near_a_release(history):
+    clock = FakeClock(at(2024, 5, 31, 12, 0))
+    planner = PollPlanner(budget=10, history=history, clock=clock)
+    planner.record_polled(ALICE.key, at(2024, 5, 31, 9, 0))
+    planner.record_polled(BOB.key, at(2024, 5, 31, 9, 0))
+
+    # Alice's weekly title comes out tonight, bob's title has no pattern
+    assert planner.due([ALICE, BOB]) == [ALICE]
+
+    # Polled just now, not due again yet
+    planner.record_polled(ALICE.key)
+    assert planner.due([ALICE, BOB]) == []
+
+    # Within the release window she is polled every min_interval
+    clock.now = at(2024, 5, 31, 18, 0)
+    planner.record_polled(ALICE.key)
+    clock.now += 900
+    assert planner.due([ALICE, BOB]) == [ALICE]
+
+    # A day after the last poll, bob is due too
+    clock.now = at(2024, 6, 1, 9, 30)
+    planner.record_polled(ALICE.key)
+    assert planner.due([ALICE, BOB]) == [BOB]
+
+
+def test_planner_stays_within_budget(history):
+    clock = FakeClock(at(2024, 5, 31, 18, 0))
+    planner = PollPlanner(budget=2, history=history, clock=clock)
+    accounts = [Account(number, f"reader{number}", "pw") for number in range(5)]
+    for account in accounts:
+        history.record(account.key, [{"title": "Weekly", "chapter_title": "Chapter 4"}])
+        planner.record_polled(account.key, clock.now - HOUR)
+
+    assert len(planner.due(accounts)) == 2
+    assert planner.due(accounts) == []
+    # The budget refills over the hour
+    clock.now += 30 * 60
+    assert len(planner.due(accounts)) == 1
+
+    assert PollPlanner(budget=0, history=history, clock=clock).due(accounts) == []
+
+
+def test_planner_polls_shared_account_once(history):
+    clock = FakeClock(at(2024, 5, 31, 18, 0))
+    planner = PollPlanner(budget=1, history=history, clock=clock)
+    planner.record_polled(ALICE.key, clock.now - HOUR)
+    group_chat = Account(3, "alice", "pw")
+
+    # Both chats of the account come back for a single poll of the budget
+    assert planner.due([ALICE, group_chat]) == [ALICE, group_chat]
@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import threading
+import time
+import pytest
+from src.scrape_executor import ScrapeExecutor, ScrapeQueueFull
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_from_worker_thread():
+    executor = ScrapeExecutor(max_workers=1)
+
+    thread_name = await executor.run(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("scrape")
+    assert executor.submitted == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_propagates_errors():
+    executor = ScrapeExecutor(max_workers=1)
+
+    def failing_scrape():
+        raise RuntimeError("site is down")
+
+    with pytest.raises(RuntimeError):
+        await executor.run(failing_scrape)
+    assert executor.submitted == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_when_queue_full():
+    executor = ScrapeExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    waiting = asyncio.ensure_future(executor.run(release.wait))
+    await asyncio.sleep(0)
+
+    # One scrape runs, one waits and the third is turned away
+    with pytest.raises(ScrapeQueueFull):
+        await executor.run(release.wait)
+
+    release.set()
+    await asyncio.gather(running, waiting)
+    assert executor.submitted == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_event_loop_not_blocked():
+    executor = ScrapeExecutor(max_workers=1)
+
+    scrape = asyncio.ensure_future(executor.run(time.sleep, 0.3))
+
+    # While the slow scrape runs the loop keeps ticking on time
+    started = time.monotonic()
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+    assert time.monotonic() - started < 0.25
+    assert not scrape.done()
+
+    await scrape
+    executor.shutdown()
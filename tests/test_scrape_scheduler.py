@@ -0,0 +1,142 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+from src.account_store import Account
+from src.scrape_executor import ScrapeQueueFull
+from src.scrape_scheduler import ScrapeScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def accounts(count):
+    return [Account(index, f"user{index}", "pw") for index in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    scheduler = ScrapeScheduler(concurrency=3)
+    running = 0
+    peak = 0
+
+    async def job(chats):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return chats[0].chat_id
+
+    results = await scheduler.run_round(accounts(200), job)
+
+    # Every account was scraped, never more than three at once
+    assert len(results) == 200
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_least_recently_scraped_go_first():
+    clock = FakeClock()
+    scheduler = ScrapeScheduler(concurrency=1, clock=clock)
+    order = []
+
+    async def job(chats):
+        order.append(chats[0].username)
+        clock.now += 1
+
+    await scheduler.run_round(accounts(3)[1:], job)
+    order.clear()
+
+    # user0 was never scraped, then user1 waited longer than user2
+    await scheduler.run_round(list(reversed(accounts(3))), job)
+    assert order == ["user0", "user1", "user2"]
+
+
+@pytest.mark.asyncio
+async def test_failing_account_backs_off_alone():
+    clock = FakeClock()
+    scheduler = ScrapeScheduler(concurrency=2, base_backoff=100, max_backoff=350, clock=clock)
+    calls = []
+    user0, user1, user2 = accounts(3)
+
+    async def job(chats):
+        calls.append(chats[0].username)
+        if chats[0].username == "user0":
+            raise RuntimeError("login failed")
+        return "ok"
+
+    results = await scheduler.run_round(accounts(3), job)
+    assert results == {user1.key: "ok", user2.key: "ok"}
+    assert 90 <= scheduler.backoff_remaining(user0.key) <= 110
+
+    # During the backoff the failing account is skipped, the others still run
+    calls.clear()
+    await scheduler.run_round(accounts(3), job)
+    assert sorted(calls) == ["user1", "user2"]
+
+    # The delay doubles with every failure in a row, up to the maximum
+    clock.now += 200
+    await scheduler.run_round(accounts(3), job)
+    assert 180 <= scheduler.backoff_remaining(user0.key) <= 220
+    clock.now += 300
+    await scheduler.run_round(accounts(3), job)
+    assert scheduler.backoff_remaining(user0.key) <= 350 * 1.1
+
+    # A success clears the backoff
+    scheduler.record_success(user0.key)
+    assert scheduler.backoff_remaining(user0.key) == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_does_not_back_off():
+    scheduler = ScrapeScheduler(concurrency=1)
+
+    async def job(chats):
+        raise ScrapeQueueFull("Too many scrapes are already waiting")
+
+    assert await scheduler.run_round(accounts(1), job) == {}
+    assert scheduler.backoff_remaining(accounts(1)[0].key) == 0
+
+
+@pytest.mark.asyncio
+async def test_account_never_runs_twice_at_once():
+    scheduler = ScrapeScheduler(concurrency=4)
+    calls = []
+
+    async def job(chats):
+        calls.append([chat.chat_id for chat in chats])
+        await asyncio.sleep(0.05)
+
+    # Two chats sharing an account, and an overlapping round
+    shared = [Account(1, "shared", "pw"), Account(2, "shared", "pw")]
+    first = asyncio.ensure_future(scheduler.run_round(shared, job))
+    await asyncio.sleep(0.01)
+    await scheduler.run_round(shared, job)
+    await first
+
+    # One scrape serves both chats
+    assert calls == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_same_login_with_another_password_is_another_account():
+    scheduler = ScrapeScheduler(concurrency=4)
+    calls = []
+
+    async def job(chats):
+        calls.append([chat.chat_id for chat in chats])
+
+    chats = [Account(1, "shared", "pw"), Account(2, "shared", "guess"), Account(3, "shared", "pw")]
+    results = await scheduler.run_round(chats, job)
+
+    assert sorted(calls) == [[1, 3], [2]]
+    assert set(results) == {chats[0].key, chats[1].key}
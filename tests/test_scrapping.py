@@ -10,9 +10,18 @@ from src.scrapping import (
     setup_driver,
     login,
     scrape_bookmarks,
+    is_login_page,
+    discover_page_count,
+    scrape_remaining_pages,
+    EXTRACT_BOOKMARKS_SCRIPT,
+    PAGINATION_SCRIPT,
 )  # Replace with your actual import
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    JavascriptException,
+    TimeoutException,
+)
 
 @patch("src.scrapping.webdriver.Chrome")
 @patch("src.scrapping.ChromeDriverManager")
@@ -80,6 +89,101 @@ def test_login(mock_driver_login):
     login_button.click.assert_called_once()
 
 
+def test_is_login_page():
+    driver = MagicMock()
+    driver.find_elements.return_value = []
+
+    driver.current_url = "https://manga-scans.com/bookmarks/"
+    assert not is_login_page(driver)
+
+    # Redirected to the login form
+    driver.current_url = "https://manga-scans.com/login?redirect_to=bookmarks"
+    assert is_login_page(driver)
+
+    # Login form rendered in place of the bookmarks
+    driver.current_url = "https://manga-scans.com/bookmarks/"
+    driver.find_elements.return_value = [MagicMock()]
+    assert is_login_page(driver)
+
+
+class FakeTabsDriver:
+    """
+    A driver that opens every bookmarks page url in its own tab and answers the
+    extraction script with one bookmark named after the page.
+    """
+
+    def __init__(self):
+        self.tabs = {"main": "https://manga-scans.com/bookmarks/"}
+        self.current_window_handle = "main"
+        self.opened = []
+        self.closed = []
+        self.switch_to = MagicMock()
+        self.switch_to.window.side_effect = self._switch
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    def _switch(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        self.closed.append(self.current_window_handle)
+        del self.tabs[self.current_window_handle]
+
+    def execute_script(self, script, *args):
+        if script.startswith("window.open"):
+            handle = f"tab-{len(self.opened)}"
+            self.tabs[handle] = args[0]
+            self.opened.append(args[0])
+            return None
+        if script == EXTRACT_BOOKMARKS_SCRIPT:
+            url = self.tabs[self.current_window_handle]
+            return [
+                {
+                    "title": url,
+                    "link": url,
+                    "chapter_title": "Chapter 1",
+                    "last_update": "1 hour ago",
+                    "image": "http://example.com/img.jpg",
+                }
+            ]
+        # Readiness check: loaded, one unit, no login form
+        return ["complete", 1, False]
+
+
+def test_discover_page_count():
+    driver = MagicMock()
+    driver.execute_script.return_value = [
+        ["https://manga-scans.com/bookmarks/page/2/", "2"],
+        ["https://manga-scans.com/bookmarks/page/7/", "7"],
+        ["https://manga-scans.com/bookmarks/page/2/", "Next »"],
+    ]
+
+    assert discover_page_count(driver) == 7
+    driver.execute_script.assert_called_once_with(PAGINATION_SCRIPT)
+
+    driver.execute_script.return_value = []
+    assert discover_page_count(driver) == 1
+
+    driver.execute_script.side_effect = JavascriptException("script error")
+    assert discover_page_count(driver) == 1
+
+
+def test_scrape_remaining_pages():
+    driver = FakeTabsDriver()
+
+    pages = scrape_remaining_pages(driver, page_count=6, max_tabs=2)
+
+    # Pages 2 to 6 opened in tabs, read in page order, and closed again
+    assert [page[0]["link"] for page in pages] == [
+        f"https://manga-scans.com/bookmarks/page/{n}/" for n in range(2, 7)
+    ]
+    assert len(driver.closed) == 5
+    assert driver.window_handles == ["main"]
+    assert driver.current_window_handle == "main"
+
+
 @pytest.fixture
 def mock_driver():
     # Create mock web elements for bookmarks
@@ -118,10 +222,12 @@ def mock_driver():
 
 class TestScrapeBookmarks(unittest.TestCase):
     @patch("src.scrapping.logger")
-    @patch("src.scrapping.time.sleep", return_value=None)  # Mock sleep to bypass time delay
-    def test_scrape_bookmarks(self, mock_sleep, mock_logger):
+    @patch("src.scrapping.wait_until")  # The page is ready right away
+    def test_scrape_bookmarks(self, mock_wait_until, mock_logger):
         # Mock the webdriver and the elements it will find
         mock_driver = MagicMock()
+        # The one round-trip extraction script fails, so the per-element path is used
+        mock_driver.execute_script.side_effect = JavascriptException("script error")
         mock_bookmark_element = MagicMock()
 
         # Set up the side effects for the happy path
@@ -163,13 +269,67 @@ class TestScrapeBookmarks(unittest.TestCase):
         self.assertEqual(result[0]["chapter_title"], "Chapter 123")
         self.assertEqual(result[0]["last_update"], "1 hour ago")
         self.assertEqual(result[0]["image"], "http://example.com/image.jpg")
+        self.assertIsInstance(result[0]["updated_at"], float)
 
         # Assertions for the missing last_update scenario
         self.assertEqual(result[1]["title"], "Manga Title 2")
         self.assertEqual(result[1]["link"], "http://example.com/manga2")
         self.assertEqual(result[1]["chapter_title"], "Chapter 456")
         self.assertEqual(result[1]["last_update"], "many time ago")  # Fallback text
+        self.assertIsNone(result[1]["updated_at"])
         self.assertEqual(result[1]["image"], "http://example.com/image2.jpg")
 
         # Now there should be a call to logger.error due to the processing error
-        mock_logger.error.assert_called_once_with("Error processing a bookmark: Unexpected error")
\ No newline at end of file
+        mock_logger.error.assert_called_once_with("Error processing a bookmark: Unexpected error")
+
+    @patch("src.scrapping.logger")
+    @patch("src.scrapping.wait_until")
+    def test_scrape_bookmarks_single_round_trip(self, mock_wait_until, mock_logger):
+        mock_driver = MagicMock()
+        mock_driver.execute_script.return_value = [
+            {
+                "title": "Manga Title",
+                "link": "http://example.com/manga",
+                "chapter_title": "Chapter 123",
+                "last_update": "1 hour ago",
+                "image": "http://example.com/image.jpg",
+            },
+            None,  # A unit missing one of its elements
+            {
+                "title": "Manga Title 2",
+                "link": "http://example.com/manga2",
+                "chapter_title": "Chapter 456",
+                "last_update": None,
+                "image": "http://example.com/image2.jpg",
+            },
+        ]
+
+        result = scrape_bookmarks(mock_driver)
+
+        # Everything came from the one script call
+        mock_driver.execute_script.assert_any_call(EXTRACT_BOOKMARKS_SCRIPT)
+        mock_driver.find_elements.assert_not_called()
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]["title"], "Manga Title")
+        self.assertEqual(result[0]["link"], "http://example.com/manga")
+        self.assertEqual(result[0]["chapter_title"], "Chapter 123")
+        self.assertEqual(result[0]["last_update"], "1 hour ago")
+        self.assertEqual(result[0]["image"], "http://example.com/image.jpg")
+        self.assertIsInstance(result[0]["updated_at"], float)
+        self.assertEqual(result[1]["last_update"], "many time ago")  # Fallback text
+        self.assertIsNone(result[1]["updated_at"])
+        mock_logger.error.assert_called_once_with(
+            "Error processing a bookmark: missing element"
+        )
+
+
+    @patch("src.scrapping.logger")
+    @patch("src.scrapping.wait_until", side_effect=TimeoutException("slow page"))
+    def test_scrape_bookmarks_page_not_settled(self, mock_wait_until, mock_logger):
+        mock_driver = MagicMock()
+        mock_driver.execute_script.return_value = []
+
+        # A page that never settles is still read instead of failing the scrape
+        self.assertEqual(scrape_bookmarks(mock_driver), [])
+        mock_logger.warning.assert_called_once_with("Bookmarks page did not settle in time.")
@@ -0,0 +1,175 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import time
+import pytest
+from telegram.error import BadRequest, RetryAfter
+from src.metrics import REGISTRY
+from src.send_queue import DIGEST, INTERACTIVE, SendQueue, TokenBucket, send_queue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+
+    # A burst of three, then one per second
+    for _ in range(3):
+        assert bucket.wait_time() == 0
+        bucket.consume()
+    assert bucket.wait_time() == pytest.approx(1)
+    clock.now += 0.5
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.wait_time() == 0
+    assert not bucket.idle
+    clock.now += 10
+    assert bucket.idle
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_result_and_raises_errors():
+    queue = SendQueue()
+
+    async def send(text, chat_id=None):
+        if text == "bad":
+            raise BadRequest("Message is too long")
+        return f"{chat_id}:{text}"
+
+    # chat_id may also be an argument of the call itself
+    assert await queue.submit(1, send, "hello", chat_id=1) == "1:hello"
+    with pytest.raises(BadRequest):
+        await queue.submit(1, send, "bad")
+    assert queue.stats() == {
+        "depth": {"interactive": 0, "digest": 0},
+        "in_flight": 0,
+        "sent": 1,
+        "retried": 0,
+        "failed": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_per_chat_rate_limit():
+    queue = SendQueue(chat_rate=20, chat_burst=1)
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append((chat_id, time.monotonic()))
+
+    started = time.monotonic()
+    await asyncio.gather(*(queue.submit(1, send, 1, n) for n in range(4)))
+    elapsed = time.monotonic() - started
+
+    # Four sends at 20 per second take three intervals
+    assert len(sent) == 4
+    assert elapsed >= 3 / 20 - 0.01
+
+
+@pytest.mark.asyncio
+async def test_chats_do_not_wait_for_each_other():
+    queue = SendQueue(chat_rate=1, chat_burst=1)
+
+    async def send(text):
+        return text
+
+    await queue.submit(1, send, "first")
+    # Chat 1 has to wait a second now, chat 2 does not
+    started = time.monotonic()
+    await queue.submit(2, send, "other chat")
+    assert time.monotonic() - started < 0.1
+
+
+@pytest.mark.asyncio
+async def test_calls_of_a_chat_stay_in_order():
+    queue = SendQueue(chat_rate=1000, chat_burst=1000)
+    order = []
+
+    async def send(text):
+        await asyncio.sleep(0.01 if text == "first" else 0)
+        order.append(text)
+
+    await asyncio.gather(queue.submit(1, send, "first"), queue.submit(1, send, "second"))
+
+    assert order == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_interactive_lane_goes_first():
+    queue = SendQueue(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    order = []
+    gate = asyncio.Event()
+
+    async def send(text):
+        if text == "blocker":
+            await gate.wait()
+        order.append(text)
+
+    # Chat 1 is busy while the other calls queue up
+    blocker = asyncio.ensure_future(queue.submit(1, send, "blocker"))
+    await asyncio.sleep(0)
+    calls = [
+        queue.submit(1, send, "digest", priority=DIGEST),
+        queue.submit(1, send, "reply", priority=INTERACTIVE),
+    ]
+    pending = [asyncio.ensure_future(call) for call in calls]
+    await asyncio.sleep(0)
+    assert queue.depth() == {"interactive": 1, "digest": 1}
+
+    gate.set()
+    await asyncio.gather(blocker, *pending)
+    assert order == ["blocker", "reply", "digest"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured():
+    queue = SendQueue()
+    attempts = []
+
+    async def send(text):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryAfter(0.1)
+        return text
+
+    assert await queue.submit(1, send, "hello") == "hello"
+
+    # Sent again, after the delay Telegram asked for
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.09
+    assert queue.stats()["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gives_up_eventually():
+    queue = SendQueue(max_retries=2)
+
+    async def send(text):
+        raise RetryAfter(0)
+
+    with pytest.raises(RetryAfter):
+        await queue.submit(1, send, "hello")
+    assert queue.stats()["retried"] == 2
+    assert queue.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_counters_exported():
+    sent = send_queue.sent
+
+    async def send(text):
+        return text
+
+    await send_queue.submit(1, send, "hello")
+
+    assert f"notti_send_queue_sent_total {sent + 1}\n" in REGISTRY.render()
@@ -0,0 +1,46 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import stat
+from src.session_store import save_session, load_session, clear_session, _session_path
+
+
+def test_session_round_trip():
+    cookies = [{"name": "wordpress_logged_in", "value": "abc", "domain": "manga-scans.com"}]
+
+    save_session("user@example.com", "secret", cookies)
+
+    assert load_session("user@example.com", "secret") == cookies
+    assert load_session("someone-else", "secret") is None
+    # Knowing the login is not enough to use the session
+    assert load_session("user@example.com", "guess") is None
+
+
+def test_session_file_permissions():
+    save_session("user@example.com", "secret", [{"name": "a", "value": "b"}])
+    path = _session_path("user@example.com", "secret")
+
+    # Only the bot user may read the cookies
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    # The login itself does not leak into the file name
+    assert "user@example.com" not in path
+
+
+def test_corrupted_session_ignored():
+    save_session("user", "secret", [{"name": "a", "value": "b"}])
+    with open(_session_path("user", "secret"), "w") as session_file:
+        session_file.write("{not json")
+
+    assert load_session("user", "secret") is None
+
+
+def test_clear_session():
+    save_session("user", "secret", [{"name": "a", "value": "b"}])
+
+    clear_session("user", "secret")
+    clear_session("user", "secret")  # Clearing twice is harmless
+
+    assert load_session("user", "secret") is None
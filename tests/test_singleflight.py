@@ -0,0 +1,104 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+from src.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_coalesced():
+    flight = SingleFlight()
+    calls = 0
+
+    async def scrape():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return ["bookmark"]
+
+    results = await asyncio.gather(*(flight.do("account", scrape) for _ in range(5)))
+
+    # Five callers, one scrape, everybody gets its result
+    assert calls == 1
+    assert results == [["bookmark"]] * 5
+    assert flight.stats() == {
+        "requests": 5,
+        "executions": 1,
+        "coalesced": 4,
+        "in_flight": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_independently():
+    flight = SingleFlight()
+    started = []
+
+    async def scrape(key):
+        started.append(key)
+        await asyncio.sleep(0.05)
+        return key
+
+    results = await asyncio.gather(
+        flight.do("alice", lambda: scrape("alice")),
+        flight.do("bob", lambda: scrape("bob")),
+        flight.do("alice", lambda: scrape("alice")),
+    )
+
+    assert results == ["alice", "bob", "alice"]
+    assert sorted(started) == ["alice", "bob"]
+    assert flight.coalesced == 1
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_not_coalesced():
+    flight = SingleFlight()
+
+    async def scrape():
+        return 1
+
+    await flight.do("account", scrape)
+    await flight.do("account", scrape)
+
+    assert flight.executions == 2
+    assert flight.coalesced == 0
+    assert not flight.in_flight("account")
+
+
+@pytest.mark.asyncio
+async def test_errors_shared_and_forgotten():
+    flight = SingleFlight()
+
+    async def scrape():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("site is down")
+
+    results = await asyncio.gather(
+        flight.do("account", scrape),
+        flight.do("account", scrape),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.executions == 1
+    # A failed call is not cached, the next caller tries again
+    assert not flight.in_flight("account")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_call():
+    flight = SingleFlight()
+
+    async def scrape():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    impatient = asyncio.ensure_future(flight.do("account", scrape))
+    patient = asyncio.ensure_future(flight.do("account", scrape))
+    await asyncio.sleep(0)
+    impatient.cancel()
+
+    assert await patient == "done"
@@ -0,0 +1,42 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.site import bookmarks_page_url, max_page_number, merge_pages
+
+
+def test_bookmarks_page_url():
+    assert bookmarks_page_url(1) == "https://manga-scans.com/bookmarks/"
+    assert bookmarks_page_url(3) == "https://manga-scans.com/bookmarks/page/3/"
+
+
+def test_max_page_number():
+    assert max_page_number([]) == 1
+    assert (
+        max_page_number(
+            [
+                ("https://manga-scans.com/bookmarks/page/2/", "2"),
+                ("https://manga-scans.com/bookmarks/page/12/", "12"),
+                ("https://manga-scans.com/bookmarks/page/2/", "Next »"),
+            ]
+        )
+        == 12
+    )
+    # Query string pagination and bare link texts
+    assert max_page_number([("https://manga-scans.com/bookmarks/?paged=4", "")]) == 4
+    assert max_page_number([("#", " 5 ")]) == 5
+    # Junk is ignored
+    assert max_page_number([None, ("only-one",), (None, None), {"href": "x"}]) == 1
+
+
+def test_merge_pages():
+    pages = [
+        [{"link": "a"}, {"link": "b"}],
+        [{"link": "b", "page": 2}, {"link": "c"}],
+        [],
+        [{"link": "a", "page": 4}, {"link": "d"}],
+    ]
+
+    # Page order is kept and the first occurrence of a link wins
+    assert merge_pages(pages) == [{"link": "a"}, {"link": "b"}, {"link": "c"}, {"link": "d"}]
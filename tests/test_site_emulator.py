@@ -0,0 +1,141 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import subprocess
+import time
+
+import pytest
+import requests
+from benchmarks.bench_scrape import compare, stage_times
+from benchmarks.site_emulator import SiteEmulator
+from src.backends import HttpBackend, LoginFailed
+from src.http_scrapping import is_login_html, parse_bookmarks, parse_page_count
+from src.tracing import Span
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def site(monkeypatch):
+    with SiteEmulator(bookmarks=120, page_size=50) as emulator:
+        # The scrapers read MANGA_WEB_SITE when imported, point them at the emulator
+        monkeypatch.setattr("src.site.BOOKMARKS_URL", emulator.url("/bookmarks/"))
+        monkeypatch.setattr("src.http_scrapping.LOGIN_URL", emulator.url("/login"))
+        yield emulator
+
+
+def test_http_backend_scrapes_the_emulator(site):
+    bookmarks = HttpBackend().fetch_bookmarks("reader", "secret")
+
+    assert [bookmark["title"] for bookmark in bookmarks] == [
+        f"Title {n}" for n in range(1, 121)
+    ]
+    assert bookmarks[0]["link"] == site.url("/manga/title-1/")
+    assert bookmarks[0]["last_update"] == "3 hours ago"
+    assert bookmarks[6]["last_update"] == "many time ago"
+    assert site.requests[("POST", "/wp-login.php")] == 1
+    assert site.requests[("GET", "/bookmarks/page/3/")] == 1
+
+    # The saved session is used next time, without logging in again
+    assert len(HttpBackend().fetch_bookmarks("reader", "secret")) == 120
+    assert site.requests[("POST", "/wp-login.php")] == 1
+
+
+def test_wrong_password(site):
+    with pytest.raises(LoginFailed):
+        HttpBackend().fetch_bookmarks("reader", "wrong")
+
+
+def test_bookmarks_need_a_session(site):
+    response = requests.get(site.url("/bookmarks/"), timeout=5)
+
+    assert is_login_html(response.url, response.text)
+    assert requests.get(site.url("/bookmarks/page/9/"), timeout=5).url.startswith(
+        site.url("/login")
+    )
+
+
+def test_pagination(site):
+    site.bookmarks = 1000
+
+    assert site.page_count == 20
+    assert parse_page_count(site.bookmarks_page(1)) == 20
+    assert parse_page_count(site.bookmarks_page(2)) == 20
+    assert len(parse_bookmarks(site.bookmarks_page(20))) == 50
+    assert site.bookmarks_page(21) is None
+    site.bookmarks = 0
+    assert parse_bookmarks(site.bookmarks_page(1)) == []
+
+
+def test_latency(site):
+    site.latency = 0.1
+    started = time.perf_counter()
+    requests.get(site.url("/login"), timeout=5)
+
+    assert time.perf_counter() - started >= 0.1
+
+
+def make_span(name, span_id, parent_id, start, seconds):
+    span = Span(name, "trace", parent_id)
+    span.span_id = span_id
+    span.start_ns = start
+    span.end_ns = start + int(seconds * 1e9)
+    return span
+
+
+def test_stage_times():
+    spans = [
+        make_span("scrape", "root", None, 0, 1.0),
+        make_span("login", "a", "root", 1, 0.2),
+        make_span("fetch_bookmarks_page", "b", "root", 2, 0.1),
+        make_span("scrape_bookmarks", "c", "root", 3, 0.5),
+        make_span("fetch_bookmarks_page", "d", "c", 4, 0.3),
+        make_span("fetch_bookmarks_page", "e", "c", 5, 0.3),
+    ]
+
+    assert stage_times(spans) == {
+        ("login",): (0.2, 1),
+        ("fetch_bookmarks_page",): (0.1, 1),
+        ("scrape_bookmarks",): (0.5, 1),
+        ("scrape_bookmarks", "fetch_bookmarks_page"): (pytest.approx(0.6), 2),
+    }
+
+
+def test_compare():
+    baseline = {"http": {"100": {"total_ms": 100, "peak_memory_kb": 1000}}}
+    results = {
+        "http": {
+            "100": {"total_ms": 120, "peak_memory_kb": 1400},
+            "1000": {"total_ms": 900, "peak_memory_kb": 3000},
+        }
+    }
+
+    assert compare(results, baseline, 0.25) == ["http 100 bookmarks: peak_memory_kb 1000.0 -> 1400.0"]
+    assert compare(results, baseline, 0.5) == []
+
+
+def test_benchmark_runs(tmp_path):
+    output = tmp_path / "bench.json"
+    subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.bench_scrape", "--backends", "http",
+            "--sizes", "10", "60", "--repeat", "1", "--latency", "0", "--json", str(output),
+        ],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+    )
+
+    results = json.loads(output.read_text())["http"]
+    assert results["60"]["pages"] == 2
+    assert set(results["60"]["stages"]) >= {
+        "login",
+        "fetch_bookmarks_page",
+        "scrape_bookmarks",
+        "scrape_bookmarks/fetch_bookmarks_page",
+    }
+    assert results["10"]["total_ms"] > 0
+    assert results["10"]["peak_memory_kb"] > 0
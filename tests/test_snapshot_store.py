@@ -0,0 +1,79 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from src.snapshot_store import (
+    VERSION_LENGTH,
+    SnapshotStore,
+    get_snapshot_store,
+    snapshot_version,
+)
+
+BOOKMARKS = [{"title": "Title", "link": "http://example.com/manga", "last_update": "Chapter 1"}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"), keep=2, memory_size=1)
+    yield store
+    store.close()
+
+
+def test_snapshot_version():
+    version = snapshot_version("user", BOOKMARKS)
+
+    assert len(version) == VERSION_LENGTH
+    assert snapshot_version("user", list(BOOKMARKS)) == version
+    assert snapshot_version("other", BOOKMARKS) != version
+    assert snapshot_version("user", BOOKMARKS * 2) != version
+
+
+def test_save_and_load(store):
+    assert store.load("0123456789") is None
+
+    version = store.save("user", BOOKMARKS)
+
+    assert store.load(version) == BOOKMARKS
+    assert store.latest("user") == (version, BOOKMARKS)
+    assert store.latest("other") is None
+
+
+def test_load_from_disk_beyond_memory(store):
+    first = store.save("user", BOOKMARKS)
+    store.save("other", BOOKMARKS * 2)
+
+    # Only one snapshot fits in memory, the first one is read back from disk
+    assert store.load(first) == BOOKMARKS
+
+
+def test_old_snapshots_pruned(store, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.snapshot_store.time.time", lambda: now[0])
+    versions = []
+    for count in range(1, 4):
+        now[0] += 1
+        versions.append(store.save("user", BOOKMARKS * count))
+    now[0] += 1
+    other = store.save("other", BOOKMARKS)
+
+    store._memory.clear()
+    assert store.load(versions[0]) is None
+    assert store.load(versions[1]) == BOOKMARKS * 2
+    assert store.latest("user") == (versions[2], BOOKMARKS * 3)
+    assert store.load(other) == BOOKMARKS
+
+
+def test_survives_restart(tmp_path):
+    path = str(tmp_path / "snapshots.sqlite3")
+    store = SnapshotStore(path)
+    version = store.save("user", BOOKMARKS)
+    store.close()
+
+    assert SnapshotStore(path).load(version) == BOOKMARKS
+
+
+def test_get_snapshot_store_lives_in_data_dir(data_dir):
+    assert get_snapshot_store().path == str(data_dir / "snapshots.sqlite3")
+    assert get_snapshot_store() is get_snapshot_store()
@@ -0,0 +1,254 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from src.tracing import (
+    STATUS_ERROR,
+    ConsoleExporter,
+    FileExporter,
+    Span,
+    current_span,
+    get_exporter,
+    in_context,
+    set_attribute,
+    traced,
+    tracer,
+)
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(list(spans))
+
+    def shutdown(self):
+        pass
+
+    def spans(self):
+        return {span.name: span for spans in self.traces for span in spans}
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    return exporter
+
+
+def test_trace_exported_when_root_ends(exporter):
+    with tracer.span("button", {"chat.id": 42}) as root:
+        with tracer.span("scrape_bookmarks") as child:
+            set_attribute("bookmarks.count", 7)
+            assert current_span() is child
+        assert exporter.traces == []
+    assert current_span() is None
+
+    [spans] = exporter.traces
+    assert [span.name for span in spans] == ["scrape_bookmarks", "button"]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert root.parent_id is None
+    # The request attributes are copied to every span of the trace
+    assert child.attributes == {"chat.id": 42, "bookmarks.count": 7}
+    assert root.attributes == {"chat.id": 42, "bookmarks.count": 7}
+    assert root.end_ns >= child.end_ns >= child.start_ns >= root.start_ns
+
+
+def test_failed_span(exporter):
+    with pytest.raises(ValueError):
+        with tracer.span("login"):
+            raise ValueError("no form")
+
+    [[span]] = exporter.traces
+    assert span.status == STATUS_ERROR
+    assert span.status_message == "ValueError: no form"
+
+
+def test_disabled_tracer_records_nothing():
+    @traced("format_update_message")
+    def format_message(value):
+        set_attribute("ignored", True)
+        return current_span()
+
+    assert not tracer.enabled
+    assert format_message(1) is None
+
+
+@pytest.mark.asyncio
+async def test_traced_functions(exporter):
+    @traced("fetch_bookmarks_page", attributes=lambda session, page=1: {"page": page})
+    def fetch_page(session, page=1):
+        return current_span()
+
+    @traced("check_updates", attributes={"chat.id": 1})
+    async def check_updates():
+        await asyncio.sleep(0)
+        return fetch_page(None, page=3)
+
+    span = await check_updates()
+
+    spans = exporter.spans()
+    assert spans["fetch_bookmarks_page"] is span
+    assert span.attributes == {"page": 3, "chat.id": 1}
+    assert span.parent_id == spans["check_updates"].span_id
+
+
+def test_in_context_continues_trace_on_other_threads(exporter):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with tracer.span("scrape_bookmarks") as root:
+            futures = [pool.submit(in_context(current_span)) for _ in range(3)]
+            assert all(future.result() is root for future in futures)
+            # Without it the worker threads know nothing of the trace
+            assert pool.submit(current_span).result() is None
+
+
+def test_span_ending_after_its_root_exported_alone(exporter):
+    with tracer.span("button") as root:
+        # Started by the handler, ended after it answered
+        late = Span("send_later", root.trace_id, root.span_id)
+    tracer.end(late)
+
+    assert [[span.name for span in spans] for spans in exporter.traces] == [
+        ["button"],
+        ["send_later"],
+    ]
+    assert late.trace_id == root.trace_id
+    assert tracer._traces == {}
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_is_its_own_trace(exporter):
+    from src.bookmark_cache import BookmarkCache
+
+    cache = BookmarkCache(ttl=0)
+    await cache.get("alice", AsyncMock(return_value=["v1"]))
+    refreshed = asyncio.Event()
+
+    async def loader():
+        with tracer.span("scrape_bookmarks"):
+            await refreshed.wait()
+        return ["v2"]
+
+    with tracer.span("button") as root:
+        assert await cache.get("alice", loader) == ["v1"]
+    refreshed.set()
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    spans = exporter.spans()
+    assert cache.peek("alice") == ["v2"]
+    assert spans["refresh_bookmarks"].parent_id is None
+    assert spans["refresh_bookmarks"].trace_id != root.trace_id
+    assert spans["scrape_bookmarks"].parent_id == spans["refresh_bookmarks"].span_id
+    assert tracer._traces == {}
+
+
+@pytest.mark.asyncio
+async def test_send_queue_calls_are_child_spans(exporter):
+    from src.send_queue import SendQueue
+
+    queue = SendQueue()
+    send_message = AsyncMock(return_value="sent")
+    send_message.__name__ = "send_message"
+
+    with tracer.span("start") as root:
+        assert await queue.submit(7, send_message, "hello") == "sent"
+
+    send = exporter.spans()["telegram.send_message"]
+    assert send.parent_id == root.span_id
+    assert send.attributes["chat.id"] == 7
+    assert send.attributes["send.attempt"] == 1
+
+
+@pytest.mark.asyncio
+@patch("src.utils.get_backend")
+async def test_handler_trace(mock_get_backend, exporter, monkeypatch):
+    from src.bot import check_updates_command
+
+    monkeypatch.setenv("SCHEDULE_CHAT_ID", "99")
+    monkeypatch.setenv("WORK_USER_LOGIN", "reader")
+    monkeypatch.setenv("WORK_USER_PASSWORD", "secret")
+    mock_get_backend.return_value.name = "http"
+    mock_get_backend.return_value.fetch_bookmarks.return_value = [
+        {"title": "T", "link": "L", "chapter_title": "C", "last_update": "1 hour ago", "image": "I"}
+    ]
+    update = MagicMock()
+    update.effective_chat.id = 99
+    update.callback_query.message.chat_id = 99
+    context = MagicMock()
+    context.bot.send_photo = AsyncMock()
+    context.bot.send_photo.__name__ = "send_photo"
+
+    await check_updates_command(update, context)
+
+    [spans] = exporter.traces
+    by_name = {span.name: span for span in spans}
+    assert set(by_name) == {
+        "check_updates",
+        "check_for_updates",
+        "fetch_bookmarks",
+        "deliver_updates",
+        "format_update_message",
+        "telegram.send_photo",
+    }
+    # The scrape ran on a scrape worker thread, still in the same trace
+    assert by_name["fetch_bookmarks"].parent_id == by_name["check_for_updates"].span_id
+    assert by_name["fetch_bookmarks"].attributes["scrape.backend"] == "http"
+    for span in spans:
+        assert span.attributes["chat.id"] == 99
+        assert span.attributes["bookmarks.count"] == 1
+
+
+def test_file_exporter_writes_otlp_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer, "exporter", FileExporter(str(tmp_path / "traces" / "t.jsonl")))
+    with tracer.span("button", {"chat.id": 42, "page.cached": True, "name": "x"}):
+        with tracer.span("login"):
+            pass
+    tracer.exporter.shutdown()
+
+    [line] = (tmp_path / "traces" / "t.jsonl").read_text().splitlines()
+    [resource_spans] = json.loads(line)["resourceSpans"]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "notti-bot"}
+    login, button = resource_spans["scopeSpans"][0]["spans"]
+    assert login["parentSpanId"] == button["spanId"]
+    assert button["parentSpanId"] == ""
+    assert len(button["traceId"]) == 32 and len(button["spanId"]) == 16
+    assert int(button["endTimeUnixNano"]) >= int(button["startTimeUnixNano"])
+    assert button["attributes"] == [
+        {"key": "chat.id", "value": {"intValue": "42"}},
+        {"key": "page.cached", "value": {"boolValue": True}},
+        {"key": "name", "value": {"stringValue": "x"}},
+    ]
+    assert button["status"] == {"code": 1, "message": ""}
+
+
+def test_console_exporter(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(tracer, "exporter", ConsoleExporter(stream))
+    with tracer.span("button", {"chat.id": 42}):
+        with tracer.span("login"):
+            pass
+
+    root, child = stream.getvalue().splitlines()
+    assert root.startswith("button ") and "chat.id=42" in root
+    assert child.startswith("  login ")
+
+
+def test_get_exporter(monkeypatch, tmp_path):
+    monkeypatch.delenv("TRACE_EXPORTER", raising=False)
+    assert get_exporter() is None
+    monkeypatch.setenv("TRACE_EXPORTER", "console")
+    assert isinstance(get_exporter(), ConsoleExporter)
+    monkeypatch.setenv("TRACE_EXPORTER", "file")
+    monkeypatch.delenv("TRACE_FILE", raising=False)
+    assert get_exporter().path == os.path.join(str(tmp_path), "traces.jsonl")
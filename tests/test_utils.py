@@ -3,12 +3,19 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import asyncio
+import time
 import pytest
 from unittest.mock import patch, Mock
+from src.metrics import REGISTRY
+from src.singleflight import scrape_flight
 from src.utils import (
     format_update_message,
-    format_bookmarks_page,
-    check_for_updates,
+    check_for_updates_async,
+    is_recent_update,
+    fetch_bookmarks_async,
+    get_bookmarks,
+    verify_credentials,
 )  # Replace with your actual import
 
 
@@ -36,85 +43,125 @@ def test_format_update_message():
 
 
 @pytest.mark.asyncio
-async def test_format_bookmarks_page():
-    # Given a sample list of bookmarks
-    sample_bookmarks = [
-        {
-            "title": "Manga 1",
-            "link": "http://example.com/manga1",
-            "last_update": "1 hour ago",
-        },
-        {
-            "title": "Manga 2",
-            "link": "http://example.com/manga2",
-            "last_update": "2 hours ago",
-        },
-        {
-            "title": "Manga 3",
-            "link": "http://example.com/manga3",
-            "last_update": "3 hours ago",
-        }
-        # ... add more if needed for the test
-    ]
-
-    # Page and page size for the test
-    page = 0  # First page
-    page_size = 2  # Two items per page
-
-    # When format_bookmarks_page is called
-    result = await format_bookmarks_page(sample_bookmarks, page, page_size)
-
-    # Then the result should be a formatted string for the first page
-    expected_message = (
-        "<b>Your Bookmarked Mangas:</b>\n\n"
-        "<a href='http://example.com/manga1'>Manga 1</a> - Last updated: 1 hour ago\n"
-        "<a href='http://example.com/manga2'>Manga 2</a> - Last updated: 2 hours ago\n"
-    )
-
-    assert result == expected_message
-
-
-@patch("src.utils.setup_driver")
-@patch("src.utils.login")
-@patch("src.utils.scrape_bookmarks")
-def test_check_for_updates(
-    mock_scrape_bookmarks, mock_login, mock_setup_driver, mock_driver
-):
+@patch("src.utils.get_backend")
+async def test_check_for_updates(mock_get_backend):
     # Setup mock
-    mock_setup_driver.return_value = mock_driver
-    mock_scrape_bookmarks.return_value = [
+    mock_fetch_bookmarks = mock_get_backend.return_value.fetch_bookmarks
+    mock_fetch_bookmarks.return_value = [
         {
             "title": "Manga 1",
             "link": "http://example.com/manga1",
+            "chapter_title": "Chapter 1",
             "last_update": "1 hour ago",
         },
         {
             "title": "Manga 2",
             "link": "http://example.com/manga2",
+            "chapter_title": "Chapter 2",
             "last_update": "1 day ago",
         },
         {
             "title": "Manga 3",
             "link": "http://example.com/manga3",
+            "chapter_title": "Chapter 3",
             "last_update": "15 min ago",
         },
         {
             "title": "Manga 4",
             "link": "http://example.com/manga4",
+            "chapter_title": "Chapter 4",
             "last_update": "5 week ago",
         },
     ]
 
     # Call the function
-    updates = check_for_updates("username", "password")
+    updates = await check_for_updates_async("username", "password", fresh=True)
 
     # Verify
-    mock_setup_driver.assert_called_once()
-    mock_login.assert_called_once_with(mock_driver, "username", "password")
-    mock_scrape_bookmarks.assert_called_once_with(mock_driver)
-    mock_driver.quit.assert_called_once()
+    mock_fetch_bookmarks.assert_called_once_with("username", "password")
 
     # Check if updates are filtered correctly
     assert len(updates) == 2
     assert updates[0]["title"] == "Manga 1"
     assert updates[1]["title"] == "Manga 3"
+
+    # The same scrape again holds no new chapters
+    assert await check_for_updates_async("username", "password", fresh=True) == []
+
+    # A new chapter of a known title is reported, whatever the website says about its age
+    mock_fetch_bookmarks.return_value[1] = dict(
+        mock_fetch_bookmarks.return_value[1], chapter_title="Chapter 2.5"
+    )
+    updates = await check_for_updates_async("username", "password", fresh=True)
+    assert [update["title"] for update in updates] == ["Manga 2"]
+
+@pytest.mark.asyncio
+@patch("src.utils.get_backend")
+async def test_check_for_updates_async(mock_get_backend):
+    mock_get_backend.return_value.fetch_bookmarks.return_value = [
+        {"title": "Manga 1", "chapter_title": "Chapter 1", "last_update": "3 min ago"},
+        {"title": "Manga 2", "chapter_title": "Chapter 9", "last_update": "2 days ago"},
+    ]
+
+    updates = await check_for_updates_async("username", "password")
+
+    assert updates == [
+        {"title": "Manga 1", "chapter_title": "Chapter 1", "last_update": "3 min ago"}
+    ]
+    mock_get_backend.return_value.fetch_bookmarks.assert_called_once_with(
+        "username", "password"
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.utils.get_backend")
+async def test_fetch_bookmarks_async_coalesced(mock_get_backend):
+    def slow_scrape(username, password):
+        time.sleep(0.1)
+        return [{"title": "Manga 1"}]
+
+    mock_get_backend.return_value.fetch_bookmarks.side_effect = slow_scrape
+    coalesced = scrape_flight.coalesced
+
+    # Five users tap the button at once
+    results = await asyncio.gather(
+        *(fetch_bookmarks_async("username", "password") for _ in range(5))
+    )
+
+    assert results == [[{"title": "Manga 1"}]] * 5
+    mock_get_backend.return_value.fetch_bookmarks.assert_called_once()
+    # The /metrics endpoint shows the four joined scrapes
+    assert f"notti_scrape_coalesced_total {coalesced + 4}\n" in REGISTRY.render()
+
+
+@pytest.mark.asyncio
+@patch("src.utils.get_backend")
+async def test_verify_credentials(mock_get_backend):
+    mock_get_backend.return_value.log_in.return_value = False
+
+    assert await verify_credentials("username", "wrong") is False
+    mock_get_backend.return_value.log_in.assert_called_once_with("username", "wrong")
+
+
+@pytest.mark.asyncio
+@patch("src.utils.get_backend")
+async def test_accounts_sharing_a_login_do_not_share_bookmarks(mock_get_backend):
+    mock_get_backend.return_value.fetch_bookmarks.side_effect = lambda username, password: (
+        [{"title": "Manga 1", "chapter_title": "Chapter 1", "last_update": "3 min ago"}]
+        if password == "password"
+        else []
+    )
+
+    assert len(await get_bookmarks("username", "password")) == 1
+    # The cached bookmarks of the account need its password too
+    assert await get_bookmarks("username", "guess") == []
+
+
+def test_is_recent_update():
+    now = 1_700_000_000
+    assert is_recent_update({"last_update": "3 hours ago", "updated_at": now - 3 * 3600}, now)
+    assert not is_recent_update({"last_update": "1 day ago", "updated_at": now - 86400}, now)
+    assert not is_recent_update({"last_update": "2 weeks ago", "updated_at": now - 14 * 86400}, now)
+    assert not is_recent_update({"last_update": "many time ago", "updated_at": None}, now)
+    # Records scraped before timestamps existed fall back to the text
+    assert is_recent_update({"last_update": "15 min ago"}, now)
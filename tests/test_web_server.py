@@ -0,0 +1,121 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import pytest
+import pytest_asyncio
+from telegram import Update
+from src.web_server import (
+    Response,
+    WebServer,
+    telegram_webhook,
+    webhook_secret,
+)
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 7,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "text": "/start",
+    },
+}
+
+
+async def request(port, method, path, body=b"", headers=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ")[1])
+    length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+    payload = await reader.readexactly(length)
+    writer.close()
+    return status, payload
+
+
+@pytest_asyncio.fixture
+async def server():
+    server = WebServer(host="127.0.0.1", port=0)
+
+    async def health(request):
+        return Response(HTTPStatus.OK, "OK")
+
+    server.route("GET", "/health", health)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_health_and_unknown_routes(server):
+    assert await request(server.port, "GET", "/health") == (200, b"OK")
+    assert await request(server.port, "GET", "/health?probe=1") == (200, b"OK")
+    assert (await request(server.port, "POST", "/health"))[0] == 405
+    assert (await request(server.port, "GET", "/missing"))[0] == 404
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_connection(server):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    for _ in range(3):
+        writer.write(b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200 OK")
+        assert b"Connection: keep-alive" in head
+        assert await reader.readexactly(2) == b"OK"
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_failing_handler(server):
+    async def broken(request):
+        raise RuntimeError("boom")
+
+    server.route("GET", "/broken", broken)
+
+    assert (await request(server.port, "GET", "/broken"))[0] == 500
+    # The server keeps serving
+    assert await request(server.port, "GET", "/health") == (200, b"OK")
+
+
+@pytest.mark.asyncio
+async def test_telegram_webhook(server):
+    application = MagicMock()
+    application.bot = None
+    application.update_queue = asyncio.Queue()
+    server.route("POST", "/telegram", telegram_webhook(application, "secret"))
+    body = json.dumps(UPDATE).encode()
+
+    # Requests without the secret token are refused
+    assert (await request(server.port, "POST", "/telegram", body))[0] == 403
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+    assert (await request(server.port, "POST", "/telegram", body, headers))[0] == 403
+    assert application.update_queue.empty()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "secret"}
+    assert (await request(server.port, "POST", "/telegram", b"{not json", headers))[0] == 400
+    assert await request(server.port, "POST", "/telegram", body, headers) == (200, b"OK")
+
+    update = application.update_queue.get_nowait()
+    assert isinstance(update, Update)
+    assert update.update_id == 1
+    assert update.message.text == "/start"
+
+
+def test_webhook_secret():
+    secret = webhook_secret("123:token")
+
+    assert secret == webhook_secret("123:token")
+    assert secret != webhook_secret("456:token")
+    assert secret.isalnum() and len(secret) == 32